@@ -39,6 +39,10 @@ class Person:
                 " and his email is:", self.__email)
 
 
+import threading
+from school.timetable import ClashError, IntervalIndex, format_slots
+
+
 class Student(Person):
     """
     A student, subclass of Person.
@@ -57,15 +61,49 @@ class Student(Person):
         super().__init__(name, age, email)
         self.student_id = student_id
         self.registered_courses = []
+        self.timetable = IntervalIndex()
+        self._courses_display = None
+
+    @property
+    def courses_display(self):
+        """
+        Comma-separated IDs of the registered courses, cached until the
+        registrations change.
 
-    def register_course(self, course):
+        :rtype: str
+        """
+        if self._courses_display is None:
+            self._courses_display = ",".join([c.course_id for c in self.registered_courses])
+        return self._courses_display
+
+    def register_course(self, course, check=True):
         """
         Register a student for a course.
 
         :param course: Course object to register.
         :type course: Course
+        :param check: Refuse a course that clashes with the student's timetable.
+        :type check: bool
+        :raises ClashError: If the course overlaps another of the student's courses.
         """
+        other = self.timetable.clash(course.slots, course.course_id) if check else None
+        if other is not None:
+            raise ClashError([("student", self.student_id, course.course_id, other)])
         self.registered_courses.append(course)
+        self.timetable.add(course.slots, course.course_id)
+        self._courses_display = None
+
+    def drop_course(self, course):
+        """
+        Remove a student from a course.
+
+        :param course: Course object to leave.
+        :type course: Course
+        """
+        if course in self.registered_courses:
+            self.registered_courses.remove(course)
+            self.timetable.remove(course.slots, course.course_id)
+            self._courses_display = None
 
 
 class Instructor(Person):
@@ -86,15 +124,37 @@ class Instructor(Person):
         super().__init__(name, age, email)
         self.instructor_id = instructor_id
         self.assigned_courses = []
+        self.timetable = IntervalIndex()
+        self._courses_display = None
+
+    @property
+    def courses_display(self):
+        """
+        Comma-separated IDs of the assigned courses, cached until the
+        assignments change.
+
+        :rtype: str
+        """
+        if self._courses_display is None:
+            self._courses_display = ",".join([c.course_id for c in self.assigned_courses])
+        return self._courses_display
 
-    def assign_course(self, course):
+    def assign_course(self, course, check=True):
         """
         Assign a course to the instructor.
 
         :param course: Course object to assign.
         :type course: Course
+        :param check: Refuse a course that clashes with the instructor's timetable.
+        :type check: bool
+        :raises ClashError: If the course overlaps another of the instructor's courses.
         """
+        other = self.timetable.clash(course.slots, course.course_id) if check else None
+        if other is not None:
+            raise ClashError([("instructor", self.instructor_id, course.course_id, other)])
         self.assigned_courses.append(course)
+        self.timetable.add(course.slots, course.course_id)
+        self._courses_display = None
 
     def get_name(self):
         """
@@ -116,22 +176,216 @@ class Course:
     :type course_name: str
     :param instructor: The instructor teaching the course.
     :type instructor: Instructor
+    :param slots: Weekly meetings of the course, with their rooms.
+    :type slots: list[school.timetable.Slot]
+    :param capacity: Number of seats, or None for no limit.
+    :type capacity: int
     """
 
-    def __init__(self, course_id, course_name, instructor):
+    def __init__(self, course_id, course_name, instructor, slots=None, capacity=None):
         self.course_id = course_id
         self.course_name = course_name
+        self.slots = list(slots or [])
+        self.capacity = capacity
         self.instructor = instructor
         self.enrolled_students = []
+        self.waitlist = []
+        # Guards the seat count, so two threads cannot take the last seat.
+        self._seats = threading.RLock()
+        self._students_display = None
+
+    @property
+    def instructor_name(self):
+        """
+        Name of the course's instructor, or an empty string.
+
+        :rtype: str
+        """
+        return self.instructor.name if self.instructor else ""
+
+    @property
+    def slots_display(self):
+        """
+        The weekly slots, e.g. ``Mon 09:00-10:30 B101``.
+
+        :rtype: str
+        """
+        return format_slots(self.slots)
+
+    @property
+    def students_display(self):
+        """
+        Comma-separated IDs of the enrolled students, cached until the
+        enrolment changes.
+
+        :rtype: str
+        """
+        if self._students_display is None:
+            self._students_display = ",".join([s.student_id for s in self.enrolled_students])
+        return self._students_display
+
+    @property
+    def enrolment_count(self):
+        """
+        Number of enrolled students.
+
+        :rtype: int
+        """
+        return len(self.enrolled_students)
+
+    @property
+    def seats_left(self):
+        """
+        Number of free seats, or None if the course has no limit.
+
+        :rtype: int
+        """
+        if self.capacity is None:
+            return None
+        return max(self.capacity - len(self.enrolled_students), 0)
 
     def add_student(self, student):
         """
-        Add a student to the course.
+        Add a student to the course if a seat is free. Checking and taking
+        the seat happen under one lock, so concurrent registrations cannot
+        overbook the course.
 
         :param student: Student to enroll.
         :type student: Student
+        :return: True if the student was added, False if the course is full.
+        :rtype: bool
+        """
+        with self._seats:
+            if self.seats_left == 0:
+                return False
+            self.enrolled_students.append(student)
+            if student in self.waitlist:
+                self.waitlist.remove(student)
+            self._students_display = None
+            return True
+
+    def register(self, student):
+        """
+        Register a student in the course, or put them on the waitlist when
+        the course is full.
+
+        :param student: Student to register.
+        :type student: Student
+        :return: True if the student got a seat, False if they are waiting.
+        :rtype: bool
+        :raises ClashError: If the course overlaps another of the student's courses.
+        """
+        with self._seats:
+            if student in self.enrolled_students:
+                return True
+            other = student.timetable.clash(self.slots, self.course_id)
+            if other is not None:
+                raise ClashError([("student", student.student_id, self.course_id, other)])
+            if not self.add_student(student):
+                if student not in self.waitlist:
+                    self.waitlist.append(student)
+                return False
+            student.register_course(self, check=False)
+            return True
+
+    def drop(self, student):
+        """
+        Remove a student from the course or its waitlist. A freed seat goes
+        to the first waiting student whose timetable allows it.
+
+        :param student: Student to remove.
+        :type student: Student
+        :return: The waiting students that were registered.
+        :rtype: list[Student]
+        """
+        with self._seats:
+            if student in self.waitlist:
+                self.waitlist.remove(student)
+            if student not in self.enrolled_students:
+                return []
+            self.enrolled_students.remove(student)
+            self._students_display = None
+            student.drop_course(self)
+            promoted = []
+            for waiting in list(self.waitlist):
+                if self.seats_left == 0:
+                    break
+                if waiting.timetable.clash(self.slots, self.course_id) is None:
+                    self.add_student(waiting)
+                    waiting.register_course(self, check=False)
+                    promoted.append(waiting)
+            return promoted
+
+    def enroll(self, students):
+        """
+        Enroll many students at once, registering the course on each of
+        them. Students already enrolled are skipped using a set lookup.
+
+        :param students: Students to enroll.
+        :type students: iterable[Student]
+        :return: The students that were newly enrolled; once the course is
+            full the others join the waitlist in order.
+        :rtype: list[Student]
+        :raises ClashError: If the course clashes with any of the students'
+            timetables; nobody is enrolled then.
+        """
+        with self._seats:
+            return self._enroll(students)
+
+    def _enroll(self, students):
+        enrolled = {id(s) for s in self.enrolled_students}
+        new = []
+        for student in students:
+            if id(student) not in enrolled:
+                enrolled.add(id(student))
+                new.append(student)
+        clashes = []
+        for student in new:
+            other = student.timetable.clash(self.slots, self.course_id)
+            if other is not None:
+                clashes.append(("student", student.student_id, self.course_id, other))
+        if clashes:
+            raise ClashError(clashes)
+        free = self.seats_left
+        if free is not None and free < len(new):
+            new, waiting = new[:free], new[free:]
+            self.waitlist += [s for s in waiting if s not in self.waitlist]
+        added = []
+        for student in new:
+            student.register_course(self, check=False)
+            self.enrolled_students.append(student)
+            if student in self.waitlist:
+                self.waitlist.remove(student)
+            added.append(student)
+        if added:
+            self._students_display = None
+        return added
+
+    def copy_roster(self, source):
+        """
+        Enroll every student of another course in this one.
+
+        :param source: Course whose students are copied.
+        :type source: Course
+        :return: The students that were newly enrolled.
+        :rtype: list[Student]
+        """
+        return self.enroll(list(source.enrolled_students))
+
+    def drop_all(self):
+        """
+        Remove every student from the course and empty its waitlist.
+
+        :return: The students that were dropped.
+        :rtype: list[Student]
         """
-        self.enrolled_students.append(student)
+        with self._seats:
+            dropped, self.enrolled_students = self.enrolled_students, []
+            self.waitlist = []
+        self._students_display = None
+        for student in dropped:
+            student.drop_course(self)
+        return dropped
 
     def get_name(self):
         """
@@ -143,7 +397,7 @@ class Course:
         return self.course_name
 
 
-import json
+from school.atomic import dump_json, load_json
 
 
 class DataManager:
@@ -154,15 +408,16 @@ class DataManager:
     @staticmethod
     def save_data(filename, data):
         """
-        Save data to a JSON file.
+        Save data to a JSON file. The file is written to a temporary file,
+        fsynced and renamed over ``filename``, with a checksum footer that
+        :meth:`load_data` verifies.
 
         :param filename: Path to the file.
         :type filename: str
         :param data: Data to be saved.
         :type data: dict or list
         """
-        with open(filename, "w") as f:
-            json.dump(data, f, indent=4)
+        dump_json(data, filename)
 
     @staticmethod
     def load_data(filename):
@@ -173,9 +428,9 @@ class DataManager:
         :type filename: str
         :return: Loaded data.
         :rtype: dict or list
+        :raises ValueError: If the checksum footer does not match.
         """
-        with open(filename, "r") as f:
-            return json.load(f)
+        return load_json(filename)
 
 
 import re
@@ -0,0 +1,7 @@
+"""
+Headless core of the School Management System.
+
+Holds the SQLite data layer shared by the GUIs and the command-line
+interface (``python -m school``). Nothing in this package imports a GUI
+toolkit, so it can run from cron or on a server without a display.
+"""
@@ -0,0 +1,5 @@
+import sys
+
+from school.cli import main
+
+sys.exit(main())
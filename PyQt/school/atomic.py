@@ -0,0 +1,134 @@
+"""
+Crash-safe file writes.
+
+Data is written to a temporary file in the target's directory, flushed
+and fsynced, then renamed over the target, so an interrupted save leaves
+the previous file intact. The new file keeps the permissions of the one
+it replaces. JSON files get a SHA-256 footer line that
+:func:`load_json` verifies; files without a footer (written by older
+versions or other tools) are still accepted.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import stat
+import tempfile
+
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+FOOTER_PREFIX = b"\n#sha256:"
+
+
+class ChecksumError(ValueError):
+    """Raised when a file's contents do not match its checksum footer."""
+
+
+@contextlib.contextmanager
+def atomic_open(path, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Open a temporary binary file that replaces ``path`` when the block
+    exits without an exception.
+
+    :param path: Final path of the file.
+    :type path: str
+    :param block_size: Size of the write buffer in bytes.
+    :type block_size: int
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix="." + os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb", buffering=block_size) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates the file readable by its owner only.
+        os.chmod(tmp, _file_mode(path))
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp)
+        raise
+    _fsync_directory(directory)
+
+
+def _file_mode(path):
+    # The permissions of the file being replaced, or those open() would
+    # give a new file.
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def _fsync_directory(directory):
+    # Makes the rename itself durable; not supported on Windows.
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def dump_json(obj, path, indent=4, checksum=True, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Atomically write ``obj`` as JSON.
+
+    The document is encoded incrementally and written in blocks of
+    ``block_size`` bytes, so large saves never hold the whole encoded
+    file in memory.
+
+    :param obj: Data to write.
+    :param path: Destination file.
+    :type path: str
+    :param indent: JSON indentation.
+    :type indent: int
+    :param checksum: Append a SHA-256 footer line.
+    :type checksum: bool
+    :param block_size: Size of each write in bytes.
+    :type block_size: int
+    """
+    digest = hashlib.sha256()
+    with atomic_open(path, block_size) as f:
+        pending = []
+        size = 0
+        for chunk in json.JSONEncoder(indent=indent).iterencode(obj):
+            pending.append(chunk)
+            size += len(chunk)
+            if size >= block_size:
+                data = "".join(pending).encode("utf-8")
+                digest.update(data)
+                f.write(data)
+                pending = []
+                size = 0
+        data = "".join(pending).encode("utf-8")
+        digest.update(data)
+        f.write(data)
+        if checksum:
+            f.write(FOOTER_PREFIX + digest.hexdigest().encode("ascii") + b"\n")
+
+
+def load_json(path):
+    """
+    Read a JSON file written by :func:`dump_json`, verifying its checksum
+    footer if it has one.
+
+    :param path: File to read.
+    :type path: str
+    :return: The decoded data.
+    :raises ChecksumError: If the footer does not match the contents.
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    body = raw
+    cut = raw.rfind(FOOTER_PREFIX)
+    if cut != -1 and raw[cut + len(FOOTER_PREFIX):].strip().isalnum():
+        body = raw[:cut]
+        expected = raw[cut + len(FOOTER_PREFIX):].strip().decode("ascii")
+        if hashlib.sha256(body).hexdigest() != expected:
+            raise ChecksumError(f"{path} is corrupt: checksum mismatch")
+    return json.loads(body.decode("utf-8"))
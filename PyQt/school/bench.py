@@ -0,0 +1,404 @@
+"""
+Benchmarks for the hot paths of the GUIs and the data layer.
+
+Each benchmark runs against a deterministic synthetic school (see
+:mod:`school.synth`) and records the time and peak Python memory of one
+operation. Results are appended to a JSON-lines file tagged with the
+current git commit so they can be compared across commits::
+
+    python -m school bench --students 20000 --courses 500
+    python -m school bench --filter lab3 --compare
+
+Qt benchmarks run with the ``offscreen`` platform plugin. Tk benchmarks
+need an X display; when ``DISPLAY`` is unset and ``Xvfb`` is installed a
+virtual display is started for the run. Benchmarks whose toolkit is not
+available are reported as skipped.
+"""
+
+import contextlib
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from school import db, synth
+
+LAB3_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                        "lab 3")
+
+BENCHMARKS = []
+
+
+class SkipBenchmark(Exception):
+    """Raised by a benchmark's setup when it cannot run here."""
+
+
+class Context:
+    """
+    State shared by the benchmarks of one run.
+
+    :param data: Synthetic school as returned by :func:`school.synth.generate`.
+    :type data: dict
+    :param workdir: Temporary directory for files written by benchmarks.
+    :type workdir: str
+    """
+
+    def __init__(self, data, workdir):
+        self.data = data
+        self.workdir = workdir
+        self._cache = {}
+
+    def path(self, name):
+        """
+        Get a path inside the working directory.
+
+        :param name: File name.
+        :type name: str
+        :return: Absolute path.
+        :rtype: str
+        """
+        return os.path.join(self.workdir, name)
+
+    def database(self):
+        """
+        Point the data layer at a database filled with the synthetic school,
+        creating it on first use.
+
+        :return: Path of the database file.
+        :rtype: str
+        """
+        path = self.path("bench.db")
+        db.DB_FILE = path
+        if "db" not in self._cache:
+            synth.write_db(self.data)
+            self._cache["db"] = path
+        return path
+
+
+def benchmark(name, requires=None):
+    """
+    Register a benchmark.
+
+    The decorated function receives a :class:`Context` and returns either
+    the operation to time, or a ``(prepare, operation)`` pair where
+    ``prepare()`` runs untimed before each measurement and its result is
+    passed to ``operation``.
+
+    :param name: Benchmark name, ``<area>.<operation>``.
+    :type name: str
+    :param requires: ``"qt"`` or ``"tk"`` if a GUI toolkit is needed.
+    :type requires: str
+    """
+    def decorator(fn):
+        BENCHMARKS.append((name, requires, fn))
+        return fn
+    return decorator
+
+
+def lab3_module():
+    """
+    Import ``school_management`` from the lab 3 directory.
+
+    :return: The module.
+    """
+    if LAB3_DIR not in sys.path:
+        sys.path.insert(0, LAB3_DIR)
+    import school_management
+    return school_management
+
+
+def lab3_objects(data):
+    """
+    Build linked lab 3 model objects from synthetic data.
+
+    :param data: Synthetic school.
+    :type data: dict
+    :return: Tuple of lists (students, instructors, courses).
+    :rtype: tuple
+    """
+    sm = lab3_module()
+    students = [sm.Student.from_dict(s) for s in data["students"]]
+    instructors = [sm.Instructor.from_dict(i) for i in data["instructors"]]
+    courses = [sm.Course.from_dict(c) for c in data["courses"]]
+    course_by_id = {c.course_id: c for c in courses}
+    for s, row in zip(students, data["students"]):
+        for cid in row["registered_courses"]:
+            s.register_course(course_by_id[cid])
+    for i, row in zip(instructors, data["instructors"]):
+        for cid in row["assigned_courses"]:
+            i.assign_course(course_by_id[cid])
+    return students, instructors, courses
+
+
+@contextlib.contextmanager
+def virtual_display():
+    """
+    Start ``Xvfb`` for the duration of the block if there is no display.
+    """
+    if os.environ.get("DISPLAY") or not shutil.which("Xvfb"):
+        yield
+        return
+    display = ":97"
+    proc = subprocess.Popen(["Xvfb", display, "-screen", "0", "1280x1024x24"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.environ["DISPLAY"] = display
+    time.sleep(0.5)
+    try:
+        yield
+    finally:
+        del os.environ["DISPLAY"]
+        proc.terminate()
+        proc.wait()
+
+
+def _qt_window(ctx):
+    if "qt" not in ctx._cache:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        try:
+            from PyQt5.QtWidgets import QApplication
+        except ImportError:
+            raise SkipBenchmark("PyQt5 is not installed")
+        from school_management_system2 import SchoolManagementSystem
+
+        ctx.database()
+        ctx._cache["qt_app"] = QApplication.instance() or QApplication([])
+        ctx._cache["qt"] = SchoolManagementSystem(lazy=False)
+    ctx.database()
+    return ctx._cache["qt"]
+
+
+def _tk_app(ctx):
+    if "tk" not in ctx._cache:
+        import tkinter
+
+        lab3_module()
+        import school_tkinter
+        try:
+            school_tkinter.build_gui()
+        except tkinter.TclError as e:
+            raise SkipBenchmark(f"no display: {e}")
+        for tab in school_tkinter.tabControl.tabs():
+            school_tkinter.tabControl.select(tab)
+            school_tkinter.build_current_tab()
+        ctx._cache["tk"] = school_tkinter
+    return ctx._cache["tk"]
+
+
+@benchmark("lab3.save_data")
+def bench_save_data(ctx):
+    sm = lab3_module()
+    students, instructors, courses = lab3_objects(ctx.data)
+    path = ctx.path("save.json")
+    return lambda: sm.save_data(path, students, instructors, courses)
+
+
+@benchmark("lab3.load_data")
+def bench_load_data(ctx):
+    sm = lab3_module()
+    path = ctx.path("load.json")
+    sm.save_data(path, *lab3_objects(ctx.data))
+    return lambda: sm.load_data(path)
+
+
+@benchmark("lab3.register_course")
+def bench_register_course(ctx):
+    sm = lab3_module()
+    pairs = [(row, cid) for row in ctx.data["students"] for cid in row["registered_courses"]]
+
+    def prepare():
+        students = {row["student_id"]: sm.Student.from_dict(row) for row in ctx.data["students"]}
+        courses = {row["course_id"]: sm.Course.from_dict(row) for row in ctx.data["courses"]}
+        return [(students[row["student_id"]], courses[cid]) for row, cid in pairs]
+
+    def register(links):
+        for student, course in links:
+            student.register_course(course)
+
+    return prepare, register
+
+
+@benchmark("db.import_records")
+def bench_import_records(ctx):
+    records = db.records_from_dict(ctx.data)
+    path = ctx.path("import.db")
+
+    def prepare():
+        if os.path.exists(path):
+            os.remove(path)
+        db.DB_FILE = path
+        db.init_db()
+
+    return prepare, lambda _: db.import_records(records)
+
+
+@benchmark("qt.refresh_records", requires="qt")
+def bench_refresh_records(ctx):
+    return _qt_window(ctx).refresh_records
+
+
+@benchmark("qt.update_dropdowns", requires="qt")
+def bench_update_dropdowns(ctx):
+    return _qt_window(ctx).update_dropdowns
+
+
+@benchmark("tk.refresh_treeview", requires="tk")
+def bench_refresh_treeview(ctx):
+    app = _tk_app(ctx)
+    app.students, app.instructors, app.courses = lab3_objects(ctx.data)
+    return app.refresh_treeview
+
+
+@benchmark("tk.search_records", requires="tk")
+def bench_search_records(ctx):
+    import tkinter
+
+    import sms
+    from main import Student, Instructor, Course
+
+    try:
+        sms.build_gui()
+    except tkinter.TclError as e:
+        raise SkipBenchmark(f"no display: {e}")
+    sms.students = [Student(s["name"], s["age"], s["email"], s["student_id"])
+                    for s in ctx.data["students"]]
+    sms.instructors = [Instructor(i["name"], i["age"], i["email"], i["instructor_id"])
+                       for i in ctx.data["instructors"]]
+    sms.courses = [Course(c["course_id"], c["course_name"], None) for c in ctx.data["courses"]]
+    sms.search_entry.insert(0, "an")
+    return sms.search_records
+
+
+def measure(fn, ctx, repeat):
+    """
+    Run one benchmark.
+
+    :param fn: Registered benchmark function.
+    :param ctx: Shared benchmark state.
+    :type ctx: Context
+    :param repeat: Number of timed runs.
+    :type repeat: int
+    :return: Timings in milliseconds and peak traced memory in KiB.
+    :rtype: dict
+    """
+    made = fn(ctx)
+    if isinstance(made, tuple):
+        prepare, op = made
+    else:
+        prepare, op = None, (lambda _: made())
+
+    times = []
+    for _ in range(repeat):
+        arg = prepare() if prepare else None
+        start = time.perf_counter()
+        op(arg)
+        times.append((time.perf_counter() - start) * 1000.0)
+
+    arg = prepare() if prepare else None
+    tracemalloc.start()
+    try:
+        op(arg)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "runs": repeat,
+        "min_ms": round(min(times), 3),
+        "median_ms": round(statistics.median(times), 3),
+        "peak_kib": round(peak / 1024.0, 1),
+    }
+
+
+def current_commit():
+    """
+    Get the abbreviated hash of the checked out git commit.
+
+    :return: Commit hash, or ``"unknown"`` outside a git checkout.
+    :rtype: str
+    """
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def previous_results(path, commit):
+    """
+    Load the most recent result per benchmark and size from other commits.
+
+    :param path: Results file.
+    :type path: str
+    :param commit: Commit to exclude.
+    :type commit: str
+    :return: Mapping of ``(benchmark, sizes)`` to a result row.
+    :rtype: dict
+    """
+    latest = {}
+    if not os.path.exists(path):
+        return latest
+    with open(path) as f:
+        for line in f:
+            row = json.loads(line)
+            if row["commit"] != commit:
+                latest[(row["benchmark"], json.dumps(row["sizes"], sort_keys=True))] = row
+    return latest
+
+
+def run(sizes, repeat=5, name_filter=None, output="bench_results.jsonl", compare=False):
+    """
+    Run the registered benchmarks and print a results table.
+
+    :param sizes: Arguments for :func:`school.synth.generate`.
+    :type sizes: dict
+    :param repeat: Number of timed runs per benchmark.
+    :type repeat: int
+    :param name_filter: Only run benchmarks whose name contains this text.
+    :type name_filter: str
+    :param output: JSON-lines file to append results to, or None.
+    :type output: str
+    :param compare: Show the change against the last result from another commit.
+    :type compare: bool
+    :return: Result rows.
+    :rtype: list[dict]
+    """
+    commit = current_commit()
+    previous = previous_results(output, commit) if compare and output else {}
+    data = synth.generate(**sizes)
+    results = []
+    saved_db_file = db.DB_FILE
+
+    print(f"{'benchmark':<24}{'median ms':>12}{'min ms':>12}{'peak KiB':>12}")
+    with tempfile.TemporaryDirectory() as workdir, virtual_display():
+        ctx = Context(data, workdir)
+        for name, requires, fn in BENCHMARKS:
+            if name_filter and name_filter not in name:
+                continue
+            try:
+                result = measure(fn, ctx, repeat)
+            except SkipBenchmark as e:
+                print(f"{name:<24}  skipped: {e}")
+                continue
+            row = {"commit": commit, "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                   "benchmark": name, "sizes": sizes, **result}
+            results.append(row)
+
+            line = f"{name:<24}{result['median_ms']:>12.2f}{result['min_ms']:>12.2f}{result['peak_kib']:>12.1f}"
+            before = previous.get((name, json.dumps(sizes, sort_keys=True)))
+            if before and before["median_ms"]:
+                change = (result["median_ms"] - before["median_ms"]) / before["median_ms"] * 100.0
+                line += f"   {change:+.1f}% vs {before['commit']}"
+            print(line)
+    db.DB_FILE = saved_db_file
+
+    if output and results:
+        with open(output, "a") as f:
+            for row in results:
+                f.write(json.dumps(row) + "\n")
+    return results
@@ -0,0 +1,276 @@
+"""
+One database file per campus.
+
+A :class:`District` maps campus names to database files (*shards*) with
+the same schema. Writes go to one campus: :meth:`District.use` points
+:data:`school.db.DB_FILE` at that campus's file, so every function of
+:mod:`school.db` (and the apps built on it) then reads and writes that
+campus only, and each file stays as small as its campus.
+
+District-wide lists, searches and reports go through :meth:`District.query`,
+which runs one ``SELECT`` against every shard with the campus name added
+as the first column. Up to SQLite's limit on attached databases (10 by
+default) the shards are ``ATTACH``-ed to one connection and the parts are
+combined with ``UNION ALL``, so SQLite sorts and limits the result in one
+statement; with more shards each one is queried on its own thread and
+the sorted parts are merged.
+
+The campuses are configured as ``name=file`` pairs, e.g. in the
+``SCHOOL_CAMPUSES`` environment variable::
+
+    SCHOOL_CAMPUSES="north=north.db, south=south.db"
+"""
+
+import heapq
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from operator import itemgetter
+
+from school import db
+
+# SQLite's default SQLITE_MAX_ATTACHED, for Pythons without getlimit().
+DEFAULT_MAX_ATTACHED = 10
+
+COLUMNS = {
+    "students": "id, name, age, email",
+    "instructors": "id, name, age, email",
+    "courses": ("id, name, instructor_id, "
+                "(SELECT COUNT(*) FROM {db}.registrations r WHERE r.course_id = c.id) AS enrolled"),
+}
+
+
+def parse_campuses(text):
+    """
+    Parse a campus list such as ``north=north.db, south=south.db``.
+
+    :param text: Comma separated ``name=file`` pairs.
+    :type text: str
+    :return: Campus name to database file, in the given order.
+    :rtype: dict[str, str]
+    :raises ValueError: If a pair has no name or file, or a name is
+        given twice.
+    """
+    campuses = {}
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        name, _, db_file = (s.strip() for s in part.partition("="))
+        if not name or not db_file:
+            raise ValueError(f"Invalid campus: {part.strip()!r} (expected e.g. north=north.db)")
+        if name in campuses:
+            raise ValueError(f"Campus {name} is given twice")
+        campuses[name] = db_file
+    return campuses
+
+
+def district_from_env():
+    """
+    Build a :class:`District` from the ``SCHOOL_CAMPUSES`` environment
+    variable.
+
+    :return: The district, or None if the variable is not set.
+    :rtype: District
+    :raises ValueError: If the variable is malformed.
+    """
+    text = os.environ.get("SCHOOL_CAMPUSES")
+    if not text:
+        return None
+    return District(parse_campuses(text))
+
+
+def _like(text):
+    return "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def _attach_limit():
+    conn = sqlite3.connect(":memory:")
+    try:
+        return conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    except AttributeError:
+        return DEFAULT_MAX_ATTACHED
+    finally:
+        conn.close()
+
+
+class District:
+    """
+    The campus databases of a district.
+
+    Use it as a context manager, or call :meth:`close`.
+
+    :param campuses: Campus name to database file.
+    :type campuses: dict[str, str]
+    :param max_attached: Most shards queried through ``ATTACH``; defaults
+        to SQLite's limit. With more shards they are queried one by one.
+    :type max_attached: int
+    :raises ValueError: If there are no campuses.
+    """
+
+    def __init__(self, campuses, max_attached=None):
+        if not campuses:
+            raise ValueError("No campuses given")
+        self.campuses = dict(campuses)
+        self.max_attached = max_attached if max_attached is not None else _attach_limit()
+        self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Close the connection the shards are attached to."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def route(self, campus):
+        """
+        Get the database file of a campus.
+
+        :param campus: Name of the campus.
+        :type campus: str
+        :rtype: str
+        :raises ValueError: If there is no such campus.
+        """
+        try:
+            return self.campuses[campus]
+        except KeyError:
+            raise ValueError(f"Unknown campus {campus} (known: {', '.join(self.campuses)})") from None
+
+    def use(self, campus):
+        """
+        Send the reads and writes of :mod:`school.db` to a campus from now
+        on.
+
+        :param campus: Name of the campus.
+        :type campus: str
+        :return: The campus's database file.
+        :rtype: str
+        :raises ValueError: If there is no such campus.
+        """
+        db.DB_FILE = self.route(campus)
+        return db.DB_FILE
+
+    def init_db(self):
+        """Create or migrate the schema of every shard."""
+        for db_file in self.campuses.values():
+            db.init_db(db_file)
+
+    @property
+    def attached(self):
+        """
+        Whether district queries attach the shards to one connection.
+
+        :rtype: bool
+        """
+        return len(self.campuses) <= self.max_attached
+
+    def _attached_connection(self):
+        if self._conn is None:
+            conn = db.connect(":memory:")
+            for number, db_file in enumerate(self.campuses.values()):
+                conn.execute(f"ATTACH DATABASE ? AS shard{number}", (db_file,))
+            self._conn = conn
+        return self._conn
+
+    def query(self, select, params=(), order_by=(), limit=None):
+        """
+        Run a query against every campus.
+
+        :param select: One ``SELECT`` with ``{db}`` in front of every table
+            name, e.g. ``SELECT id, name FROM {db}.students WHERE age > ?``.
+        :type select: str
+        :param params: Its parameters, applied to each campus.
+        :type params: tuple
+        :param order_by: Positions of the result columns to sort on,
+            counting the campus as 0. The columns must not be NULL.
+        :type order_by: tuple[int]
+        :param limit: Most rows returned.
+        :type limit: int
+        :return: Rows of ``(campus, *columns)``, in no particular order
+            without ``order_by``.
+        :rtype: list[tuple]
+        """
+        order = f" ORDER BY {', '.join(str(i + 1) for i in order_by)}" if order_by else ""
+        tail = order + (" LIMIT ?" if limit is not None else "")
+        tail_params = (limit,) if limit is not None else ()
+        part = "SELECT ?, * FROM ({select})"
+        if self.attached:
+            parts, values = [], []
+            for number, campus in enumerate(self.campuses):
+                parts.append(part.format(select=select.format(db=f"shard{number}")))
+                values += [campus, *params]
+            sql = " UNION ALL ".join(parts) + tail
+            return self._attached_connection().execute(sql, values + list(tail_params)).fetchall()
+
+        sql = part.format(select=select.format(db="main")) + tail
+
+        def run(item):
+            campus, db_file = item
+            conn = db.connect(db_file)
+            try:
+                return conn.execute(sql, (campus, *params, *tail_params)).fetchall()
+            finally:
+                conn.close()
+
+        with ThreadPoolExecutor(max_workers=min(len(self.campuses), 8)) as pool:
+            results = list(pool.map(run, self.campuses.items()))
+        rows = heapq.merge(*results, key=itemgetter(*order_by)) if order_by else (
+            row for result in results for row in result)
+        return list(islice(rows, limit))
+
+    def search(self, table, text=None, limit=None):
+        """
+        List the students, instructors or courses of every campus, ordered
+        by ID and campus.
+
+        :param table: ``students``, ``instructors`` or ``courses``.
+        :type table: str
+        :param text: Only rows whose ID or name (or a person's email)
+            contains this text.
+        :type text: str
+        :param limit: Most rows returned.
+        :type limit: int
+        :return: Rows of ``(campus, id, name, age, email)`` for people and
+            ``(campus, id, name, instructor_id, enrolled)`` for courses.
+        :rtype: list[tuple]
+        """
+        select = f"SELECT {COLUMNS[table]} FROM {{db}}.{table}" + (" c" if table == "courses" else "")
+        params = ()
+        if text:
+            fields = ["id", "name"] + (["email"] if table != "courses" else [])
+            select += " WHERE " + " OR ".join(f"{f} LIKE ? ESCAPE '\\'" for f in fields)
+            params = (_like(text),) * len(fields)
+        return self.query(select, params, order_by=(1, 0), limit=limit)
+
+    def locate(self, table, id_value):
+        """
+        Find the campuses holding a record, to route a write to it.
+
+        :param table: ``students``, ``instructors`` or ``courses``.
+        :type table: str
+        :param id_value: ID of the record.
+        :type id_value: str
+        :return: Names of the campuses with that ID.
+        :rtype: list[str]
+        """
+        return [r[0] for r in self.query(f"SELECT id FROM {{db}}.{table} WHERE id = ?", (id_value,))]
+
+    def report(self):
+        """
+        Count the records of every campus.
+
+        :return: Rows of ``(campus, students, instructors, courses,
+            registrations)``, one per campus in configuration order,
+            followed by the district totals with campus ``None``.
+        :rtype: list[tuple]
+        """
+        rows = self.query("SELECT (SELECT COUNT(*) FROM {db}.students), (SELECT COUNT(*) FROM {db}.instructors), "
+                          "(SELECT COUNT(*) FROM {db}.courses), (SELECT COUNT(*) FROM {db}.registrations)")
+        position = {campus: number for number, campus in enumerate(self.campuses)}
+        rows.sort(key=lambda r: position[r[0]])
+        return rows + [(None, *(sum(column) for column in list(zip(*rows))[1:]))]
@@ -0,0 +1,765 @@
+"""
+Command-line interface for batch operations on the school database.
+
+Run from the ``PyQt`` directory::
+
+    python -m school import data.json
+    python -m school export school_records.csv
+    python -m school backup backup_school.db
+    python -m school report
+    python -m school check
+    python -m school enroll C101 S1 S2 S3
+    python -m school capacity C101 30
+    python -m school schedule C101 "Mon 09:00-10:30 B101; Wed 09:00-10:30 B101"
+    python -m school schedule
+    python -m school history C101 --on 2024-03-01
+    python -m school history --student S1 --from 2024-01-08 --to 2024-05-03
+    python -m school dupes --threshold 0.9
+    python -m school recommend S1 -k 5
+    python -m school recommend --course C101
+    python -m school exams --rooms "B101:120, B102:60"
+    python -m school --campuses "north=north.db, south=south.db" --campus north report
+    python -m school --campuses "north=north.db, south=south.db" district students smith
+    python -m school memory --top 5
+    python -m school loadtest --workers 8 --duration 30 --mix "register=80,refresh=20"
+    python -m school serve --port 8765
+
+Only the standard library, the SQLite data layer and the model classes
+from ``main.py`` are imported, so the CLI starts quickly and works on a
+headless machine.
+"""
+
+import argparse
+import os
+import sys
+
+from school import db
+
+
+def _load_records(filename):
+    """
+    Read students, instructors, courses and registrations from a file.
+
+    JSON files use the format written by the Tkinter app's ``save_data``;
+    CSV files use the sectioned format written by ``export``.
+
+    :param filename: Path of the file to read.
+    :type filename: str
+    :return: Dictionary with ``students``, ``instructors``, ``courses``
+        and ``registrations`` lists of row tuples.
+    :rtype: dict
+    """
+    if filename.lower().endswith(".csv"):
+        return _read_csv(filename)
+    return _read_json(filename)
+
+
+def _read_json(filename):
+    from school.atomic import load_json
+
+    return db.records_from_dict(load_json(filename))
+
+
+def _read_csv(filename):
+    import csv
+    from school.timetable import parse_slot
+
+    sections = {
+        "--- Students ---": "students",
+        "--- Instructors ---": "instructors",
+        "--- Courses ---": "courses",
+        "--- Registrations ---": "registrations",
+        "--- Timetable ---": "slots",
+        "--- Capacity ---": "capacity",
+        "--- Waitlist ---": "waitlist",
+    }
+    records = {"students": [], "instructors": [], "courses": [], "registrations": [], "slots": [],
+               "capacity": [], "waitlist": []}
+    current = None
+    skip_header = False
+    with open(filename, "r", newline="") as f:
+        for row in csv.reader(f):
+            if not row:
+                continue
+            if row[0] in sections:
+                current = sections[row[0]]
+                skip_header = True
+                continue
+            if skip_header:
+                skip_header = False
+                continue
+            if current == "courses":
+                row = [row[0], row[1], row[2] if len(row) > 2 and row[2] not in ("", "None") else None]
+            if current == "slots":
+                row = [row[0]] + list(parse_slot(row[1]))
+            if current:
+                records[current].append(tuple(row))
+    return records
+
+
+def _validate_chunk(key, rows):
+    """
+    Validate one chunk of students or instructors; runs in a worker process.
+
+    :param key: ``students`` or ``instructors``.
+    :type key: str
+    :param rows: Rows ``(id, name, age, email)``.
+    :type rows: list[tuple]
+    :return: The valid rows and ``(id, message)`` for each rejected row.
+    :rtype: tuple[list[tuple], list[tuple[str, str]]]
+    """
+    from main import Student, Instructor
+
+    cls = Student if key == "students" else Instructor
+    valid = []
+    errors = []
+    for row in rows:
+        try:
+            person = cls(row[1], int(row[2]), row[3], row[0])
+            valid.append((row[0], person.name, person.age, person.get_email()))
+        except (ValueError, TypeError) as e:
+            errors.append((row[0], f"{key[:-1]} {row[0]}: {e}"))
+    return valid, errors
+
+
+def _validate(records, workers=1, chunk_size=None):
+    """
+    Validate people through the model classes and drop invalid rows.
+
+    Large inputs are validated in chunks by a pool of worker processes;
+    valid rows and errors are merged back in input order.
+
+    :param records: Records as returned by :func:`_load_records`.
+    :type records: dict
+    :param workers: Number of worker processes, None for one per CPU.
+    :type workers: int
+    :param chunk_size: Rows per chunk handed to a worker.
+    :type chunk_size: int
+    :return: List of error messages, one per rejected row.
+    :rtype: list[str]
+    """
+    from functools import partial
+    from school.parallel import map_chunks, DEFAULT_CHUNK_SIZE
+
+    if chunk_size is None:
+        chunk_size = DEFAULT_CHUNK_SIZE
+    errors = []
+    rejected = set()
+    for key in ("students", "instructors"):
+        valid = []
+        for chunk_valid, chunk_errors in map_chunks(partial(_validate_chunk, key), records[key],
+                                                    workers, chunk_size):
+            valid.extend(chunk_valid)
+            for row_id, message in chunk_errors:
+                errors.append(message)
+                if key == "students":
+                    rejected.add(row_id)
+        records[key] = valid
+    records["registrations"] = [r for r in records["registrations"] if r[0] not in rejected]
+    return errors
+
+
+def cmd_import(args):
+    """Import a JSON or CSV file into the database in a single transaction."""
+    from school.dedupe import claim_emails
+
+    if args.chunk_size is not None and args.chunk_size < 1:
+        print("--chunk-size must be at least 1", file=sys.stderr)
+        return 2
+    records = _load_records(args.file)
+    errors = _validate(records, args.workers, args.chunk_size)
+
+    db.init_db()
+    for key in ("students", "instructors"):
+        records[key], taken = claim_emails(records[key], db.email_owners(key))
+        errors += [f"{key[:-1]} {row_id}: {message}" for row_id, message in taken]
+        if key == "students" and taken:
+            rejected = {row_id for row_id, _ in taken}
+            records["registrations"] = [r for r in records["registrations"] if r[0] not in rejected]
+    db.import_records(records)
+
+    for e in errors:
+        print(f"skipped {e}", file=sys.stderr)
+    print(f"imported {len(records['students'])} students, "
+          f"{len(records['instructors'])} instructors, "
+          f"{len(records['courses'])} courses, "
+          f"{len(records['registrations'])} registrations")
+    return 1 if errors else 0
+
+
+def cmd_export(args):
+    """Export the database to CSV, or to JSON in the Tkinter app's format."""
+    if args.file.lower().endswith(".json"):
+        from school.atomic import dump_json
+
+        courses_of = {}
+        students_of = {}
+        for sid, cid in db.execute_query("SELECT student_id, course_id FROM registrations", fetch=True):
+            courses_of.setdefault(sid, []).append(cid)
+            students_of.setdefault(cid, []).append(sid)
+        capacity = dict(db.execute_query("SELECT course_id, capacity FROM course_seats", fetch=True))
+        waiting = {}
+        for cid, sid in db.execute_query("SELECT course_id, student_id FROM waitlist ORDER BY id", fetch=True):
+            waiting.setdefault(cid, []).append(sid)
+        assigned = {}
+        courses = []
+        for cid, name, iid, slots, _ in db.course_rows():
+            if iid:
+                assigned.setdefault(iid, []).append(cid)
+            courses.append({"course_id": cid, "course_name": name, "instructor": iid,
+                            "enrolled_students": students_of.get(cid, []), "slots": slots,
+                            "capacity": capacity.get(cid), "waitlist": waiting.get(cid, [])})
+        data = {
+            "students": [
+                {"type": "student", "name": name, "age": age, "email": email,
+                 "student_id": sid, "registered_courses": courses_of.get(sid, [])}
+                for sid, name, age, email in db.execute_query("SELECT * FROM students", fetch=True)
+            ],
+            "instructors": [
+                {"type": "instructor", "name": name, "age": age, "email": email,
+                 "instructor_id": iid, "assigned_courses": assigned.get(iid, [])}
+                for iid, name, age, email in db.execute_query("SELECT * FROM instructors", fetch=True)
+            ],
+            "courses": courses,
+        }
+        dump_json(data, args.file)
+    else:
+        db.write_csv(args.file)
+    print(f"exported to {args.file}")
+    return 0
+
+
+def cmd_backup(args):
+    """Back up the database file."""
+    db.backup(args.dest)
+    print(f"database backed up to {args.dest}")
+    return 0
+
+
+def cmd_enroll(args):
+    """Register students in a course, copy a roster, or drop students or a whole section."""
+    if args.drop is not None:
+        # Both "enroll C1 --drop S1" and "enroll C1 S1 --drop" drop S1.
+        students = args.students + args.drop
+        if students:
+            removed = db.drop_students(args.course, students)
+        else:
+            removed = db.drop_section(args.course)
+        print(f"removed {removed} registrations from {args.course}")
+        return 0
+    added = waitlisted = 0
+    try:
+        if args.copy_from:
+            result = db.copy_roster(args.copy_from, args.course)
+            added, waitlisted = added + result.added, waitlisted + result.waitlisted
+        if args.students:
+            result = db.enroll_students(args.course, args.students)
+            added, waitlisted = added + result.added, waitlisted + result.waitlisted
+    except db.ClashError as e:
+        _print_clashes(e.clashes)
+        return 1
+    print(f"added {added} registrations to {args.course}"
+          + (f", {waitlisted} students waitlisted" if waitlisted else ""))
+    return 0
+
+
+def cmd_capacity(args):
+    """Set or show a course's number of seats and its waitlist."""
+    if args.seats is not None:
+        seats = None if args.seats.lower() == "none" else int(args.seats)
+        promoted = db.set_capacity(args.course, seats)
+        if promoted:
+            print(f"promoted {promoted} students from the waitlist")
+    rows = [r for r in db.course_rows() if r[0] == args.course]
+    if not rows:
+        print(f"no course {args.course}", file=sys.stderr)
+        return 1
+    print(f"{args.course}: {rows[0][4] or 'unlimited seats'}")
+    for position, sid in enumerate(db.waitlist(args.course), 1):
+        print(f"{position:>4}. {sid}")
+    return 0
+
+
+def cmd_history(args):
+    """Show who was in a course at a given time, or a student's past courses."""
+    if not args.course and not args.student:
+        print("give a course, or --student", file=sys.stderr)
+        return 1
+    try:
+        if args.student:
+            rows = db.student_history(args.student, args.start, args.end)
+        else:
+            instructor = db.instructor_at(args.course, args.on)
+            roster = db.roster_at(args.course, args.on)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    if args.student:
+        for course_id, valid_from, valid_to in rows:
+            print(f"{course_id:<12} {valid_from or 'before history':<23}  {valid_to or 'now'}")
+        if not rows:
+            print(f"no courses for {args.student}")
+        return 0
+    print(f"{args.course} on {args.on or 'now'}: instructor {instructor or 'none'}")
+    for sid in roster:
+        print(f"  {sid}")
+    return 0
+
+
+def cmd_schedule(args):
+    """Set a course's weekly slots and rooms, or find every clash."""
+    from school.timetable import parse_slots
+
+    if args.course is None:
+        clashes = db.all_clashes()
+        _print_clashes(clashes)
+        if not clashes:
+            print("no clashes")
+        return 1 if clashes else 0
+    try:
+        db.set_course_slots(args.course, parse_slots(args.slots or ""))
+    except db.ClashError as e:
+        _print_clashes(e.clashes)
+        return 1
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    print(f"{args.course}: {args.slots or 'no slots'}")
+    return 0
+
+
+def _print_clashes(clashes):
+    for kind, owner, course_id, other in clashes:
+        print(f"clash: {kind} {owner} is booked for both {course_id} and {other}", file=sys.stderr)
+
+
+def cmd_serve(args):
+    """Serve the database over a local HTTP/JSON API."""
+    from school import service
+
+    print(f"serving {db.DB_FILE} on http://{args.host}:{args.port}/ (Ctrl+C to stop)")
+    service.run(args.host, args.port)
+    return 0
+
+
+def cmd_report(args):
+    """Print record counts and per-course enrolment."""
+    counts = db.execute_query(
+        "SELECT (SELECT COUNT(*) FROM students), (SELECT COUNT(*) FROM instructors), "
+        "(SELECT COUNT(*) FROM courses), (SELECT COUNT(*) FROM registrations)",
+        fetch=True,
+    )[0]
+    print(f"students:      {counts[0]}")
+    print(f"instructors:   {counts[1]}")
+    print(f"courses:       {counts[2]}")
+    print(f"registrations: {counts[3]}")
+    rows = db.execute_query(
+        "SELECT c.id, c.name, COALESCE(i.name, ''), COUNT(r.student_id) "
+        "FROM courses c "
+        "LEFT JOIN instructors i ON i.id = c.instructor_id "
+        "LEFT JOIN registrations r ON r.course_id = c.id "
+        "GROUP BY c.id ORDER BY c.id",
+        fetch=True,
+    )
+    if rows:
+        print()
+        print(f"{'Course':<12}{'Name':<30}{'Instructor':<25}{'Enrolled':>8}")
+        for cid, name, instructor, enrolled in rows:
+            print(f"{cid:<12}{name:<30}{instructor:<25}{enrolled:>8}")
+    return 0
+
+
+def cmd_check(args):
+    """Run SQLite's integrity checks and look for orphaned rows."""
+    if args.fix:
+        for label, count in db.cleanup_orphans().items():
+            if count:
+                print(f"fixed {label}: {count}")
+    problems = db.integrity_problems()
+    for p in problems:
+        print(p)
+    if not problems:
+        print("ok")
+    return 1 if problems else 0
+
+
+def cmd_dupes(args):
+    """List people that were probably entered twice under different IDs."""
+    from school.dedupe import find_duplicates
+
+    found = 0
+    for table in ("students", "instructors"):
+        rows = db.execute_query(f"SELECT id, name, age, email FROM {table}", fetch=True)
+        matches = find_duplicates(rows, args.threshold, args.max_bucket)
+        found += len(matches)
+        for m in matches[:args.limit]:
+            print(f"{table[:-1]:<10} {m.first:<12} {m.second:<12} {m.score:.3f}  {m.reason}")
+        if len(matches) > args.limit:
+            print(f"... and {len(matches) - args.limit} more {table}")
+    if not found:
+        print("no duplicates")
+    return 1 if found else 0
+
+
+def cmd_recommend(args):
+    """Suggest courses for a student, or list courses taken with a course."""
+    from school.recommend import CoEnrolment
+
+    if not args.student and not args.course:
+        print("give a student, or --course", file=sys.stderr)
+        return 1
+    conn = db.connect()
+    try:
+        engine = CoEnrolment.from_db(conn)
+    finally:
+        conn.close()
+    if args.course:
+        pairs = engine.similar(args.course, args.k)
+    else:
+        pairs = engine.recommend(args.student, args.k)
+    for course_id, score in pairs:
+        print(f"{course_id:<12} {score:.4f}")
+    if not pairs:
+        print("no recommendations")
+    return 0
+
+
+def cmd_exams(args):
+    """Give every course an exam slot and room without student conflicts."""
+    from school.exams import load_enrolments, parse_rooms, schedule_exams
+
+    try:
+        rooms = parse_rooms(args.rooms or "")
+        conn = db.connect()
+        try:
+            enrolments = load_enrolments(conn)
+        finally:
+            conn.close()
+        exams = schedule_exams(enrolments, rooms)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    for exam in exams:
+        print(f"slot {exam.slot:<4} {exam.course:<12} {exam.room or '-':<10} {exam.students}")
+    print(f"{len(exams)} exams in {max((e.slot for e in exams), default=0)} slots")
+    return 0
+
+
+def _district(args):
+    from school.campus import District, parse_campuses
+
+    return District(parse_campuses(args.campuses or ""))
+
+
+def cmd_district(args):
+    """List, search or count records across every campus."""
+    try:
+        district = _district(args)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    with district:
+        district.init_db()
+        if args.what == "report":
+            print(f"{'Campus':<12}{'Students':>10}{'Instructors':>13}{'Courses':>9}{'Registrations':>15}")
+            for campus, *counts in district.report():
+                print(f"{campus or 'total':<12}{counts[0]:>10}{counts[1]:>13}{counts[2]:>9}{counts[3]:>15}")
+            return 0
+        rows = district.search(args.what, args.text, args.limit)
+    for row in rows:
+        print("  ".join(str(value) if value is not None else "-" for value in row))
+    if not rows:
+        print(f"no {args.what}")
+    return 0
+
+
+def cmd_memory(args):
+    """Load every record into model objects and report what they cost."""
+    from school import memory as report
+    from school.mapper import Mapper
+
+    if not args.no_trace:
+        report.memory.enable()
+    before = report.MemorySnapshot("before load")
+    with Mapper(batch_size=args.batch_size) as mapper:
+        students = list(mapper.iterate("student"))
+        instructors = list(mapper.iterate("instructor"))
+        courses = list(mapper.iterate("course"))
+        # Loading one lazy list loads it for every mapped object.
+        for objects, attrs in ((students, ("registered_courses",)), (instructors, ("assigned_courses",)),
+                               (courses, ("enrolled_students", "waitlist"))):
+            for attr in attrs:
+                if objects:
+                    len(getattr(objects[0], attr))
+    after = report.MemorySnapshot("loaded", {"students": len(students), "instructors": len(instructors),
+                                             "courses": len(courses)})
+    print(after.format(args.top))
+    print()
+    for name, usage in after.classes.items():
+        if usage.count:
+            print(f"  {name:<14}{usage.bytes / usage.count:>10,.0f} bytes each")
+    print()
+    print(after.diff(before, args.top).format())
+    retained = report.find_retained(students, instructors, courses)
+    for holder, attr, item in retained[:args.top]:
+        print(f"retained: {holder} {attr} -> {item}")
+    if not args.no_trace:
+        report.memory.disable()
+    return 1 if retained else 0
+
+
+def cmd_slowlog(args):
+    """Summarise a slow-query log by statement fingerprint."""
+    from school import profiling
+
+    rows = profiling.summarize_log(args.log)
+    if not rows:
+        print(f"no slow queries in {args.log}")
+        return 0
+    print(profiling.format_summary(rows, args.limit))
+    if args.plans:
+        for r in rows[:args.limit]:
+            print()
+            print(r["fingerprint"])
+            for step in r["plan"] or []:
+                print(f"    {step}")
+    return 0
+
+
+def cmd_synth(args):
+    """Generate a synthetic school into the database and/or a JSON file."""
+    from school import synth
+
+    data = synth.generate(args.students, args.instructors, args.courses, args.density, args.seed)
+    if args.json:
+        from school.atomic import dump_json
+
+        dump_json(data, args.json)
+        print(f"wrote {args.json}")
+    else:
+        synth.write_db(data)
+        print(f"wrote {db.DB_FILE}")
+    return 0
+
+
+def cmd_loadtest(args):
+    """Run many concurrent clerks against a copy of the database."""
+    import json
+    from school import loadtest
+
+    mode = "processes" if args.processes else "threads"
+    pace = f"{args.rate:g} ops/s each" if args.rate else "closed loop"
+    print(f"{args.workers} {mode}, {args.duration:g} s, {pace}, mix {args.mix}", file=sys.stderr)
+    try:
+        rows = loadtest.run(args.workers, args.duration, args.mix, args.rate, args.processes,
+                            args.in_place, args.journal_mode, args.seed)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    print(loadtest.format_summary(rows))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"workers": args.workers, "processes": args.processes, "duration": args.duration,
+                       "rate": args.rate, "mix": args.mix, "journal_mode": args.journal_mode,
+                       "results": rows}, f, indent=4)
+    return 1 if rows[-1]["locked"] or rows[-1]["errors"] else 0
+
+
+def cmd_bench(args):
+    """Run the benchmark suite."""
+    from school import bench
+
+    sizes = {"students": args.students, "instructors": args.instructors,
+             "courses": args.courses, "courses_per_student": args.density, "seed": args.seed}
+    bench.run(sizes, repeat=args.repeat, name_filter=args.filter,
+              output=None if args.no_save else args.output, compare=args.compare)
+    return 0
+
+
+def _add_size_arguments(p):
+    p.add_argument("--students", type=int, default=1000)
+    p.add_argument("--instructors", type=int, default=50)
+    p.add_argument("--courses", type=int, default=200)
+    p.add_argument("--density", type=int, default=5, help="courses per student")
+    p.add_argument("--seed", type=int, default=0)
+
+
+def build_parser():
+    """
+    Build the argument parser with one sub-command per operation.
+
+    :return: The configured parser.
+    :rtype: argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(prog="python -m school",
+                                     description="School Management System batch operations")
+    parser.add_argument("--db", default=db.DB_FILE, help="database file (default: %(default)s)")
+    parser.add_argument("--slow-query-ms", type=float,
+                        help="log statements slower than this and print a per-statement summary")
+    parser.add_argument("--slow-query-log", default="slow_queries.log",
+                        help="slow-query log file (default: %(default)s)")
+    parser.add_argument("--campuses", default=os.environ.get("SCHOOL_CAMPUSES"),
+                        help="one database per campus, e.g. 'north=north.db, south=south.db' "
+                             "(default: $SCHOOL_CAMPUSES)")
+    parser.add_argument("--campus", help="run the command on this campus's database instead of --db")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("import", help="import records from a JSON or CSV file")
+    p.add_argument("file")
+    p.add_argument("--workers", type=int, default=None,
+                   help="processes used to validate large files (default: one per CPU)")
+    p.add_argument("--chunk-size", type=int, default=None,
+                   help="rows validated per task (default: 20000)")
+    p.set_defaults(func=cmd_import, uses_db=False)
+
+    p = sub.add_parser("export", help="export records to CSV, or JSON if the name ends in .json")
+    p.add_argument("file", nargs="?", default="school_records.csv")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("backup", help="back up the database file")
+    p.add_argument("dest", nargs="?", default="backup_school.db")
+    p.set_defaults(func=cmd_backup)
+
+    p = sub.add_parser("enroll", help="register many students in a course at once")
+    p.add_argument("course", help="course ID")
+    p.add_argument("students", nargs="*", help="student IDs to register")
+    p.add_argument("--from", dest="copy_from", metavar="COURSE",
+                   help="also register every student of this course")
+    p.add_argument("--drop", nargs="*", metavar="STUDENT",
+                   help="remove these students (and any listed before it), or every student, "
+                        "from the course instead")
+    p.set_defaults(func=cmd_enroll)
+
+    p = sub.add_parser("capacity", help="set or show a course's seats and waitlist")
+    p.add_argument("course", help="course ID")
+    p.add_argument("seats", nargs="?", help="number of seats, or 'none' for no limit")
+    p.set_defaults(func=cmd_capacity)
+
+    p = sub.add_parser("history", help="show a course's roster at a past date, or a student's past courses")
+    p.add_argument("course", nargs="?", help="course ID")
+    p.add_argument("--on", help="date or time of the roster, e.g. 2024-03-01 (default: now)")
+    p.add_argument("--student", help="list this student's courses instead")
+    p.add_argument("--from", dest="start", help="with --student: start of the period (default: all history)")
+    p.add_argument("--to", dest="end", help="with --student: end of the period (default: now)")
+    p.set_defaults(func=cmd_history)
+
+    p = sub.add_parser("schedule", help="set a course's weekly slots, or list every clash")
+    p.add_argument("course", nargs="?", help="course ID; without one, every clash is listed")
+    p.add_argument("slots", nargs="?", help="e.g. 'Mon 09:00-10:30 B101; Wed 09:00-10:30 B101'")
+    p.set_defaults(func=cmd_schedule)
+
+    p = sub.add_parser("serve", help="serve the database over a local HTTP/JSON API")
+    p.add_argument("--host", default="127.0.0.1", help="interface to listen on (default: %(default)s)")
+    p.add_argument("--port", type=int, default=8765, help="port to listen on (default: %(default)s)")
+    p.set_defaults(func=cmd_serve)
+
+    p = sub.add_parser("report", help="print a summary report")
+    p.set_defaults(func=cmd_report)
+
+    p = sub.add_parser("check", help="check database integrity")
+    p.add_argument("--fix", action="store_true",
+                   help="delete orphaned registrations and clear unknown instructors first")
+    p.set_defaults(func=cmd_check)
+
+    p = sub.add_parser("dupes", help="find people entered twice under different IDs")
+    p.add_argument("--threshold", type=float, default=0.85,
+                   help="lowest name/email similarity reported, 0 to 1 (default: %(default)s)")
+    p.add_argument("--max-bucket", type=int, default=100,
+                   help="skip blocking buckets larger than this (default: %(default)s)")
+    p.add_argument("--limit", type=int, default=50, help="matches shown per table (default: %(default)s)")
+    p.set_defaults(func=cmd_dupes)
+
+    p = sub.add_parser("recommend", help="suggest courses from what similar students took")
+    p.add_argument("student", nargs="?", help="student ID")
+    p.add_argument("--course", help="list the courses most often taken with this one instead")
+    p.add_argument("-k", type=int, default=10, help="number of courses (default: %(default)s)")
+    p.set_defaults(func=cmd_recommend)
+
+    p = sub.add_parser("exams", help="schedule exams so that no student has two at once")
+    p.add_argument("--rooms", help="exam rooms and their seats, e.g. 'B101:120, B102:60' (default: no rooms)")
+    p.set_defaults(func=cmd_exams)
+
+    p = sub.add_parser("district", help="list, search or count records across every campus")
+    p.add_argument("what", choices=("report", "students", "instructors", "courses"))
+    p.add_argument("text", nargs="?", help="only records whose ID, name or email contains this")
+    p.add_argument("--limit", type=int, default=50, help="records shown (default: %(default)s)")
+    p.set_defaults(func=cmd_district, uses_db=False)
+
+    p = sub.add_parser("memory", help="load every record into objects and report the memory they use")
+    p.add_argument("--top", type=int, default=10, help="allocation sites shown (default: %(default)s)")
+    p.add_argument("--batch-size", type=int, default=500, help="rows loaded per query (default: %(default)s)")
+    p.add_argument("--no-trace", action="store_true",
+                   help="skip tracemalloc: faster, but only object counts and sizes are reported")
+    p.set_defaults(func=cmd_memory)
+
+    p = sub.add_parser("slowlog", help="summarise a slow-query log by statement")
+    p.add_argument("log", nargs="?", default="slow_queries.log")
+    p.add_argument("--limit", type=int, default=20)
+    p.add_argument("--plans", action="store_true", help="show the query plan of each statement")
+    p.set_defaults(func=cmd_slowlog, uses_db=False)
+
+    p = sub.add_parser("synth", help="generate a synthetic school")
+    _add_size_arguments(p)
+    p.add_argument("--json", help="write a JSON file instead of the database")
+    p.set_defaults(func=cmd_synth, uses_db=False)
+
+    p = sub.add_parser("loadtest", help="drive the database from many concurrent workers")
+    p.add_argument("--workers", type=int, default=4, help="concurrent clerks (default: %(default)s)")
+    p.add_argument("--duration", type=float, default=10.0, help="seconds to run (default: %(default)s)")
+    p.add_argument("--mix", default="register=55,refresh=15,dropdowns=10,drop=8,add_student=7,assign=4,export=1",
+                   help="operation weights (default: %(default)s)")
+    p.add_argument("--rate", type=float, help="operations per second per worker (default: as fast as possible)")
+    p.add_argument("--processes", action="store_true", help="run workers as processes instead of threads")
+    p.add_argument("--in-place", action="store_true",
+                   help="write to the database itself instead of a temporary copy")
+    p.add_argument("--journal-mode", choices=("wal", "delete", "truncate", "persist", "memory", "off"),
+                   help="journal mode of the tested file (default: that of the database)")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--json", help="also write the results to this JSON file")
+    p.set_defaults(func=cmd_loadtest)
+
+    p = sub.add_parser("bench", help="run the benchmark suite")
+    _add_size_arguments(p)
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--filter", help="only run benchmarks whose name contains this")
+    p.add_argument("--output", default="bench_results.jsonl", help="results file (default: %(default)s)")
+    p.add_argument("--no-save", action="store_true", help="do not append to the results file")
+    p.add_argument("--compare", action="store_true", help="compare with results from other commits")
+    p.set_defaults(func=cmd_bench, uses_db=False)
+
+    return parser
+
+
+def main(argv=None):
+    """
+    Entry point for ``python -m school``.
+
+    :param argv: Command-line arguments, defaults to ``sys.argv[1:]``.
+    :type argv: list[str]
+    :return: Process exit code.
+    :rtype: int
+    """
+    args = build_parser().parse_args(argv)
+    db.DB_FILE = args.db
+    if args.campus:
+        try:
+            _district(args).use(args.campus)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 2
+
+    profiler = None
+    if args.slow_query_ms is not None:
+        from school.profiling import QueryProfiler, format_summary
+
+        profiler = QueryProfiler(args.slow_query_ms, args.slow_query_log)
+        profiler.install()
+
+    if getattr(args, "uses_db", True):
+        db.init_db()
+    try:
+        return args.func(args)
+    finally:
+        if profiler is not None:
+            profiler.uninstall()
+            print(format_summary(profiler.summary()), file=sys.stderr)
@@ -0,0 +1,1274 @@
+import csv
+import logging
+import random
+import sqlite3
+import time
+from collections import namedtuple
+from datetime import date, datetime
+
+from school.instrument import instrumentation
+from school.timetable import ClashError, Slot, find_clashes, format_slot, format_slots, parse_slots
+
+
+DB_FILE = "school.db"
+
+# Seconds a connection waits for another writer's lock (SQLite's busy
+# timeout), then how often and how long with_retry tries again.
+BUSY_TIMEOUT = 5.0
+RETRY_ATTEMPTS = 5
+RETRY_DELAY = 0.05
+
+# Callables run after every statement of execute_query, execute_many,
+# delete_ids, import_records and cleanup_orphans as
+# hook(query, params, duration_ms, rows).
+query_hooks = []
+
+logger = logging.getLogger(__name__)
+
+
+def connect(db_file=None):
+    """
+    Open a connection to a database file with foreign keys enforced and
+    a busy timeout of :data:`BUSY_TIMEOUT` seconds.
+
+    :param db_file: Database file, defaults to :data:`DB_FILE`.
+    :type db_file: str
+    :return: A new SQLite connection.
+    :rtype: sqlite3.Connection
+    """
+    conn = sqlite3.connect(db_file or DB_FILE, timeout=BUSY_TIMEOUT)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    return conn
+
+
+def is_locked(error):
+    """
+    Tell whether an error means another connection holds the lock.
+
+    :param error: Exception raised by sqlite3.
+    :type error: Exception
+    :rtype: bool
+    """
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ("locked" in message or "busy" in message)
+
+
+def with_retry(fn, *args, attempts=RETRY_ATTEMPTS, delay=RETRY_DELAY):
+    """
+    Call ``fn(*args)``, retrying with exponential backoff and jitter while
+    the database is locked by another writer.
+
+    The busy timeout covers most waits; this also covers the cases where
+    SQLite reports a lock at once, such as a read transaction that cannot
+    be upgraded to a write.
+
+    :param fn: Function that opens its own transaction.
+    :type fn: callable
+    :param attempts: Maximum number of calls.
+    :type attempts: int
+    :param delay: Delay before the first retry in seconds; doubles each time.
+    :type delay: float
+    :return: The function's result.
+    """
+    for attempt in range(attempts):
+        try:
+            return fn(*args)
+        except sqlite3.OperationalError as e:
+            if not is_locked(e) or attempt == attempts - 1:
+                raise
+            time.sleep(delay * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+class ChangeWatcher:
+    """
+    Detects commits made by other connections, including other processes,
+    with ``PRAGMA data_version`` on a connection kept open for the purpose.
+
+    Call :meth:`mark` just before reading data to display, and
+    :meth:`changed` periodically to learn whether it is out of date.
+
+    :param db_file: Database file, defaults to :data:`DB_FILE`.
+    :type db_file: str
+    """
+
+    def __init__(self, db_file=None):
+        self.conn = connect(db_file)
+        self.version = self._read()
+
+    def _read(self):
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def mark(self):
+        """Remember the current state as seen."""
+        self.version = self._read()
+
+    def changed(self):
+        """
+        Tell whether anything was committed since :meth:`mark` or the last
+        call that returned True.
+
+        :rtype: bool
+        """
+        version = self._read()
+        if version == self.version:
+            return False
+        self.version = version
+        return True
+
+    def close(self):
+        """Close the watcher's connection."""
+        self.conn.close()
+
+
+def add_query_hook(hook):
+    """
+    Register a function called after every statement run through
+    :func:`execute_query`, :func:`execute_many`, :func:`delete_ids`,
+    :func:`import_records` or :func:`cleanup_orphans`. An exception raised
+    by a hook is logged and does not affect the statement's result.
+
+    :param hook: Callable taking ``(query, params, duration_ms, rows)``.
+    :type hook: callable
+    """
+    if hook not in query_hooks:
+        query_hooks.append(hook)
+
+
+def remove_query_hook(hook):
+    """
+    Unregister a hook added with :func:`add_query_hook`.
+
+    :param hook: The hook to remove.
+    :type hook: callable
+    """
+    if hook in query_hooks:
+        query_hooks.remove(hook)
+
+
+# Bumped whenever init_db's schema changes in a way that needs migrate().
+SCHEMA_VERSION = 1
+
+TABLES = {
+    "students": """
+    CREATE TABLE IF NOT EXISTS students (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        age INTEGER NOT NULL,
+        email TEXT NOT NULL
+    )
+    """,
+    "instructors": """
+    CREATE TABLE IF NOT EXISTS instructors (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        age INTEGER NOT NULL,
+        email TEXT NOT NULL
+    )
+    """,
+    "courses": """
+    CREATE TABLE IF NOT EXISTS courses (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        instructor_id TEXT,
+        FOREIGN KEY (instructor_id) REFERENCES instructors(id) ON DELETE SET NULL
+    )
+    """,
+    "registrations": """
+    CREATE TABLE IF NOT EXISTS registrations (
+        student_id TEXT,
+        course_id TEXT,
+        PRIMARY KEY (student_id, course_id),
+        FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE,
+        FOREIGN KEY (course_id) REFERENCES courses(id) ON DELETE CASCADE
+    )
+    """,
+    # One row per weekly meeting; times are minutes from Monday 00:00
+    # (see school.timetable).
+    "course_slots": """
+    CREATE TABLE IF NOT EXISTS course_slots (
+        course_id TEXT NOT NULL,
+        start_min INTEGER NOT NULL,
+        end_min INTEGER NOT NULL,
+        room TEXT,
+        PRIMARY KEY (course_id, start_min),
+        FOREIGN KEY (course_id) REFERENCES courses(id) ON DELETE CASCADE
+    )
+    """,
+    # Courses without a row here have unlimited seats. ``taken`` is kept
+    # equal to the course's number of registrations by TRIGGERS, so a
+    # seat is claimed with one conditional statement.
+    "course_seats": """
+    CREATE TABLE IF NOT EXISTS course_seats (
+        course_id TEXT PRIMARY KEY,
+        capacity INTEGER NOT NULL,
+        taken INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY (course_id) REFERENCES courses(id) ON DELETE CASCADE
+    )
+    """,
+    # Students waiting for a seat, served in ``id`` order.
+    "waitlist": """
+    CREATE TABLE IF NOT EXISTS waitlist (
+        id INTEGER PRIMARY KEY,
+        course_id TEXT NOT NULL,
+        student_id TEXT NOT NULL,
+        UNIQUE (course_id, student_id),
+        FOREIGN KEY (course_id) REFERENCES courses(id) ON DELETE CASCADE,
+        FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE
+    )
+    """,
+    # Enrolment and assignment history, written by TRIGGERS. A row is
+    # valid from ``valid_from`` up to, not including, ``valid_to``; NULL
+    # means it still is. Times are local ISO strings (see HISTORY_CLOCK).
+    # There are no foreign keys, so history outlives deleted records.
+    "registration_history": """
+    CREATE TABLE IF NOT EXISTS registration_history (
+        student_id TEXT NOT NULL,
+        course_id TEXT NOT NULL,
+        valid_from TEXT NOT NULL,
+        valid_to TEXT
+    )
+    """,
+    "assignment_history": """
+    CREATE TABLE IF NOT EXISTS assignment_history (
+        course_id TEXT NOT NULL,
+        instructor_id TEXT NOT NULL,
+        valid_from TEXT NOT NULL,
+        valid_to TEXT
+    )
+    """,
+}
+
+# Child-side indexes, so cascades and joins on the foreign keys do not scan.
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS registrations_course ON registrations(course_id)",
+    "CREATE INDEX IF NOT EXISTS courses_instructor ON courses(instructor_id)",
+    "CREATE INDEX IF NOT EXISTS course_slots_room ON course_slots(room, start_min)",
+    # Index entries end with the rowid, so this also orders each course's queue.
+    "CREATE INDEX IF NOT EXISTS waitlist_course ON waitlist(course_id)",
+    "CREATE INDEX IF NOT EXISTS waitlist_student ON waitlist(student_id)",
+    # As-of queries scan the rows of one course or person that started
+    # before the given time.
+    "CREATE INDEX IF NOT EXISTS registration_history_course ON registration_history(course_id, valid_from)",
+    "CREATE INDEX IF NOT EXISTS registration_history_student ON registration_history(student_id, valid_from)",
+    "CREATE INDEX IF NOT EXISTS assignment_history_course ON assignment_history(course_id, valid_from)",
+    "CREATE INDEX IF NOT EXISTS assignment_history_instructor ON assignment_history(instructor_id, valid_from)",
+    # Finds the registrations dropped since a given time (school.recommend).
+    "CREATE INDEX IF NOT EXISTS registration_history_closed ON registration_history(valid_to)",
+]
+
+# One email per person, compared as school.dedupe.normalize_email does.
+# init_db skips a table that already holds duplicates; `check` reports them.
+UNIQUE_INDEXES = {
+    table: f"CREATE UNIQUE INDEX IF NOT EXISTS {table}_email ON {table}(lower(trim(email)))"
+    for table in ("students", "instructors")
+}
+
+# Millisecond local time, so a drop right after a registration still
+# sorts after it. Python's side is _instant().
+HISTORY_CLOCK = "strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')"
+
+TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS registrations_seat_taken AFTER INSERT ON registrations BEGIN
+        UPDATE course_seats SET taken = taken + 1 WHERE course_id = NEW.course_id;
+        DELETE FROM waitlist WHERE course_id = NEW.course_id AND student_id = NEW.student_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS registrations_seat_freed AFTER DELETE ON registrations BEGIN
+        UPDATE course_seats SET taken = taken - 1 WHERE course_id = OLD.course_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS registrations_history_open AFTER INSERT ON registrations BEGIN
+        INSERT INTO registration_history VALUES (NEW.student_id, NEW.course_id, {HISTORY_CLOCK}, NULL);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS registrations_history_close AFTER DELETE ON registrations BEGIN
+        UPDATE registration_history SET valid_to = {HISTORY_CLOCK}
+        WHERE student_id = OLD.student_id AND course_id = OLD.course_id AND valid_to IS NULL;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS courses_history_open AFTER INSERT ON courses
+    WHEN NEW.instructor_id IS NOT NULL BEGIN
+        INSERT INTO assignment_history VALUES (NEW.id, NEW.instructor_id, {HISTORY_CLOCK}, NULL);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS courses_history_change AFTER UPDATE OF instructor_id ON courses
+    WHEN OLD.instructor_id IS NOT NEW.instructor_id BEGIN
+        UPDATE assignment_history SET valid_to = {HISTORY_CLOCK}
+        WHERE course_id = OLD.id AND valid_to IS NULL;
+        INSERT INTO assignment_history SELECT NEW.id, NEW.instructor_id, {HISTORY_CLOCK}, NULL
+        WHERE NEW.instructor_id IS NOT NULL;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS courses_history_close AFTER DELETE ON courses BEGIN
+        UPDATE assignment_history SET valid_to = {HISTORY_CLOCK}
+        WHERE course_id = OLD.id AND valid_to IS NULL;
+    END
+    """,
+]
+
+# Inserts that quietly drop references to missing rows instead of
+# failing the foreign key: an unknown instructor becomes NULL and a
+# registration of an unknown student or course is skipped.
+UPSERT_PERSON = ("INSERT INTO {table} VALUES (?, ?, ?, ?) "
+                 "ON CONFLICT(id) DO UPDATE SET name=excluded.name, "
+                 "age=excluded.age, email=excluded.email")
+UPSERT_COURSE = ("INSERT INTO courses VALUES (?, ?, (SELECT id FROM instructors WHERE id=?)) "
+                 "ON CONFLICT(id) DO UPDATE SET name=excluded.name, "
+                 "instructor_id=excluded.instructor_id")
+# A registration is only inserted while the course has a free seat, so
+# concurrent writers can never overbook it.
+INSERT_REGISTRATION = ("INSERT OR IGNORE INTO registrations "
+                       "SELECT s.id, c.id FROM students s, courses c "
+                       "LEFT JOIN course_seats k ON k.course_id = c.id "
+                       "WHERE s.id=? AND c.id=? AND (k.taken IS NULL OR k.taken < k.capacity)")
+# Imports keep the roster they are given, so they skip the seat check.
+IMPORT_REGISTRATION = ("INSERT OR IGNORE INTO registrations "
+                       "SELECT s.id, c.id FROM students s, courses c WHERE s.id=? AND c.id=?")
+JOIN_WAITLIST = ("INSERT OR IGNORE INTO waitlist (course_id, student_id) "
+                 "SELECT c.id, s.id FROM students s, courses c WHERE s.id=? AND c.id=? "
+                 "AND NOT EXISTS (SELECT 1 FROM registrations r WHERE r.student_id = s.id AND r.course_id = c.id)")
+# Registers the first waiting student who has no clash, if a seat is free.
+PROMOTE = ("INSERT OR IGNORE INTO registrations "
+           "SELECT w.student_id, w.course_id FROM waitlist w "
+           "JOIN course_seats k ON k.course_id = w.course_id "
+           "WHERE w.course_id=? AND k.taken < k.capacity AND NOT EXISTS ("
+           "SELECT 1 FROM registrations r "
+           "JOIN course_slots b ON b.course_id = r.course_id "
+           "JOIN course_slots a ON a.course_id = w.course_id AND a.start_min < b.end_min AND b.start_min < a.end_min "
+           "WHERE r.student_id = w.student_id AND r.course_id <> w.course_id) "
+           "ORDER BY w.id LIMIT 1")
+INSERT_SLOT = ("INSERT OR REPLACE INTO course_slots "
+               "SELECT c.id, ?, ?, ? FROM courses c WHERE c.id=?")
+
+
+def init_db(db_file=None):
+    """
+    Create database tables for Students, Instructors, Courses, and Registrations.
+    Ensures schema exists before app runs, migrating tables created by
+    older versions, and switches the file to write-ahead logging.
+
+    :param db_file: Database file, defaults to :data:`DB_FILE`.
+    :type db_file: str
+    """
+    conn = connect(db_file)
+    try:
+        # WAL lets readers carry on while another instance writes; the
+        # setting is stored in the file.
+        conn.execute("PRAGMA journal_mode = WAL")
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        existing = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        if version < SCHEMA_VERSION and "courses" in existing:
+            migrate(conn)
+        with conn:
+            for sql in TABLES.values():
+                conn.execute(sql)
+            if "registration_history" not in existing:
+                # Registrations made before history was kept are dated ''
+                # which sorts before any time.
+                conn.execute("INSERT INTO registration_history SELECT student_id, course_id, '', NULL "
+                             "FROM registrations")
+                conn.execute("INSERT INTO assignment_history SELECT id, instructor_id, '', NULL "
+                             "FROM courses WHERE instructor_id IS NOT NULL")
+            for sql in INDEXES + TRIGGERS:
+                conn.execute(sql)
+            for sql in UNIQUE_INDEXES.values():
+                try:
+                    conn.execute(sql)
+                except sqlite3.IntegrityError:
+                    pass
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    finally:
+        conn.close()
+
+
+def migrate(conn):
+    """
+    Rebuild ``courses`` and ``registrations`` with ``ON DELETE`` actions on
+    their foreign keys. Orphaned registrations are dropped and unknown
+    instructors are cleared on the way.
+
+    SQLite cannot alter a foreign key in place, so each table is copied
+    into a new one that replaces it, in one transaction with foreign key
+    enforcement switched off.
+
+    :param conn: Open connection to the database.
+    :type conn: sqlite3.Connection
+    """
+    conn.execute("PRAGMA foreign_keys = OFF")
+    try:
+        with conn:
+            conn.execute("BEGIN")
+            for sql in TABLES.values():
+                conn.execute(sql)
+            conn.execute(TABLES["courses"].replace("courses", "courses_new", 1))
+            conn.execute("INSERT INTO courses_new SELECT c.id, c.name, i.id FROM courses c "
+                         "LEFT JOIN instructors i ON i.id = c.instructor_id")
+            conn.execute(TABLES["registrations"].replace("registrations", "registrations_new", 1))
+            conn.execute("INSERT INTO registrations_new SELECT r.student_id, r.course_id "
+                         "FROM registrations r JOIN students s ON s.id = r.student_id "
+                         "JOIN courses c ON c.id = r.course_id")
+            conn.execute("DROP TABLE registrations")
+            conn.execute("DROP TABLE courses")
+            conn.execute("ALTER TABLE courses_new RENAME TO courses")
+            conn.execute("ALTER TABLE registrations_new RENAME TO registrations")
+            problems = conn.execute("PRAGMA foreign_key_check").fetchall()
+            if problems:
+                raise sqlite3.IntegrityError(f"foreign key check failed after migration: {problems[:5]}")
+    finally:
+        conn.execute("PRAGMA foreign_keys = ON")
+
+
+ORPHAN_CHECKS = {
+    "registrations without student":
+        "registrations WHERE student_id NOT IN (SELECT id FROM students)",
+    "registrations without course":
+        "registrations WHERE course_id NOT IN (SELECT id FROM courses)",
+    "courses with unknown instructor":
+        "courses WHERE instructor_id IS NOT NULL AND instructor_id NOT IN (SELECT id FROM instructors)",
+}
+
+
+def integrity_problems():
+    """
+    Run SQLite's integrity and foreign key checks, count orphaned rows
+    and people sharing an email.
+
+    :return: One message per problem; empty if the database is consistent.
+    :rtype: list[str]
+    """
+    problems = []
+    result = execute_query("PRAGMA integrity_check", fetch=True)
+    if result != [("ok",)]:
+        problems.extend(f"integrity: {r[0]}" for r in result)
+    for label, where in ORPHAN_CHECKS.items():
+        count = execute_query(f"SELECT COUNT(*) FROM {where}", fetch=True)[0][0]
+        if count:
+            problems.append(f"{label}: {count}")
+    for table in UNIQUE_INDEXES:
+        count = execute_query(f"SELECT COUNT(*) - COUNT(DISTINCT lower(trim(email))) FROM {table}",
+                              fetch=True)[0][0]
+        if count:
+            problems.append(f"{table} with a duplicate email: {count} (see `dupes`)")
+    return problems
+
+
+def email_owners(table):
+    """
+    Map each normalized email in a table to the ID using it.
+
+    :param table: ``students`` or ``instructors``.
+    :type table: str
+    :return: ``{normalized_email: id}``
+    :rtype: dict
+    """
+    return {email: row_id for row_id, email in
+            execute_query(f"SELECT id, lower(trim(email)) FROM {table}", fetch=True)}
+
+
+def cleanup_orphans():
+    """
+    Delete orphaned registrations and clear unknown instructors in one
+    transaction.
+
+    :return: Number of rows fixed per check in :data:`ORPHAN_CHECKS`.
+    :rtype: dict
+    """
+    fixed = {}
+    conn = connect()
+    try:
+        statements = _Statements(conn)
+        with conn:
+            for label, where in ORPHAN_CHECKS.items():
+                if where.startswith("courses"):
+                    cursor = statements.execute("UPDATE courses SET instructor_id=NULL" + where[len("courses"):])
+                else:
+                    cursor = statements.execute("DELETE FROM " + where)
+                fixed[label] = cursor.rowcount
+        statements.report()
+    finally:
+        conn.close()
+    return fixed
+
+
+def execute_query(query, params=(), fetch=False):
+    """
+    Run SQL queries in a safe manner  against the database.
+    - query: SQL command
+    - params: tuple of values for placeholders
+    - fetch: if True, return results, otherwise the number of rows changed
+    """
+    return _execute(query, params, fetch, many=False)
+
+
+def execute_many(query, seq_of_params):
+    """
+    Run one SQL statement for every parameter tuple, in a single transaction.
+
+    :param query: SQL statement with placeholders.
+    :type query: str
+    :param seq_of_params: Parameters for each execution.
+    :type seq_of_params: iterable[tuple]
+    :return: Total number of rows changed.
+    :rtype: int
+    """
+    return _execute(query, list(seq_of_params), False, many=True)
+
+
+def _execute(query, params, fetch, many):
+    start = time.perf_counter() if instrumentation.enabled or query_hooks else None
+    data, rowcount = with_retry(_run, query, params, fetch, many)
+    if start is not None:
+        rows = len(data) if data is not None else rowcount
+        # Hooks see the first parameter tuple of executemany as a sample.
+        _report(query, (params[0] if params else ()) if many else params, start, time.perf_counter(), rows)
+    return data if fetch else rowcount
+
+
+def _report(query, params, start, end, rows):
+    # Hands a finished statement to the profiler and the query hooks. A
+    # failing hook is logged and skipped: the statement already succeeded.
+    if instrumentation.enabled:
+        instrumentation.record(" ".join(query.split())[:80], "sql", start, end, {"rows": rows})
+    for hook in list(query_hooks):
+        try:
+            hook(query, params, (end - start) * 1000.0, rows)
+        except Exception:
+            logger.exception("Query hook %r failed", hook)
+
+
+class _Statements:
+    """
+    Wraps a connection for a multi-statement transaction, timing each
+    statement so that :meth:`report` can pass them to the profiler and the
+    query hooks once the transaction has committed.
+
+    :param conn: Open connection.
+    :type conn: sqlite3.Connection
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.done = []
+
+    def execute(self, query, params=()):
+        start = time.perf_counter()
+        cursor = self.conn.execute(query, params)
+        self.done.append((query, params, start, time.perf_counter(), cursor.rowcount))
+        return cursor
+
+    def executemany(self, query, seq_of_params):
+        seq_of_params = list(seq_of_params)
+        start = time.perf_counter()
+        cursor = self.conn.executemany(query, seq_of_params)
+        self.done.append((query, seq_of_params[0] if seq_of_params else (), start, time.perf_counter(),
+                          cursor.rowcount))
+        return cursor
+
+    def report(self):
+        """Report the timed statements, after the transaction committed."""
+        if instrumentation.enabled or query_hooks:
+            for statement in self.done:
+                _report(*statement)
+
+
+def _run(query, params, fetch, many):
+    conn = connect()
+    try:
+        cursor = conn.cursor()
+        if many:
+            cursor.executemany(query, params)
+        else:
+            cursor.execute(query, params)
+        data = cursor.fetchall() if fetch else None
+        conn.commit()
+        return data, cursor.rowcount
+    finally:
+        conn.close()
+
+
+Enrolment = namedtuple("Enrolment", "added waitlisted")
+Enrolment.__doc__ = """
+Outcome of a registration request: the number of students given a seat
+and the number put on the course's waitlist.
+"""
+
+
+def enroll_students(course_id, student_ids):
+    """
+    Register many students in a course in one transaction. Students that
+    are already registered or do not exist are skipped; when the course is
+    full the rest join its waitlist, in the order given.
+
+    :param course_id: ID of the course.
+    :type course_id: str
+    :param student_ids: IDs of the students.
+    :type student_ids: iterable[str]
+    :return: Numbers of new registrations and new waitlist entries.
+    :rtype: Enrolment
+    :raises ClashError: If the course clashes with the timetable of any of
+        the students; nobody is registered then.
+    """
+    return _transaction(register_students, course_id, list(student_ids))
+
+
+def copy_roster(source_id, target_id):
+    """
+    Register every student of one course in another, in one transaction.
+
+    :param source_id: ID of the course whose students are copied.
+    :type source_id: str
+    :param target_id: ID of the course they are registered in.
+    :type target_id: str
+    :return: Numbers of new registrations and new waitlist entries.
+    :rtype: Enrolment
+    :raises ClashError: If the target course clashes with the timetable of
+        any of the students; nobody is registered then.
+    """
+    def copy(conn):
+        rows = conn.execute("SELECT student_id FROM registrations WHERE course_id=?", (source_id,))
+        return register_students(conn, target_id, [r[0] for r in rows])
+    return _transaction(copy)
+
+
+def _transaction(fn, *args):
+    # Runs fn(conn, *args) in one transaction, retried while another
+    # writer holds the lock.
+    def attempt():
+        conn = connect()
+        try:
+            with conn:
+                return fn(conn, *args)
+        finally:
+            conn.close()
+    return with_retry(attempt)
+
+
+def register_students(conn, course_id, student_ids):
+    """
+    Register students in a course on an open connection, after checking
+    that the course fits their timetables. The caller owns the
+    transaction.
+
+    Each seat is claimed by a single conditional ``INSERT`` that only
+    succeeds while the course's ``taken`` count is below its capacity;
+    SQLite runs one writer at a time, so two requests can never take the
+    last seat together. Students who find the course full join the
+    waitlist.
+
+    :param conn: Open connection.
+    :type conn: sqlite3.Connection
+    :param course_id: ID of the course.
+    :type course_id: str
+    :param student_ids: IDs of the students.
+    :type student_ids: list[str]
+    :return: Numbers of new registrations and new waitlist entries.
+    :rtype: Enrolment
+    :raises ClashError: If the course clashes for any of the students.
+    """
+    clashes = schedule_clashes(conn, course_id, student_ids=student_ids)
+    if clashes:
+        raise ClashError(clashes)
+    added = waitlisted = 0
+    for sid in student_ids:
+        if conn.execute(INSERT_REGISTRATION, (sid, course_id)).rowcount:
+            added += 1
+        elif conn.execute(JOIN_WAITLIST, (sid, course_id)).rowcount:
+            waitlisted += 1
+    return Enrolment(added, waitlisted)
+
+
+def promote(conn, course_id):
+    """
+    Give free seats of a course to waiting students, first come first
+    served. A waiting student whose timetable now clashes with the course
+    keeps their place while the next one is promoted.
+
+    :param conn: Open connection.
+    :type conn: sqlite3.Connection
+    :param course_id: ID of the course.
+    :type course_id: str
+    :return: Number of students promoted.
+    :rtype: int
+    """
+    promoted = 0
+    while conn.execute(PROMOTE, (course_id,)).rowcount:
+        promoted += 1
+    return promoted
+
+
+def drop_students(course_id, student_ids):
+    """
+    Remove some students from a course and promote waiting students into
+    the freed seats, in one transaction.
+
+    :param course_id: ID of the course.
+    :type course_id: str
+    :param student_ids: IDs of the students.
+    :type student_ids: iterable[str]
+    :return: Number of registrations removed.
+    :rtype: int
+    """
+    def drop(conn):
+        rows = [(sid, course_id) for sid in student_ids]
+        conn.executemany("DELETE FROM waitlist WHERE student_id=? AND course_id=?", rows)
+        removed = conn.executemany("DELETE FROM registrations WHERE student_id=? AND course_id=?",
+                                   rows).rowcount
+        promote(conn, course_id)
+        return removed
+    return _transaction(drop)
+
+
+def set_capacity(course_id, capacity):
+    """
+    Limit the number of seats in a course, or remove the limit. Raising
+    the limit promotes waiting students; lowering it below the current
+    enrolment keeps everyone registered but takes no one new.
+
+    :param course_id: ID of the course.
+    :type course_id: str
+    :param capacity: Number of seats, or None for no limit.
+    :type capacity: int
+    :return: Number of waiting students promoted.
+    :rtype: int
+    """
+    def update(conn):
+        if capacity is None:
+            conn.execute("DELETE FROM course_seats WHERE course_id=?", (course_id,))
+            conn.execute("DELETE FROM waitlist WHERE course_id=?", (course_id,))
+            return 0
+        conn.execute("INSERT OR REPLACE INTO course_seats "
+                     "SELECT id, ?, (SELECT COUNT(*) FROM registrations WHERE course_id = courses.id) "
+                     "FROM courses WHERE id=?", (capacity, course_id))
+        return promote(conn, course_id)
+    return _transaction(update)
+
+
+def waitlist(course_id):
+    """
+    Get the students waiting for a seat in a course.
+
+    :param course_id: ID of the course.
+    :type course_id: str
+    :return: Student IDs, first in line first.
+    :rtype: list[str]
+    """
+    return [r[0] for r in execute_query("SELECT student_id FROM waitlist WHERE course_id=? ORDER BY id",
+                                        (course_id,), fetch=True)]
+
+
+def course_slots(conn, course_id):
+    """
+    Get a course's weekly slots.
+
+    :param conn: Open connection.
+    :type conn: sqlite3.Connection
+    :param course_id: ID of the course.
+    :type course_id: str
+    :return: The slots, ordered by start.
+    :rtype: list[Slot]
+    """
+    return [Slot(*row) for row in conn.execute(
+        "SELECT start_min, end_min, room FROM course_slots WHERE course_id=? ORDER BY start_min",
+        (course_id,))]
+
+
+def schedule_clashes(conn, course_id, student_ids=(), instructor_id=None, slots=None):
+    """
+    Check a course's slots against the bookings of some students, an
+    instructor and the rooms.
+
+    Each check is an indexed lookup. A room's bookings never overlap, so
+    only the room's last slot starting before a slot ends needs looking
+    at; a person's bookings are found through their registrations or
+    courses.
+
+    :param conn: Open connection.
+    :type conn: sqlite3.Connection
+    :param course_id: ID of the course; its own bookings do not count.
+    :type course_id: str
+    :param student_ids: Students who would attend the course.
+    :type student_ids: iterable[str]
+    :param instructor_id: Instructor who would teach it.
+    :type instructor_id: str
+    :param slots: Slots to check, defaults to the course's stored slots;
+        rooms are only checked when given.
+    :type slots: list[Slot]
+    :return: ``(kind, owner, course_id, other_course_id)`` per clash.
+    :rtype: list[tuple]
+    """
+    check_rooms = slots is not None
+    if slots is None:
+        slots = course_slots(conn, course_id)
+    clashes = []
+    for slot in slots:
+        if check_rooms and slot.room:
+            row = conn.execute(
+                "SELECT course_id, end_min FROM course_slots WHERE room=? AND start_min<? AND course_id<>? "
+                "ORDER BY start_min DESC LIMIT 1", (slot.room, slot.end, course_id)).fetchone()
+            if row and row[1] > slot.start:
+                clashes.append(("room", slot.room, course_id, row[0]))
+        if instructor_id:
+            row = conn.execute(
+                "SELECT s.course_id FROM courses c JOIN course_slots s ON s.course_id = c.id "
+                "WHERE c.instructor_id=? AND c.id<>? AND s.start_min<? AND s.end_min>? LIMIT 1",
+                (instructor_id, course_id, slot.end, slot.start)).fetchone()
+            if row:
+                clashes.append(("instructor", instructor_id, course_id, row[0]))
+        for sid in student_ids:
+            row = conn.execute(
+                "SELECT s.course_id FROM registrations r JOIN course_slots s ON s.course_id = r.course_id "
+                "WHERE r.student_id=? AND r.course_id<>? AND s.start_min<? AND s.end_min>? LIMIT 1",
+                (sid, course_id, slot.end, slot.start)).fetchone()
+            if row:
+                clashes.append(("student", sid, course_id, row[0]))
+    return clashes
+
+
+def assign_instructor(course_id, instructor_id):
+    """
+    Make an instructor teach a course, if it fits their timetable.
+
+    :param course_id: ID of the course.
+    :type course_id: str
+    :param instructor_id: ID of the instructor.
+    :type instructor_id: str
+    :return: Number of courses updated.
+    :rtype: int
+    :raises ClashError: If the course clashes with the instructor's other
+        courses.
+    """
+    def assign(conn):
+        clashes = schedule_clashes(conn, course_id, instructor_id=instructor_id)
+        if clashes:
+            raise ClashError(clashes)
+        return conn.execute("UPDATE courses SET instructor_id=? WHERE id=?", (instructor_id, course_id)).rowcount
+    return _transaction(assign)
+
+
+def set_course_slots(course_id, slots):
+    """
+    Replace a course's weekly slots, if the new times suit its rooms, its
+    instructor and its students.
+
+    :param course_id: ID of the course.
+    :type course_id: str
+    :param slots: The new slots, e.g. from :func:`school.timetable.parse_slots`.
+    :type slots: list[Slot]
+    :raises ClashError: If a room, the instructor or a student is busy.
+    """
+    _transaction(_set_course_slots, course_id, slots)
+
+
+def _set_course_slots(conn, course_id, slots):
+    row = conn.execute("SELECT instructor_id FROM courses WHERE id=?", (course_id,)).fetchone()
+    students = [r[0] for r in conn.execute("SELECT student_id FROM registrations WHERE course_id=?", (course_id,))]
+    clashes = schedule_clashes(conn, course_id, students, row[0] if row else None, slots)
+    if clashes:
+        raise ClashError(clashes)
+    conn.execute("DELETE FROM course_slots WHERE course_id=?", (course_id,))
+    conn.executemany("INSERT INTO course_slots VALUES (?, ?, ?, ?)",
+                     [(course_id, s.start, s.end, s.room) for s in slots])
+
+
+def add_course(course_id, name, instructor_id=None, slots=(), capacity=None):
+    """
+    Insert a course together with its weekly slots and number of seats,
+    in one transaction.
+
+    :param course_id: ID of the course.
+    :type course_id: str
+    :param name: Name of the course.
+    :type name: str
+    :param instructor_id: ID of the instructor, or None.
+    :type instructor_id: str
+    :param slots: The course's slots.
+    :type slots: list[Slot]
+    :param capacity: Number of seats, or None for no limit.
+    :type capacity: int
+    :raises sqlite3.IntegrityError: If the course ID already exists.
+    :raises ClashError: If a room or the instructor is busy at one of the
+        slots; the course is not added then.
+    """
+    def add(conn):
+        conn.execute("INSERT INTO courses VALUES (?, ?, ?)", (course_id, name, instructor_id))
+        _set_course_slots(conn, course_id, slots)
+        if capacity is not None:
+            conn.execute("INSERT INTO course_seats VALUES (?, ?, 0)", (course_id, capacity))
+    _transaction(add)
+
+
+def course_rows():
+    """
+    Get every course with its timetable and seats formatted for display.
+
+    :return: Rows ``(id, name, instructor_id, slots, seats)``, ``seats``
+        being e.g. ``30/30 (4 waiting)``, or empty for unlimited courses.
+    :rtype: list[tuple]
+    """
+    slots = {}
+    for cid, start, end, room in execute_query(
+            "SELECT course_id, start_min, end_min, room FROM course_slots ORDER BY course_id, start_min", fetch=True):
+        slots.setdefault(cid, []).append(Slot(start, end, room))
+    seats = {}
+    for cid, capacity, taken, waiting in execute_query(
+            "SELECT k.course_id, k.capacity, k.taken, "
+            "(SELECT COUNT(*) FROM waitlist w WHERE w.course_id = k.course_id) FROM course_seats k", fetch=True):
+        seats[cid] = f"{taken}/{capacity}" + (f" ({waiting} waiting)" if waiting else "")
+    return [tuple(row) + (format_slots(slots.get(row[0], [])), seats.get(row[0], ""))
+            for row in execute_query("SELECT * FROM courses", fetch=True)]
+
+
+def all_clashes():
+    """
+    Find every clash in the database: rooms, instructors and students
+    booked for overlapping slots. Runs one sort-and-sweep pass over all
+    bookings (see :func:`school.timetable.find_clashes`).
+
+    :return: ``(kind, owner, course_id, other_course_id)`` per clashing pair.
+    :rtype: list[tuple]
+    """
+    bookings = execute_query(
+        "SELECT 'room', room, start_min, end_min, course_id FROM course_slots WHERE room IS NOT NULL "
+        "UNION ALL "
+        "SELECT 'instructor', c.instructor_id, s.start_min, s.end_min, c.id FROM courses c "
+        "JOIN course_slots s ON s.course_id = c.id WHERE c.instructor_id IS NOT NULL "
+        "UNION ALL "
+        "SELECT 'student', r.student_id, s.start_min, s.end_min, r.course_id FROM registrations r "
+        "JOIN course_slots s ON s.course_id = r.course_id",
+        fetch=True)
+    return find_clashes(bookings)
+
+
+def _instant(when, end_of_day=False):
+    """
+    Turn a time into the format of the history tables.
+
+    :param when: ``datetime``, ``date``, ISO string such as ``2024-03-01``
+        or ``2024-03-01 14:30``, or None for now.
+    :param end_of_day: Read a bare date as its last moment instead of
+        midnight, so "on 2024-03-01" includes that day's changes.
+    :type end_of_day: bool
+    :rtype: str
+    :raises ValueError: If a string is not an ISO date or time.
+    """
+    if when is None:
+        when = datetime.now()
+    elif isinstance(when, str):
+        when = datetime.fromisoformat(when) if len(when) > 10 else date.fromisoformat(when)
+    if not isinstance(when, datetime):
+        return f"{when.isoformat()} {'23:59:59.999' if end_of_day else '00:00:00.000'}"
+    return when.strftime("%Y-%m-%d %H:%M:%S.%f")[:23]
+
+
+def roster_at(course_id, when=None):
+    """
+    Get the students registered in a course at a given time.
+
+    :param course_id: ID of the course.
+    :type course_id: str
+    :param when: The time; a date means the end of that day. Defaults to now.
+    :type when: datetime or date or str
+    :return: Student IDs, sorted.
+    :rtype: list[str]
+    :raises ValueError: If ``when`` is not a valid date or time.
+    """
+    at = _instant(when, end_of_day=True)
+    return [r[0] for r in execute_query(
+        "SELECT DISTINCT student_id FROM registration_history "
+        "WHERE course_id=? AND valid_from <= ? AND (valid_to IS NULL OR valid_to > ?) ORDER BY student_id",
+        (course_id, at, at), fetch=True)]
+
+
+def instructor_at(course_id, when=None):
+    """
+    Get the instructor assigned to a course at a given time.
+
+    :param course_id: ID of the course.
+    :type course_id: str
+    :param when: The time; a date means the end of that day. Defaults to now.
+    :type when: datetime or date or str
+    :return: Instructor ID, or None.
+    :rtype: str
+    :raises ValueError: If ``when`` is not a valid date or time.
+    """
+    at = _instant(when, end_of_day=True)
+    rows = execute_query(
+        "SELECT instructor_id FROM assignment_history "
+        "WHERE course_id=? AND valid_from <= ? AND (valid_to IS NULL OR valid_to > ?) "
+        "ORDER BY valid_from DESC LIMIT 1",
+        (course_id, at, at), fetch=True)
+    return rows[0][0] if rows else None
+
+
+def student_history(student_id, start=None, end=None):
+    """
+    Get the courses a student was registered in at any time between two
+    dates, e.g. during last term.
+
+    :param student_id: ID of the student.
+    :type student_id: str
+    :param start: Start of the period; a date means its midnight. Defaults
+        to the beginning of the history.
+    :type start: datetime or date or str
+    :param end: End of the period; a date means the end of that day.
+        Defaults to now.
+    :type end: datetime or date or str
+    :return: Rows ``(course_id, valid_from, valid_to)`` in the order the
+        registrations were made; ``valid_from`` is empty for registrations
+        older than the history and ``valid_to`` None while it lasts.
+    :rtype: list[tuple]
+    :raises ValueError: If a date is not valid.
+    """
+    end = _instant(end, end_of_day=True)
+    start = _instant(start) if start is not None else ""
+    return execute_query(
+        "SELECT course_id, valid_from, valid_to FROM registration_history "
+        "WHERE student_id=? AND valid_from <= ? AND (valid_to IS NULL OR valid_to > ?) ORDER BY valid_from",
+        (student_id, end, start), fetch=True)
+
+
+def drop_section(course_id):
+    """
+    Remove every registration of a course and empty its waitlist.
+
+    :param course_id: ID of the course.
+    :type course_id: str
+    :return: Number of registrations removed.
+    :rtype: int
+    """
+    def drop(conn):
+        conn.execute("DELETE FROM waitlist WHERE course_id=?", (course_id,))
+        return conn.execute("DELETE FROM registrations WHERE course_id=?", (course_id,)).rowcount
+    return _transaction(drop)
+
+
+# Stays below SQLite's limit on the number of parameters in one statement.
+MAX_PARAMS = 500
+
+
+def delete_rows(conn, table, ids):
+    """
+    Delete rows by ID with ``DELETE ... WHERE id IN (...)``, in chunks of
+    :data:`MAX_PARAMS` IDs, on an open connection. The caller owns the
+    transaction.
+
+    :param conn: Open connection.
+    :type conn: sqlite3.Connection
+    :param table: ``students``, ``instructors`` or ``courses``.
+    :type table: str
+    :param ids: IDs of the rows to delete.
+    :type ids: iterable[str]
+    :return: Number of rows deleted.
+    :rtype: int
+    """
+    ids = list(ids)
+    deleted = 0
+    for i in range(0, len(ids), MAX_PARAMS):
+        chunk = ids[i:i + MAX_PARAMS]
+        placeholders = ", ".join("?" * len(chunk))
+        deleted += conn.execute(f"DELETE FROM {table} WHERE id IN ({placeholders})", chunk).rowcount
+    return deleted
+
+
+def delete_ids(table, ids):
+    """
+    Delete many students, instructors or courses in one transaction.
+    Registrations and instructor assignments follow through the foreign
+    keys, and seats freed by deleted students go to waiting students.
+
+    :param table: ``students``, ``instructors`` or ``courses``.
+    :type table: str
+    :param ids: IDs of the rows to delete.
+    :type ids: iterable[str]
+    :return: Number of rows deleted.
+    :rtype: int
+    """
+    return with_retry(_delete_ids, table, list(ids))
+
+
+def _delete_ids(table, ids):
+    conn = connect()
+    try:
+        statements = _Statements(conn)
+        with conn:
+            courses = limited_courses_of(statements, ids) if table == "students" else []
+            deleted = delete_rows(statements, table, ids)
+            for course_id in courses:
+                promote(statements, course_id)
+        statements.report()
+        return deleted
+    finally:
+        conn.close()
+
+
+def limited_courses_of(conn, student_ids):
+    """
+    Find the courses with a capacity that some students are registered
+    in, whose seats go to waiting students when those students leave.
+
+    :param conn: Open connection.
+    :type conn: sqlite3.Connection
+    :param student_ids: IDs of the students.
+    :type student_ids: list[str]
+    :return: The course IDs, sorted.
+    :rtype: list[str]
+    """
+    courses = set()
+    for i in range(0, len(student_ids), MAX_PARAMS):
+        chunk = student_ids[i:i + MAX_PARAMS]
+        placeholders = ", ".join("?" * len(chunk))
+        courses.update(r[0] for r in conn.execute(
+            "SELECT DISTINCT r.course_id FROM registrations r JOIN course_seats k ON k.course_id = r.course_id "
+            f"WHERE r.student_id IN ({placeholders})", chunk))
+    return sorted(courses)
+
+
+def records_from_dict(data):
+    """
+    Convert data in the Tkinter app's JSON format into table rows.
+
+    :param data: Dictionary with ``students``, ``instructors`` and ``courses``.
+    :type data: dict
+    :return: Rows per table, as accepted by :func:`import_records`.
+    :rtype: dict
+    """
+    records = {"students": [], "instructors": [], "courses": [], "registrations": set(), "slots": [],
+               "capacity": [], "waitlist": []}
+    for s in data.get("students", []):
+        records["students"].append((s["student_id"], s["name"], s["age"], s["email"]))
+        for cid in s.get("registered_courses", []):
+            records["registrations"].add((s["student_id"], cid))
+    for i in data.get("instructors", []):
+        records["instructors"].append((i["instructor_id"], i["name"], i["age"], i["email"]))
+    for c in data.get("courses", []):
+        records["courses"].append((c["course_id"], c["course_name"], c.get("instructor")))
+        for slot in parse_slots(c.get("slots", "")):
+            records["slots"].append((c["course_id"],) + tuple(slot))
+        if c.get("capacity") is not None:
+            records["capacity"].append((c["course_id"], c["capacity"]))
+        for sid in c.get("waitlist", []):
+            records["waitlist"].append((c["course_id"], sid))
+        for sid in c.get("enrolled_students", []):
+            records["registrations"].add((sid, c["course_id"]))
+    records["registrations"] = sorted(records["registrations"])
+    return records
+
+
+def import_records(records):
+    """
+    Insert or update people, courses and registrations in one transaction.
+    References to instructors, students or courses that do not exist are
+    dropped.
+
+    :param records: Dictionary with ``students`` and ``instructors`` rows
+        ``(id, name, age, email)``, ``courses`` rows ``(id, name,
+        instructor_id)``, ``registrations`` rows ``(student_id, course_id)``
+        and optionally ``slots`` rows ``(course_id, start, end, room)``,
+        which replace the listed courses' timetables, ``capacity`` rows
+        ``(course_id, seats)`` and ``waitlist`` rows ``(course_id,
+        student_id)`` in queue order. Slots are not checked for clashes
+        (see :func:`all_clashes`). Capacities are set before the
+        registrations, which skip the seat check, so imported rosters are
+        kept even when over the limit.
+    :type records: dict
+    """
+    with_retry(_import_records, records)
+
+
+def _import_records(records):
+    conn = connect()
+    try:
+        statements = _Statements(conn)
+        with conn:
+            for table in ("students", "instructors"):
+                statements.executemany(UPSERT_PERSON.format(table=table), records[table])
+            statements.executemany(UPSERT_COURSE, records["courses"])
+            slots = records.get("slots", [])
+            statements.executemany("DELETE FROM course_slots WHERE course_id=?", {(r[0],) for r in slots})
+            statements.executemany(INSERT_SLOT, [(start, end, room, cid) for cid, start, end, room in slots])
+            statements.executemany("INSERT OR REPLACE INTO course_seats "
+                                   "SELECT id, ?, (SELECT COUNT(*) FROM registrations WHERE course_id = courses.id) "
+                                   "FROM courses WHERE id=?",
+                                   [(int(capacity), cid) for cid, capacity in records.get("capacity", [])])
+            statements.executemany(IMPORT_REGISTRATION, records["registrations"])
+            statements.executemany(JOIN_WAITLIST, [(sid, cid) for cid, sid in records.get("waitlist", [])])
+        statements.report()
+    finally:
+        conn.close()
+
+
+def write_csv(filename):
+    """
+    Export all the records to a sectioned CSV file.
+
+    :param filename: Path of the CSV file to write.
+    :type filename: str
+    """
+    with open(filename, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["--- Students ---"])
+        writer.writerow(["ID", "Name", "Age", "Email"])
+        for row in execute_query("SELECT * FROM students", fetch=True):
+            writer.writerow(row)
+        writer.writerow([])
+
+        writer.writerow(["--- Instructors ---"])
+        writer.writerow(["ID", "Name", "Age", "Email"])
+        for row in execute_query("SELECT * FROM instructors", fetch=True):
+            writer.writerow(row)
+        writer.writerow([])
+
+        writer.writerow(["--- Courses ---"])
+        writer.writerow(["ID", "Name", "Instructor ID"])
+        for row in execute_query("SELECT * FROM courses", fetch=True):
+            writer.writerow(row)
+        writer.writerow([])
+
+        writer.writerow(["--- Registrations ---"])
+        writer.writerow(["Student ID", "Course ID"])
+        for row in execute_query("SELECT * FROM registrations", fetch=True):
+            writer.writerow(row)
+        writer.writerow([])
+
+        writer.writerow(["--- Timetable ---"])
+        writer.writerow(["Course ID", "Slot"])
+        for cid, start, end, room in execute_query("SELECT * FROM course_slots ORDER BY course_id, start_min",
+                                                   fetch=True):
+            writer.writerow([cid, format_slot(Slot(start, end, room))])
+        writer.writerow([])
+
+        writer.writerow(["--- Capacity ---"])
+        writer.writerow(["Course ID", "Seats"])
+        for row in execute_query("SELECT course_id, capacity FROM course_seats", fetch=True):
+            writer.writerow(row)
+        writer.writerow([])
+
+        writer.writerow(["--- Waitlist ---"])
+        writer.writerow(["Course ID", "Student ID"])
+        for row in execute_query("SELECT course_id, student_id FROM waitlist ORDER BY course_id, id", fetch=True):
+            writer.writerow(row)
+
+
+def backup(dest):
+    """
+    Copy the database to ``dest`` using SQLite's online backup API,
+    so the copy is consistent even while another process is writing.
+
+    :param dest: Path of the backup file.
+    :type dest: str
+    """
+    src = connect()
+    dst = sqlite3.connect(dest)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
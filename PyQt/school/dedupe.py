@@ -0,0 +1,217 @@
+"""
+Finding people entered twice under different IDs.
+
+Exact duplicates share an email once it is normalized with
+:func:`normalize_email`; the database enforces that with a unique index
+per table (see :data:`school.db.UNIQUE_INDEXES`), and :func:`claim_emails`
+applies the same rule to rows about to be imported.
+
+:func:`find_duplicates` also finds near duplicates, such as ``Jon Smith``
+and ``John Smith`` with ``j.smith+school@...`` and ``jsmith@...``.
+Comparing every pair would take hours on a large roster, so each person
+is put in a few buckets by *blocking keys* (:func:`blocking_keys`) and
+only people sharing a bucket are compared. Buckets larger than
+``max_bucket`` are skipped, which keeps the run time near-linear even
+when many people share a common name.
+"""
+
+import re
+import string
+import unicodedata
+from collections import namedtuple
+from difflib import SequenceMatcher
+
+DEFAULT_THRESHOLD = 0.85
+DEFAULT_MAX_BUCKET = 100
+
+Match = namedtuple("Match", "first second score reason")
+Match.__doc__ = """
+Two rows that probably describe the same person.
+
+:param first: ID of the row seen first.
+:type first: str
+:param second: ID of the other row.
+:type second: str
+:param score: Similarity from 0 to 1; 1 for the same email.
+:type score: float
+:param reason: ``email`` or ``similar``.
+:type reason: str
+"""
+
+# SQLite's lower() only changes ASCII letters.
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+_NOT_LETTERS = re.compile(r"[^a-z]+")
+_NOT_ALNUM = re.compile(r"[^a-z0-9]+")
+_DIGITS = re.compile(r"[0-9]+")
+
+
+def normalize_email(email):
+    """
+    Normalize an email for uniqueness checks exactly as the
+    ``lower(trim(email))`` index does: surrounding spaces (but not tabs or
+    other whitespace) removed and ASCII letters lower-cased, other
+    characters kept as they are.
+
+    :param email: The email.
+    :type email: str
+    :rtype: str
+    """
+    return email.strip(" ").translate(_ASCII_LOWER)
+
+
+def normalize_name(name):
+    """
+    Normalize a name for comparison: accents, punctuation and case
+    removed, so ``Smith, Jöhn`` gives ``smith john``.
+
+    :param name: The name.
+    :type name: str
+    :rtype: str
+    """
+    text = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode().lower()
+    return " ".join(w for w in _NOT_LETTERS.split(text) if w)
+
+
+def email_stem(email):
+    """
+    The letters and digits of an email's local part without any
+    ``+tag``, so ``J.Smith+school@x.org`` gives ``jsmith``.
+
+    :param email: The email.
+    :type email: str
+    :rtype: str
+    """
+    local = normalize_email(email).split("@", 1)[0].split("+", 1)[0]
+    return _NOT_ALNUM.sub("", local)
+
+
+def blocking_keys(name, email):
+    """
+    Keys of the buckets a person is put in. Two people are only compared
+    if they share a key: the same letters in the email stem, the same
+    set of name words, or the same surname start and first initial.
+
+    :param name: Normalized name, see :func:`normalize_name`.
+    :type name: str
+    :param email: The email.
+    :type email: str
+    :rtype: list[tuple]
+    """
+    keys = []
+    letters = _NOT_LETTERS.sub("", email_stem(email))
+    if letters:
+        keys.append(("email", letters))
+    words = sorted(name.split())
+    if words:
+        keys.append(("name", " ".join(words)))
+    if len(words) > 1:
+        # Either word could be the surname.
+        keys.append(("initial", words[0][:4], words[-1][0]))
+        if words[-1][:4] != words[0][:4] or words[-1][0] != words[0][0]:
+            keys.append(("initial", words[-1][:4], words[0][0]))
+    return keys
+
+
+def similarity(a, b):
+    """
+    Score how alike two people are, from 0 to 1: the average of their
+    name similarity, in the given or in sorted word order, and their
+    email stem similarity. Stems numbered differently, as schools hand
+    out to namesakes (``jsmith2``, ``jsmith7``), count as unrelated.
+
+    :param a: ``(normalized_name, email_stem)``.
+    :type a: tuple
+    :param b: ``(normalized_name, email_stem)``.
+    :type b: tuple
+    :rtype: float
+    """
+    name = max(SequenceMatcher(None, a[0].replace(" ", ""), b[0].replace(" ", "")).ratio(),
+               SequenceMatcher(None, "".join(sorted(a[0].split())), "".join(sorted(b[0].split()))).ratio())
+    if not a[1] or not b[1]:
+        stem = name
+    elif _DIGITS.findall(a[1]) != _DIGITS.findall(b[1]) and _DIGITS.search(a[1]) and _DIGITS.search(b[1]):
+        stem = 0.0
+    else:
+        stem = SequenceMatcher(None, a[1], b[1]).ratio()
+    return (name + stem) / 2
+
+
+def find_duplicates(rows, threshold=DEFAULT_THRESHOLD, max_bucket=DEFAULT_MAX_BUCKET):
+    """
+    Find rows that probably describe the same person.
+
+    Rows with the same normalized email always match. Other pairs are
+    compared when they share a blocking key, and match when their
+    :func:`similarity` reaches ``threshold`` and their ages differ by at
+    most a year.
+
+    :param rows: Rows ``(id, name, age, email)``.
+    :type rows: iterable[tuple]
+    :param threshold: Lowest similarity reported.
+    :type threshold: float
+    :param max_bucket: Buckets with more people than this are not
+        compared pairwise; exact email matches are found regardless.
+    :type max_bucket: int
+    :return: The matches, best first.
+    :rtype: list[Match]
+    """
+    rows = list(rows)
+    matches = []
+    seen = set()
+
+    owner = {}
+    for row_id, _, _, email in rows:
+        key = normalize_email(email)
+        if key in owner:
+            matches.append(Match(owner[key], row_id, 1.0, "email"))
+            seen.add((owner[key], row_id))
+        else:
+            owner[key] = row_id
+
+    buckets = {}
+    features = []
+    for i, (_, name, _, email) in enumerate(rows):
+        name = normalize_name(name)
+        features.append((name, email_stem(email)))
+        for key in blocking_keys(name, email):
+            buckets.setdefault(key, []).append(i)
+
+    for members in buckets.values():
+        if len(members) < 2 or len(members) > max_bucket:
+            continue
+        for x, i in enumerate(members):
+            for j in members[x + 1:]:
+                pair = (rows[i][0], rows[j][0])
+                if pair in seen or abs(int(rows[i][2]) - int(rows[j][2])) > 1:
+                    continue
+                seen.add(pair)
+                score = similarity(features[i], features[j])
+                if score >= threshold:
+                    matches.append(Match(pair[0], pair[1], round(score, 3), "similar"))
+    matches.sort(key=lambda m: -m.score)
+    return matches
+
+
+def claim_emails(rows, owners):
+    """
+    Drop rows whose normalized email already belongs to another ID, in
+    ``owners`` or earlier in ``rows``. Rows keep their order.
+
+    :param rows: Rows ``(id, name, age, email)``.
+    :type rows: list[tuple]
+    :param owners: Normalized email to owning ID, e.g. from
+        :func:`school.db.email_owners`; updated with the accepted rows.
+    :type owners: dict
+    :return: The accepted rows and ``(id, message)`` per dropped row.
+    :rtype: tuple[list[tuple], list[tuple[str, str]]]
+    """
+    accepted = []
+    rejected = []
+    for row in rows:
+        key = normalize_email(row[3])
+        other = owners.setdefault(key, row[0])
+        if other == row[0]:
+            accepted.append(row)
+        else:
+            rejected.append((row[0], f"email {row[3]} is already used by {other}"))
+    return accepted, rejected
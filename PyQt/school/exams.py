@@ -0,0 +1,205 @@
+"""
+Exam timetables: every course gets one exam slot and room so that no
+student has two exams at once.
+
+Two courses *conflict* when they share a student. :func:`schedule_exams`
+builds the conflict graph with one Python ``int`` per course used as a
+bitset over course numbers: each student's courses are OR-ed into one mask
+and that mask is OR-ed into the row of each of their courses, so building
+the graph costs a few big-integer operations per registration instead of
+one set operation per pair of courses.
+
+The graph is then coloured with DSATUR, slots being the colours: the next
+course placed is the one whose neighbours already use the most different
+slots (ties go to the course with most conflicts, then most students), and
+it takes the lowest slot none of its neighbours use that still has a free
+room large enough. A slot's free rooms are a bitset over the rooms sorted
+by size, so the smallest room that fits is its lowest bit above the rooms
+that are too small. Thousands of courses take a second or two.
+"""
+
+import heapq
+from bisect import bisect_left
+from collections import namedtuple
+
+Exam = namedtuple("Exam", "course slot room students")
+Exam.__doc__ = """
+One course's exam.
+
+:param course: ID of the course.
+:type course: str
+:param slot: Exam slot, numbered from 1.
+:type slot: int
+:param room: Room name, or None when no rooms were given.
+:type room: str or None
+:param students: Number of students sitting the exam.
+:type students: int
+"""
+
+
+def parse_rooms(text):
+    """
+    Parse a room list such as ``B101:120, B102:60``.
+
+    :param text: Comma separated ``name:capacity`` pairs.
+    :type text: str
+    :return: Room name to capacity.
+    :rtype: dict[str, int]
+    :raises ValueError: If a room has no name or no positive capacity.
+    """
+    rooms = {}
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        name, _, capacity = part.rpartition(":")
+        name = name.strip()
+        if not name or not capacity.strip().isdigit() or int(capacity) <= 0:
+            raise ValueError(f"Invalid room: {part.strip()!r} (expected e.g. B101:120)")
+        rooms[name] = int(capacity)
+    return rooms
+
+
+def load_enrolments(conn):
+    """
+    Read every course and its students from a database.
+
+    :param conn: Open connection.
+    :type conn: sqlite3.Connection
+    :return: Course ID to the IDs of its students; courses without
+        students are included with an empty list.
+    :rtype: dict[str, list[str]]
+    """
+    enrolments = {r[0]: [] for r in conn.execute("SELECT id FROM courses ORDER BY id")}
+    for course_id, student_id in conn.execute("SELECT course_id, student_id FROM registrations"):
+        enrolments.setdefault(course_id, []).append(student_id)
+    return enrolments
+
+
+def conflict_graph(enrolments):
+    """
+    Build the course conflict graph.
+
+    :param enrolments: Course ID to the IDs of its students.
+    :type enrolments: dict
+    :return: The course IDs, the bitset of conflicting course numbers of
+        each course, and each course's number of students.
+    :rtype: tuple[list[str], list[int], list[int]]
+    """
+    courses = list(enrolments)
+    taken = {}
+    sizes = []
+    for number, course_id in enumerate(courses):
+        students = set(enrolments[course_id])
+        sizes.append(len(students))
+        for student_id in students:
+            taken.setdefault(student_id, []).append(number)
+    adjacent = [0] * len(courses)
+    for numbers in taken.values():
+        if len(numbers) < 2:
+            continue
+        mask = 0
+        for number in numbers:
+            mask |= 1 << number
+        for number in numbers:
+            adjacent[number] |= mask
+    for number in range(len(courses)):
+        adjacent[number] &= ~(1 << number)
+    return courses, adjacent, sizes
+
+
+def schedule_exams(enrolments, rooms=None):
+    """
+    Give every course an exam slot, and a room if ``rooms`` are given, so
+    that no student has two exams in the same slot and no room holds more
+    than one exam per slot or more students than its capacity.
+
+    :param enrolments: Course ID to the IDs of its students, e.g. from
+        :func:`load_enrolments`.
+    :type enrolments: dict
+    :param rooms: Room name to capacity, e.g. from :func:`parse_rooms`.
+        Without rooms only student conflicts are considered.
+    :type rooms: dict[str, int]
+    :return: The exams, ordered by slot and course.
+    :rtype: list[Exam]
+    :raises ValueError: If a course has more students than the largest
+        room.
+    """
+    courses, adjacent, sizes = conflict_graph(enrolments)
+    room_names, capacities = [], []
+    if rooms:
+        for name, capacity in sorted(rooms.items(), key=lambda r: (r[1], r[0])):
+            room_names.append(name)
+            capacities.append(capacity)
+        for course_id, size in zip(courses, sizes):
+            if size > capacities[-1]:
+                raise ValueError(f"No room holds the {size} students of {course_id} "
+                                 f"(largest: {capacities[-1]})")
+    all_rooms = (1 << len(room_names)) - 1
+
+    degree = [bin(a).count("1") for a in adjacent]
+    forbidden = [0] * len(courses)
+    saturation = [0] * len(courses)
+    slot_of = [None] * len(courses)
+    room_of = [None] * len(courses)
+    free = []
+    uncoloured = (1 << len(courses)) - 1
+
+    heap = [(0, -degree[n], -sizes[n], n) for n in range(len(courses))]
+    heapq.heapify(heap)
+    while heap:
+        sat, _, _, n = heapq.heappop(heap)
+        if slot_of[n] is not None or -sat != saturation[n]:
+            continue
+        if room_names:
+            fits = all_rooms & ~((1 << bisect_left(capacities, sizes[n])) - 1)
+            for slot, rooms_left in enumerate(free):
+                if not forbidden[n] >> slot & 1 and rooms_left & fits:
+                    break
+            else:
+                slot = len(free)
+                free.append(all_rooms)
+            room = (free[slot] & fits & -(free[slot] & fits)).bit_length() - 1
+            free[slot] &= ~(1 << room)
+            room_of[n] = room_names[room]
+        else:
+            # The lowest slot missing from the forbidden bitset.
+            slot = (~forbidden[n] & (forbidden[n] + 1)).bit_length() - 1
+        slot_of[n] = slot
+        uncoloured &= ~(1 << n)
+
+        bit = 1 << slot
+        neighbours = adjacent[n] & uncoloured
+        while neighbours:
+            low = neighbours & -neighbours
+            m = low.bit_length() - 1
+            neighbours ^= low
+            if not forbidden[m] & bit:
+                forbidden[m] |= bit
+                saturation[m] += 1
+                heapq.heappush(heap, (-saturation[m], -degree[m], -sizes[m], m))
+
+    exams = [Exam(courses[n], slot_of[n] + 1, room_of[n], sizes[n]) for n in range(len(courses))]
+    exams.sort(key=lambda e: (e.slot, e.course))
+    return exams
+
+
+def clashes(exams, enrolments):
+    """
+    Find students with two exams in the same slot; empty for a valid
+    timetable.
+
+    :param exams: Exams from :func:`schedule_exams`.
+    :type exams: list[Exam]
+    :param enrolments: Course ID to the IDs of its students.
+    :type enrolments: dict
+    :return: ``(student_id, slot, course_id, other_course_id)`` tuples.
+    :rtype: list[tuple]
+    """
+    found = []
+    booked = {}
+    for exam in exams:
+        for student_id in set(enrolments.get(exam.course, ())):
+            other = booked.setdefault((student_id, exam.slot), exam.course)
+            if other != exam.course:
+                found.append((student_id, exam.slot, exam.course, other))
+    return found
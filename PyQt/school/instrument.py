@@ -0,0 +1,197 @@
+"""
+Opt-in timing instrumentation for the data layer and the GUI handlers.
+
+Functions decorated with :func:`timed` and blocks wrapped in
+:func:`span` are timed only while instrumentation is enabled; otherwise
+the wrapper calls straight through. Enable it with the ``--instrument``
+flag or the ``SCHOOL_INSTRUMENT`` environment variable. Setting
+``SCHOOL_TRACE=<file>`` also writes a Chrome trace (viewable in
+``chrome://tracing`` or Perfetto) when the process exits.
+"""
+
+import atexit
+import collections
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+
+class Instrumentation:
+    """
+    Collects call counts, timings and trace events.
+
+    :param max_events: Number of most recent events kept for the trace.
+    :type max_events: int
+    """
+
+    def __init__(self, max_events=100000):
+        self.enabled = False
+        self.stats = {}
+        self.events = collections.deque(maxlen=max_events)
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    def record(self, name, category, start, end, args=None):
+        """
+        Record one timed call.
+
+        :param name: Name of the operation.
+        :type name: str
+        :param category: Category such as ``sql``, ``refresh`` or ``handler``.
+        :type category: str
+        :param start: Start time from :func:`time.perf_counter`.
+        :type start: float
+        :param end: End time from :func:`time.perf_counter`.
+        :type end: float
+        :param args: Extra details stored with the trace event.
+        :type args: dict
+        """
+        ms = (end - start) * 1000.0
+        with self._lock:
+            entry = self.stats.get(name)
+            if entry is None:
+                self.stats[name] = [category, 1, ms, ms, ms]
+            else:
+                entry[1] += 1
+                entry[2] += ms
+                entry[3] = min(entry[3], ms)
+                entry[4] = max(entry[4], ms)
+            self.events.append((name, category, start, end, threading.get_ident(), args))
+
+    @contextlib.contextmanager
+    def span(self, name, category="handler", args=None):
+        """
+        Time the enclosed block.
+
+        :param name: Name of the operation.
+        :type name: str
+        :param category: Category of the operation.
+        :type category: str
+        :param args: Extra details stored with the trace event.
+        :type args: dict
+        """
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, category, start, time.perf_counter(), args)
+
+    def timed(self, name=None, category="handler"):
+        """
+        Decorator that times every call of a function.
+
+        GUI toolkits may pass extra positional arguments to callbacks (for
+        example Qt's ``checked`` flag); arguments beyond what the function
+        accepts are dropped.
+
+        :param name: Name to record, defaults to the qualified function name.
+        :type name: str
+        :param category: Category of the operation.
+        :type category: str
+        """
+        def decorator(fn):
+            label = name or fn.__qualname__
+            code = fn.__code__
+            max_args = None if code.co_flags & 0x04 else code.co_argcount
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if max_args is not None:
+                    args = args[:max_args]
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.record(label, category, start, time.perf_counter())
+            return wrapper
+        return decorator
+
+    def summary(self):
+        """
+        Get aggregated statistics, slowest total first.
+
+        :return: One dictionary per operation with ``name``, ``category``,
+            ``count``, ``total_ms``, ``mean_ms``, ``min_ms`` and ``max_ms``.
+        :rtype: list[dict]
+        """
+        with self._lock:
+            items = list(self.stats.items())
+        rows = [
+            {"name": name, "category": cat, "count": count,
+             "total_ms": round(total, 3), "mean_ms": round(total / count, 3),
+             "min_ms": round(lo, 3), "max_ms": round(hi, 3)}
+            for name, (cat, count, total, lo, hi) in items
+        ]
+        rows.sort(key=lambda r: r["total_ms"], reverse=True)
+        return rows
+
+    def reset(self):
+        """Discard all statistics and events."""
+        with self._lock:
+            self.stats.clear()
+            self.events.clear()
+
+    def dump_json(self, filename):
+        """
+        Write the aggregated statistics as JSON.
+
+        :param filename: Output file.
+        :type filename: str
+        """
+        with open(filename, "w") as f:
+            json.dump(self.summary(), f, indent=4)
+
+    def dump_chrome_trace(self, filename):
+        """
+        Write the recorded events in Chrome trace event format.
+
+        :param filename: Output file.
+        :type filename: str
+        """
+        pid = os.getpid()
+        with self._lock:
+            events = list(self.events)
+        trace = []
+        for name, cat, start, end, tid, args in events:
+            event = {"name": name, "cat": cat, "ph": "X", "pid": pid, "tid": tid,
+                     "ts": round((start - self._origin) * 1e6, 1),
+                     "dur": round((end - start) * 1e6, 1)}
+            if args:
+                event["args"] = args
+            trace.append(event)
+        with open(filename, "w") as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+
+
+instrumentation = Instrumentation()
+timed = instrumentation.timed
+span = instrumentation.span
+
+
+def enable_if_requested(argv=None):
+    """
+    Turn instrumentation on if ``--instrument`` was passed or
+    ``SCHOOL_INSTRUMENT`` / ``SCHOOL_TRACE`` is set, and register the
+    trace dump at exit when ``SCHOOL_TRACE`` names a file.
+
+    :param argv: Command-line arguments, defaults to ``sys.argv``.
+    :type argv: list[str]
+    :return: True if instrumentation is enabled.
+    :rtype: bool
+    """
+    argv = sys.argv if argv is None else argv
+    trace_file = os.environ.get("SCHOOL_TRACE")
+    if "--instrument" in argv or os.environ.get("SCHOOL_INSTRUMENT") or trace_file:
+        instrumentation.enabled = True
+    if trace_file:
+        atexit.register(instrumentation.dump_chrome_trace, trace_file)
+    return instrumentation.enabled
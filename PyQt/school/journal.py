@@ -0,0 +1,250 @@
+"""
+Change tracking and an append-only journal for incremental autosave.
+
+A :class:`ChangeTracker` remembers which entities and relationships
+changed since the last flush, coalescing repeated changes to the same
+thing into one operation. :class:`Journal` appends those operations to a
+JSON-lines file next to a full snapshot; replaying the journal over the
+snapshot restores the latest state after a crash.
+
+Replaying an operation the snapshot already contains is not always
+harmless: an ``upsert`` replaces the object and drops its relationships.
+So every journal starts with its *generation*, and a snapshot written
+when the journal is compacted records the generation of the journal that
+follows it; a journal of an older generation is already in the snapshot
+and must not be replayed.
+
+Operations are plain dictionaries:
+
+* ``{"op": "upsert", "kind": "student", "id": ..., "data": {...}}``
+* ``{"op": "delete", "kind": "student", "id": ...}``
+* ``{"op": "register", "student": ..., "course": ...}``
+* ``{"op": "drop", "student": ..., "course": ...}``
+* ``{"op": "waitlist", "student": ..., "course": ...}``
+* ``{"op": "assign", "instructor": ..., "course": ...}``
+
+The first line of a journal is ``{"op": "generation", "generation": n}``.
+"""
+
+import json
+import os
+import threading
+
+from school.atomic import atomic_open
+
+
+class ChangeTracker:
+    """
+    Collects pending changes, keyed so that only the latest change to each
+    entity or relationship is kept.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _put(self, key, op):
+        with self._lock:
+            self._pending.pop(key, None)
+            self._pending[key] = op
+
+    def upsert(self, kind, id_value, data):
+        """
+        Record that an entity was added or changed.
+
+        :param kind: ``student``, ``instructor`` or ``course``.
+        :type kind: str
+        :param id_value: ID of the entity.
+        :type id_value: str
+        :param data: Attributes of the entity.
+        :type data: dict
+        """
+        self._put((kind, id_value), {"op": "upsert", "kind": kind, "id": id_value, "data": data})
+
+    def delete(self, kind, id_value):
+        """
+        Record that an entity was deleted.
+
+        :param kind: ``student``, ``instructor`` or ``course``.
+        :type kind: str
+        :param id_value: ID of the entity.
+        :type id_value: str
+        """
+        self._put((kind, id_value), {"op": "delete", "kind": kind, "id": id_value})
+
+    def register(self, student_id, course_id):
+        """
+        Record that a student registered in a course.
+
+        :param student_id: ID of the student.
+        :type student_id: str
+        :param course_id: ID of the course.
+        :type course_id: str
+        """
+        self._put(("register", student_id, course_id),
+                  {"op": "register", "student": student_id, "course": course_id})
+
+    def drop(self, student_id, course_id):
+        """
+        Record that a student left a course.
+
+        :param student_id: ID of the student.
+        :type student_id: str
+        :param course_id: ID of the course.
+        :type course_id: str
+        """
+        self._put(("register", student_id, course_id),
+                  {"op": "drop", "student": student_id, "course": course_id})
+
+    def waitlist(self, student_id, course_id):
+        """
+        Record that a student joined a course's waitlist.
+
+        :param student_id: ID of the student.
+        :type student_id: str
+        :param course_id: ID of the course.
+        :type course_id: str
+        """
+        self._put(("register", student_id, course_id),
+                  {"op": "waitlist", "student": student_id, "course": course_id})
+
+    def assign(self, instructor_id, course_id):
+        """
+        Record that an instructor was assigned a course.
+
+        :param instructor_id: ID of the instructor.
+        :type instructor_id: str
+        :param course_id: ID of the course.
+        :type course_id: str
+        """
+        self._put(("assign", course_id),
+                  {"op": "assign", "instructor": instructor_id, "course": course_id})
+
+    @property
+    def dirty(self):
+        """True if there are changes that have not been flushed."""
+        return bool(self._pending)
+
+    def drain(self):
+        """
+        Take all pending operations, in the order they last changed.
+
+        :return: The pending operations; the tracker is left empty.
+        :rtype: list[dict]
+        """
+        with self._lock:
+            ops = list(self._pending.values())
+            self._pending.clear()
+        return ops
+
+    def clear(self):
+        """Forget all pending changes."""
+        with self._lock:
+            self._pending.clear()
+
+
+class Journal:
+    """
+    Append-only JSON-lines journal stored next to a snapshot.
+
+    A crash during :meth:`append` can leave a partially written last
+    line. :meth:`replay` skips it, the next :meth:`append` starts on a new
+    line after it, and :meth:`repair` removes it from the file.
+
+    :param path: Path of the journal file.
+    :type path: str
+    """
+
+    def __init__(self, path):
+        self.path = path
+        #: Generation of the journal; 0 for a journal without a header.
+        self.generation = 0
+        self.length = 0
+        for op, _ in self._lines():
+            if op is None:
+                continue
+            if op.get("op") == "generation":
+                self.generation = op["generation"]
+            else:
+                self.length += 1
+
+    def append(self, ops):
+        """
+        Append operations and flush them to disk.
+
+        :param ops: Operations to write.
+        :type ops: list[dict]
+        """
+        if not ops:
+            return
+        data = "".join(json.dumps(op, separators=(",", ":")) + "\n" for op in ops).encode("utf-8")
+        with open(self.path, "a+b") as f:
+            if f.seek(0, os.SEEK_END):
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    # Never continue a line torn by a crash.
+                    data = b"\n" + data
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self.length += len(ops)
+
+    def _lines(self):
+        # (operation, line) pairs; the operation is None for a line that
+        # cannot be parsed, such as a torn "12" of a longer line.
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    op = json.loads(line)
+                except ValueError:
+                    op = None
+                yield (op if isinstance(op, dict) else None), line
+
+    def replay(self):
+        """
+        Read back the journaled operations. Lines that cannot be parsed,
+        left by a crash during :meth:`append`, are skipped; the operations
+        after them are still returned.
+
+        :return: Iterator over the operations.
+        """
+        for op, _ in self._lines():
+            if op is not None and op.get("op") != "generation":
+                yield op
+
+    def repair(self):
+        """
+        Rewrite the journal without the lines that cannot be parsed.
+
+        :return: Number of lines removed.
+        :rtype: int
+        """
+        lines = list(self._lines())
+        broken = sum(1 for op, _ in lines if op is None)
+        if broken:
+            with atomic_open(self.path) as f:
+                for op, line in lines:
+                    if op is not None:
+                        f.write(line if line.endswith(b"\n") else line + b"\n")
+            self.length = sum(1 for op, _ in lines if op is not None and op.get("op") != "generation")
+        return broken
+
+    def truncate(self, generation=None):
+        """
+        Empty the journal, after its operations are in a new snapshot, and
+        start a new generation.
+
+        :param generation: Generation of the emptied journal; defaults to
+            the current one plus one.
+        :type generation: int
+        """
+        if generation is None:
+            generation = self.generation + 1
+        with atomic_open(self.path) as f:
+            f.write(json.dumps({"op": "generation", "generation": generation}).encode("utf-8") + b"\n")
+        self.generation = generation
+        self.length = 0
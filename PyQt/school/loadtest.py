@@ -0,0 +1,376 @@
+"""
+Load tests for the SQLite data layer.
+
+Simulates many clerks working on one database at once, as on
+registration day. Each worker (a thread or a process) repeatedly picks an
+operation from a weighted *mix* and runs the same :mod:`school.db` calls
+as the PyQt app's handlers:
+
+==============  ========================================================
+``register``    register a student in a course (``enroll_students``)
+``drop``        drop a student from a course (``drop_students``)
+``add_student`` insert a new student, who can then be registered
+``assign``      assign an instructor to a course (``assign_instructor``)
+``refresh``     the Records tab's queries (students, instructors and
+                ``course_rows``)
+``dropdowns``   the ID and name queries behind the dropdowns
+``export``      write every record to CSV (``write_csv``)
+==============  ========================================================
+
+Workers run closed-loop (each starts its next operation as soon as the
+last one finished) or at a fixed rate per worker. With a rate, latency
+is measured from when the operation was due rather than when it
+started, so time spent queueing behind a slow operation is counted.
+
+:func:`run` reports throughput, latency percentiles, and for each
+operation how many calls were rejected (timetable clashes), hit a lock
+timeout (``database is locked`` after every retry) or failed otherwise::
+
+    python -m school loadtest --workers 8 --duration 30 --mix "register=80,refresh=20"
+"""
+
+import math
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from school import db
+from school.timetable import ClashError
+
+DEFAULT_MIX = "register=55,refresh=15,dropdowns=10,drop=8,add_student=7,assign=4,export=1"
+PERCENTILES = (50, 90, 99)
+JOURNAL_MODES = ("wal", "delete", "truncate", "persist", "memory", "off")
+
+Job = namedtuple("Job", "number db_file mix rate start duration ids seed workdir")
+Job.__doc__ = """
+What one worker does.
+
+:param number: Worker number, used in the IDs of the records it adds.
+:param db_file: Database file.
+:param mix: Operation name to weight.
+:param rate: Operations per second, or None to run closed-loop.
+:param start: :func:`time.time` at which to start.
+:param duration: Seconds to run.
+:param ids: ``{"students": [...], "instructors": [...], "courses": [...]}``
+:param seed: Seed of the worker's random choices.
+:param workdir: Directory for exported files.
+"""
+
+
+class _Worker:
+    # The state the operations of one worker share.
+
+    def __init__(self, job):
+        self.job = job
+        self.rng = random.Random(job.seed)
+        self.students = list(job.ids["students"])
+        self.instructors = job.ids["instructors"]
+        self.courses = job.ids["courses"]
+        self.added = 0
+
+
+def op_register(w):
+    added, waitlisted = db.enroll_students(w.rng.choice(w.courses), [w.rng.choice(w.students)])
+    return added + waitlisted > 0
+
+
+def op_drop(w):
+    return db.drop_students(w.rng.choice(w.courses), [w.rng.choice(w.students)]) > 0
+
+
+def op_add_student(w):
+    w.added += 1
+    student_id = f"L{w.job.number}x{w.added}"
+    db.execute_query("INSERT INTO students VALUES (?, ?, ?, ?)",
+                     (student_id, "Load Test", 20, f"{student_id.lower()}@load.test"))
+    w.students.append(student_id)
+    return True
+
+
+def op_assign(w):
+    return db.assign_instructor(w.rng.choice(w.courses), w.rng.choice(w.instructors)) > 0
+
+
+def op_refresh(w):
+    db.execute_query("SELECT * FROM students", fetch=True)
+    db.execute_query("SELECT * FROM instructors", fetch=True)
+    db.course_rows()
+    return True
+
+
+def op_dropdowns(w):
+    for table in ("students", "instructors", "courses"):
+        db.execute_query(f"SELECT id, name FROM {table}", fetch=True)
+    return True
+
+
+def op_export(w):
+    db.write_csv(os.path.join(w.job.workdir, f"export{w.job.number}.csv"))
+    return True
+
+
+OPERATIONS = {
+    "register": op_register,
+    "drop": op_drop,
+    "add_student": op_add_student,
+    "assign": op_assign,
+    "refresh": op_refresh,
+    "dropdowns": op_dropdowns,
+    "export": op_export,
+}
+# Operations that need records of each kind to pick from.
+NEEDS = {"register": ("students", "courses"), "drop": ("students", "courses"),
+         "assign": ("instructors", "courses")}
+
+
+def parse_mix(text):
+    """
+    Parse an operation mix such as ``register=80,refresh=20``.
+
+    :param text: Comma separated ``operation=weight`` pairs.
+    :type text: str
+    :return: Operation name to weight.
+    :rtype: dict[str, float]
+    :raises ValueError: If an operation is unknown or a weight is not a
+        positive number.
+    """
+    mix = {}
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        name, _, weight = (s.strip() for s in part.partition("="))
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation {name!r} (known: {', '.join(OPERATIONS)})")
+        try:
+            mix[name] = float(weight or 1)
+        except ValueError:
+            raise ValueError(f"Invalid weight for {name}: {weight!r}") from None
+        if mix[name] <= 0:
+            raise ValueError(f"Weight of {name} must be positive")
+    if not mix:
+        raise ValueError("The mix has no operations")
+    return mix
+
+
+def run_worker(job):
+    """
+    Run one worker until its time is up. Module level so that worker
+    processes can unpickle it.
+
+    :param job: What to do.
+    :type job: Job
+    :return: Per operation, ``{"ms": [latencies], "ok": n, "noop": n,
+        "rejected": n, "locked": n, "errors": {type: n}}``.
+    :rtype: dict
+    """
+    db.DB_FILE = job.db_file
+    worker = _Worker(job)
+    names = list(job.mix)
+    weights = [job.mix[n] for n in names]
+    results = {n: _empty() for n in names}
+
+    delay = job.start - time.time()
+    if delay > 0:
+        time.sleep(delay)
+    begin = time.perf_counter()
+    end = begin + job.duration
+    # Stagger rate-limited workers so they do not all fire together.
+    due = begin + (worker.rng.random() / job.rate if job.rate else 0)
+    while True:
+        if job.rate:
+            now = time.perf_counter()
+            if due > now:
+                time.sleep(due - now)
+            started = due
+            due += 1.0 / job.rate
+        else:
+            started = time.perf_counter()
+        if started >= end:
+            break
+        name = worker.rng.choices(names, weights)[0]
+        result = results[name]
+        try:
+            result["ok" if OPERATIONS[name](worker) else "noop"] += 1
+        except ClashError:
+            result["rejected"] += 1
+        except (sqlite3.Error, ValueError) as e:
+            if db.is_locked(e):
+                result["locked"] += 1
+            else:
+                error = type(e).__name__
+                result["errors"][error] = result["errors"].get(error, 0) + 1
+        result["ms"].append((time.perf_counter() - started) * 1000.0)
+    return results
+
+
+def _empty():
+    return {"ms": [], "ok": 0, "noop": 0, "rejected": 0, "locked": 0, "errors": {}}
+
+
+def _add(into, result):
+    into["ms"] += result["ms"]
+    for key in ("ok", "noop", "rejected", "locked"):
+        into[key] += result[key]
+    for error, count in result["errors"].items():
+        into["errors"][error] = into["errors"].get(error, 0) + count
+
+
+def percentile(values, p):
+    """
+    Nearest-rank percentile.
+
+    :param values: Sorted values.
+    :type values: list[float]
+    :param p: Percentile, 0 to 100.
+    :type p: float
+    :return: The value, or 0 for no values.
+    :rtype: float
+    """
+    if not values:
+        return 0.0
+    return values[max(math.ceil(p / 100.0 * len(values)) - 1, 0)]
+
+
+def summarize(worker_results, seconds):
+    """
+    Combine the results of the workers.
+
+    :param worker_results: Results of :func:`run_worker`.
+    :type worker_results: list[dict]
+    :param seconds: Length of the run.
+    :type seconds: float
+    :return: One row per operation, then a ``total`` row, each with
+        ``operation``, ``count``, ``per_s``, ``p50_ms``, ``p90_ms``,
+        ``p99_ms``, ``max_ms``, ``ok``, ``noop``, ``rejected``, ``locked``
+        and ``errors``.
+    :rtype: list[dict]
+    """
+    merged = {}
+    total = _empty()
+    for results in worker_results:
+        for name, r in results.items():
+            _add(merged.setdefault(name, _empty()), r)
+            _add(total, r)
+
+    rows = []
+    for name, m in sorted(merged.items()) + [("total", total)]:
+        ms = sorted(m["ms"])
+        row = {"operation": name, "count": len(ms), "per_s": round(len(ms) / seconds, 1) if seconds else 0.0}
+        for p in PERCENTILES:
+            row[f"p{p}_ms"] = round(percentile(ms, p), 2)
+        row["max_ms"] = round(ms[-1], 2) if ms else 0.0
+        row.update({key: m[key] for key in ("ok", "noop", "rejected", "locked")})
+        row["errors"] = sum(m["errors"].values())
+        row["error_types"] = m["errors"]
+        rows.append(row)
+    return rows
+
+
+def format_summary(rows):
+    """
+    Format :func:`summarize` rows as a table.
+
+    :param rows: Summary rows.
+    :type rows: list[dict]
+    :rtype: str
+    """
+    header = f"{'operation':<12}{'count':>8}{'ops/s':>9}" + "".join(f"{f'p{p} ms':>9}" for p in PERCENTILES)
+    header += f"{'max ms':>9}{'ok':>8}{'no-op':>7}{'clash':>7}{'locked':>8}{'errors':>8}"
+    lines = [header]
+    for r in rows:
+        line = f"{r['operation']:<12}{r['count']:>8}{r['per_s']:>9.1f}"
+        line += "".join(f"{r[f'p{p}_ms']:>9.2f}" for p in PERCENTILES)
+        line += f"{r['max_ms']:>9.2f}{r['ok']:>8}{r['noop']:>7}{r['rejected']:>7}{r['locked']:>8}{r['errors']:>8}"
+        lines.append(line)
+    errors = rows[-1]["error_types"] if rows else {}
+    if errors:
+        lines.append("errors: " + ", ".join(f"{name} x{count}" for name, count in errors.items()))
+    return "\n".join(lines)
+
+
+def run(workers=4, duration=10.0, mix=DEFAULT_MIX, rate=None, processes=False, in_place=False,
+        journal_mode=None, seed=0):
+    """
+    Load-test the current database file (:data:`school.db.DB_FILE`).
+
+    Workers point :data:`school.db.DB_FILE` at the tested file; it is set
+    back when the run ends, so with threads the rest of the process uses
+    the tested file only while the run lasts.
+
+    :param workers: Number of workers.
+    :type workers: int
+    :param duration: Seconds to run.
+    :type duration: float
+    :param mix: Operation mix, see :func:`parse_mix`.
+    :type mix: str
+    :param rate: Operations per second per worker, or None to run each
+        worker as fast as it can.
+    :type rate: float
+    :param processes: Run the workers in processes instead of threads;
+        threads share the GIL, processes behave like separate app
+        instances.
+    :type processes: bool
+    :param in_place: Write to the database itself instead of a copy.
+    :type in_place: bool
+    :param journal_mode: Journal mode to set on the tested file first,
+        one of :data:`JOURNAL_MODES`; by default a copy keeps the mode of
+        the database.
+    :type journal_mode: str
+    :param seed: Seed of the workers' random choices.
+    :type seed: int
+    :return: The summary rows, see :func:`summarize`.
+    :rtype: list[dict]
+    :raises ValueError: If the mix or journal mode is invalid, or the
+        database lacks the records an operation needs.
+    """
+    parsed = parse_mix(mix)
+    if journal_mode is not None and journal_mode.lower() not in JOURNAL_MODES:
+        raise ValueError(f"Unknown journal mode {journal_mode!r} (known: {', '.join(JOURNAL_MODES)})")
+    source = db.DB_FILE
+    workdir = tempfile.mkdtemp(prefix="school-load-")
+    try:
+        db_file = source
+        if not in_place:
+            db_file = os.path.join(workdir, "load.db")
+            db.backup(db_file)
+            if journal_mode is None:
+                conn = db.connect()
+                try:
+                    journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+                finally:
+                    conn.close()
+        if journal_mode:
+            conn = db.connect(db_file)
+            try:
+                conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+            finally:
+                conn.close()
+
+        conn = db.connect(db_file)
+        try:
+            ids = {table: [r[0] for r in conn.execute(f"SELECT id FROM {table}")]
+                   for table in ("students", "instructors", "courses")}
+        finally:
+            conn.close()
+        for name in parsed:
+            for table in NEEDS.get(name, ()):
+                if not ids[table]:
+                    raise ValueError(f"{name} needs {table}, but the database has none "
+                                     f"(fill it with 'python -m school synth')")
+
+        # Give every worker time to start before the clock runs.
+        start = time.time() + (1.0 if processes else 0.2)
+        jobs = [Job(n, db_file, parsed, rate, start, duration, ids, seed * 1000 + n, workdir)
+                for n in range(workers)]
+        executor = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        with executor(max_workers=workers) as pool:
+            results = list(pool.map(run_worker, jobs))
+        return summarize(results, duration)
+    finally:
+        db.DB_FILE = source
+        shutil.rmtree(workdir, ignore_errors=True)
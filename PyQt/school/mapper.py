@@ -0,0 +1,318 @@
+"""
+Model objects loaded from the database on demand.
+
+:class:`Mapper` builds ``Student``, ``Instructor`` and ``Course`` objects
+from :mod:`school.db` rows only when they are asked for, and keeps at most
+one object per primary key in a weak identity map: asking twice for the
+same ID gives the same object while it is in use, and objects nobody
+refers to any more are freed.
+
+Relationship lists (``registered_courses``, ``enrolled_students``,
+``assigned_courses`` and ``waitlist``) start as :class:`LazyList` s and
+are filled the first time one of them is used. The first use loads the
+same list for every mapped object that has not loaded it yet, a few
+hundred IDs per query, so walking the relationships of many objects
+costs a handful of queries instead of one per object. A course's
+instructor, slots and capacity come with the course itself.
+
+Changes made to the objects are not written back; use :mod:`school.db`
+for writes.
+"""
+
+import inspect
+import weakref
+from collections import UserList
+from functools import partial
+
+from school.db import connect
+from school.timetable import IntervalIndex, Slot
+
+DEFAULT_BATCH_SIZE = 500
+
+# table, ID column, and the query for (owner ID, target ID) pairs of each
+# relationship; {ids} is replaced with placeholders.
+TABLES = {"student": "students", "instructor": "instructors", "course": "courses"}
+RELATIONS = {
+    ("student", "registered_courses"): (
+        "course", "SELECT student_id, course_id FROM registrations WHERE student_id IN ({ids}) ORDER BY rowid"),
+    ("course", "enrolled_students"): (
+        "student", "SELECT course_id, student_id FROM registrations WHERE course_id IN ({ids}) ORDER BY rowid"),
+    ("instructor", "assigned_courses"): (
+        "course", "SELECT instructor_id, id FROM courses WHERE instructor_id IN ({ids}) ORDER BY rowid"),
+    ("course", "waitlist"): (
+        "student", "SELECT course_id, student_id FROM waitlist WHERE course_id IN ({ids}) ORDER BY id"),
+}
+# Relationships whose courses make up the owner's timetable.
+TIMETABLES = {"student": "registered_courses", "instructor": "assigned_courses"}
+
+
+class LazyList(UserList):
+    """
+    A list that calls ``load`` the first time its contents are used.
+    ``load`` must fill it with :meth:`fill`.
+
+    :param load: Callable without arguments, or the items of an already
+        loaded list (``UserList`` makes slices and copies that way).
+    :type load: callable or iterable
+    """
+
+    def __init__(self, load):
+        if callable(load):
+            self._load, self._data = load, None
+        else:
+            self._load, self._data = None, list(load)
+
+    @property
+    def loaded(self):
+        """
+        Whether the contents were loaded.
+
+        :rtype: bool
+        """
+        return self._data is not None
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._load()
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+
+    def fill(self, items):
+        """
+        Set the contents without loading.
+
+        :param items: The items.
+        :type items: list
+        """
+        self._data = items
+
+
+class LazyTimetable(IntervalIndex):
+    """
+    An :class:`~school.timetable.IntervalIndex` that loads its owner's
+    courses before answering, so clash checks on a freshly loaded student
+    or instructor see every course they take.
+
+    :param courses: The owner's lazy list of courses; loading it fills
+        this timetable.
+    :type courses: LazyList
+    """
+
+    def __init__(self, courses):
+        super().__init__()
+        self._courses = courses
+
+    def _ensure(self):
+        if self._courses is not None:
+            self._courses.data
+
+    def fill(self, courses):
+        """
+        Book the courses' slots, once the list is loaded.
+
+        :param courses: The owner's courses.
+        :type courses: list
+        """
+        self._courses = None
+        for course in courses:
+            super().add(course.slots, course.course_id)
+
+    def __len__(self):
+        self._ensure()
+        return super().__len__()
+
+    def find(self, start, end, ignore=None):
+        self._ensure()
+        return super().find(start, end, ignore)
+
+    def add(self, slots, key):
+        self._ensure()
+        super().add(slots, key)
+
+    def remove(self, slots, key):
+        self._ensure()
+        super().remove(slots, key)
+
+
+class Mapper:
+    """
+    Loads model objects from the database with an identity map and lazy,
+    batched relationships.
+
+    Use it as a context manager, or call :meth:`close`; lazy lists that
+    were not loaded before then cannot be loaded any more.
+
+    :param db_file: Database file, defaults to :data:`school.db.DB_FILE`.
+    :type db_file: str
+    :param models: Module or object with ``Student``, ``Instructor`` and
+        ``Course`` classes, such as ``main`` (the default) or lab 3's
+        ``school_management``.
+    :param batch_size: Most IDs looked up per query.
+    :type batch_size: int
+    """
+
+    def __init__(self, db_file=None, models=None, batch_size=DEFAULT_BATCH_SIZE):
+        if models is None:
+            import main as models
+        self.models = models
+        self.batch_size = batch_size
+        self.conn = connect(db_file)
+        self._maps = {kind: weakref.WeakValueDictionary() for kind in TABLES}
+        # main.Course takes the instructor as an argument, lab 3's does not.
+        self._course_takes_instructor = "instructor" in inspect.signature(models.Course).parameters
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Close the mapper's connection."""
+        self.conn.close()
+
+    def get(self, kind, id_value):
+        """
+        Get one object.
+
+        :param kind: ``student``, ``instructor`` or ``course``.
+        :type kind: str
+        :param id_value: Its ID.
+        :type id_value: str
+        :return: The object, or None if there is no such row.
+        :raises ValueError: If the row fails the model's validation.
+        """
+        found = self.get_many(kind, [id_value])
+        return found[0] if found else None
+
+    def get_many(self, kind, ids):
+        """
+        Get many objects, loading the ones not in the identity map in
+        batches.
+
+        :param kind: ``student``, ``instructor`` or ``course``.
+        :type kind: str
+        :param ids: Their IDs.
+        :type ids: iterable[str]
+        :return: The objects in the order of ``ids``, skipping IDs without
+            a row.
+        :rtype: list
+        :raises ValueError: If a row fails the model's validation.
+        """
+        ids = list(ids)
+        identity = self._maps[kind]
+        # Strong references, so nothing is freed before it is returned.
+        found = {i: identity.get(i) for i in ids}
+        missing = list(dict.fromkeys(i for i, obj in found.items() if obj is None))
+        for chunk in self._chunks(missing):
+            for obj in self._build(kind, self._select(f"SELECT * FROM {TABLES[kind]} WHERE id IN ({{ids}})",
+                                                     chunk)):
+                found[self._id(kind, obj)] = obj
+        return [found[i] for i in ids if found[i] is not None]
+
+    def iterate(self, kind):
+        """
+        Go through every object of a kind in ID order, loading
+        :attr:`batch_size` rows at a time so memory stays bounded.
+
+        :param kind: ``student``, ``instructor`` or ``course``.
+        :type kind: str
+        :return: Generator of objects.
+        :raises ValueError: If a row fails the model's validation.
+        """
+        last = ""
+        while True:
+            rows = self.conn.execute(f"SELECT * FROM {TABLES[kind]} WHERE id > ? ORDER BY id LIMIT ?",
+                                     (last, self.batch_size)).fetchall()
+            if not rows:
+                return
+            identity = self._maps[kind]
+            known = {r[0]: identity.get(r[0]) for r in rows}
+            built = {self._id(kind, o): o for o in self._build(kind, [r for r in rows if known[r[0]] is None])}
+            for row in rows:
+                yield known[row[0]] or built[row[0]]
+            last = rows[-1][0]
+
+    def cached(self, kind):
+        """
+        Number of objects of a kind currently in the identity map.
+
+        :param kind: ``student``, ``instructor`` or ``course``.
+        :type kind: str
+        :rtype: int
+        """
+        return len(self._maps[kind])
+
+    def _chunks(self, ids):
+        return [ids[i:i + self.batch_size] for i in range(0, len(ids), self.batch_size)]
+
+    def _select(self, query, ids):
+        return self.conn.execute(query.format(ids=",".join("?" * len(ids))), ids).fetchall()
+
+    @staticmethod
+    def _id(kind, obj):
+        return getattr(obj, f"{kind}_id")
+
+    def _build(self, kind, rows):
+        # Turns rows into objects, registers them and gives them lazy lists.
+        if not rows:
+            return []
+        if kind == "course":
+            objects = self._build_courses(rows)
+        else:
+            cls = self.models.Student if kind == "student" else self.models.Instructor
+            objects = [cls(name, age, email, row_id) for row_id, name, age, email in rows]
+        for obj in objects:
+            for (owner, attr) in RELATIONS:
+                if owner == kind:
+                    setattr(obj, attr, LazyList(partial(self._load_relation, kind, attr)))
+            if kind in TIMETABLES:
+                obj.timetable = LazyTimetable(getattr(obj, TIMETABLES[kind]))
+            self._maps[kind][self._id(kind, obj)] = obj
+        return objects
+
+    def _build_courses(self, rows):
+        ids = [r[0] for r in rows]
+        slots = {}
+        for cid, start, end, room in self._select(
+                "SELECT course_id, start_min, end_min, room FROM course_slots WHERE course_id IN ({ids}) "
+                "ORDER BY course_id, start_min", ids):
+            slots.setdefault(cid, []).append(Slot(start, end, room))
+        capacity = dict(self._select("SELECT course_id, capacity FROM course_seats WHERE course_id IN ({ids})", ids))
+        instructors = {self._id("instructor", i): i
+                       for i in self.get_many("instructor", {r[2] for r in rows if r[2]})}
+        courses = []
+        for cid, name, iid in rows:
+            kwargs = {"slots": slots.get(cid), "capacity": capacity.get(cid)}
+            if self._course_takes_instructor:
+                kwargs["instructor"] = None
+            course = self.models.Course(cid, name, **kwargs)
+            course.instructor = instructors.get(iid)
+            courses.append(course)
+        return courses
+
+    def _load_relation(self, kind, attr):
+        # Loads `attr` for every mapped object of `kind` still waiting for it.
+        target, query = RELATIONS[(kind, attr)]
+        waiting = {}
+        for obj in list(self._maps[kind].values()):
+            lazy = getattr(obj, attr, None)
+            if isinstance(lazy, LazyList) and not lazy.loaded:
+                waiting[self._id(kind, obj)] = obj
+        pairs = []
+        for chunk in self._chunks(list(waiting)):
+            pairs += self._select(query, chunk)
+        targets = {self._id(target, t): t for t in self.get_many(target, {t for _, t in pairs})}
+        items = {owner_id: [] for owner_id in waiting}
+        for owner_id, target_id in pairs:
+            if target_id in targets:
+                items[owner_id].append(targets[target_id])
+        for owner_id, obj in waiting.items():
+            getattr(obj, attr).fill(items[owner_id])
+            timetable = getattr(obj, "timetable", None)
+            if TIMETABLES.get(kind) == attr and isinstance(timetable, LazyTimetable):
+                timetable.fill(items[owner_id])
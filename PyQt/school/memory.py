@@ -0,0 +1,328 @@
+"""
+Memory reports for the in-memory students, instructors and courses.
+
+A :class:`MemorySnapshot` records, at one moment:
+
+- the number of live ``Student``, ``Instructor`` and ``Course`` objects
+  and roughly how many bytes each class holds (the object, its attribute
+  dictionary and the lists, strings and helper objects it owns, stopping
+  at other model objects),
+- counts supplied by the GUI, such as Treeview rows,
+- the memory traced by :mod:`tracemalloc` and its largest allocation
+  sites, when tracing is on.
+
+Comparing two snapshots gives a :class:`MemoryDiff`. :data:`memory`
+records one diff around every call of a function decorated with
+:func:`tracked` while it is enabled (``--memory`` or ``SCHOOL_MEMORY``),
+which shows what operations such as loading a file or refreshing a tree
+cost and whether that memory is given back.
+
+Objects are counted by scanning the garbage collector's objects, so the
+counts include objects that the lists of the application no longer hold;
+:func:`find_retained` names the deleted objects other objects still
+refer to.
+"""
+
+import collections
+import functools
+import gc
+import os
+import sys
+import tracemalloc
+import types
+
+MODEL_CLASSES = ("Student", "Instructor", "Course")
+TOP_SITES = 10
+FRAMES = 1
+
+ClassUsage = collections.namedtuple("ClassUsage", "count bytes")
+ClassUsage.__doc__ = """
+Live objects of one class.
+
+:param count: Number of objects.
+:type count: int
+:param bytes: Approximate bytes they hold.
+:type bytes: int
+"""
+
+_SHARED = (type, types.ModuleType, types.FunctionType, types.MethodType, types.BuiltinFunctionType)
+
+
+def _owned_size(obj, seen, stop):
+    # Size of obj and what it refers to, counting every object once and
+    # not descending into objects of the classes in `stop` (other than obj)
+    # or into classes, modules and functions.
+    size = 0
+    pending = [obj]
+    while pending:
+        item = pending.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        # get_referents, unlike __dict__, does not make Python build the
+        # attribute dictionary of objects that do not have one yet.
+        for child in gc.get_referents(item):
+            if not isinstance(child, _SHARED) and type(child).__name__ not in stop:
+                pending.append(child)
+    return size
+
+
+def class_usage(classes=MODEL_CLASSES):
+    """
+    Count the live objects of some classes and the bytes they hold.
+
+    :param classes: Class names; subclasses are counted under their own
+        name only.
+    :type classes: tuple[str]
+    :return: Class name to its usage, with an entry for every name.
+    :rtype: dict[str, ClassUsage]
+    """
+    names = set(classes)
+    found = {name: [] for name in classes}
+    for obj in gc.get_objects():
+        name = type(obj).__name__
+        if name in names:
+            found[name].append(obj)
+    seen = set()
+    return {name: ClassUsage(len(objs), sum(_owned_size(o, seen, names) for o in objs))
+            for name, objs in found.items()}
+
+
+class MemoryDiff:
+    """
+    The change between two :class:`MemorySnapshot` s.
+
+    :param before: The earlier snapshot.
+    :type before: MemorySnapshot
+    :param after: The later snapshot.
+    :type after: MemorySnapshot
+    :param limit: Number of allocation sites kept, largest change first.
+    :type limit: int
+    """
+
+    def __init__(self, before, after, limit=TOP_SITES):
+        self.label = after.label or before.label
+        self.classes = {name: ClassUsage(usage.count - before.classes.get(name, ClassUsage(0, 0)).count,
+                                         usage.bytes - before.classes.get(name, ClassUsage(0, 0)).bytes)
+                        for name, usage in after.classes.items()}
+        self.counts = {name: value - before.counts.get(name, 0) for name, value in after.counts.items()}
+        self.traced = None
+        self.sites = []
+        if before.traced is not None and after.traced is not None:
+            self.traced = after.traced - before.traced
+            self.sites = [(str(s.traceback), s.size_diff, s.count_diff)
+                          for s in after.snapshot.compare_to(before.snapshot, "lineno")[:limit]]
+
+    def format(self):
+        """
+        Describe the change as text.
+
+        :rtype: str
+        """
+        lines = [f"{self.label or 'change'}:"]
+        for name, usage in self.classes.items():
+            lines.append(f"  {name:<14}{usage.count:>+10} objects {_kib(usage.bytes, True):>14}")
+        for name, value in self.counts.items():
+            lines.append(f"  {name:<14}{value:>+10}")
+        if self.traced is not None:
+            lines.append(f"  traced memory {_kib(self.traced, True)}")
+            for site, size, count in self.sites:
+                lines.append(f"    {_kib(size, True):>14} {count:>+8}  {site}")
+        return "\n".join(lines)
+
+
+class MemorySnapshot:
+    """
+    Memory use at one moment.
+
+    :param label: Name shown in reports.
+    :type label: str
+    :param counts: Extra counts to record, such as Treeview rows.
+    :type counts: dict[str, int]
+    :param classes: Names of the classes to count.
+    :type classes: tuple[str]
+    """
+
+    def __init__(self, label="", counts=None, classes=MODEL_CLASSES):
+        self.label = label
+        self.classes = class_usage(classes)
+        self.counts = dict(counts or {})
+        self.snapshot = None
+        self.traced = self.peak = None
+        if tracemalloc.is_tracing():
+            self.snapshot = tracemalloc.take_snapshot().filter_traces(
+                [tracemalloc.Filter(False, tracemalloc.__file__)])
+            self.traced, self.peak = tracemalloc.get_traced_memory()
+
+    def diff(self, before, limit=TOP_SITES):
+        """
+        Compare with an earlier snapshot.
+
+        :param before: The earlier snapshot.
+        :type before: MemorySnapshot
+        :param limit: Number of allocation sites kept.
+        :type limit: int
+        :rtype: MemoryDiff
+        """
+        return MemoryDiff(before, self, limit)
+
+    def top(self, limit=TOP_SITES):
+        """
+        The largest allocation sites, if tracing was on.
+
+        :param limit: Number of sites.
+        :type limit: int
+        :return: ``(file:line, bytes, blocks)`` tuples, largest first.
+        :rtype: list[tuple[str, int, int]]
+        """
+        if self.snapshot is None:
+            return []
+        return [(str(s.traceback), s.size, s.count) for s in self.snapshot.statistics("lineno")[:limit]]
+
+    def format(self, limit=TOP_SITES):
+        """
+        Describe the snapshot as text.
+
+        :param limit: Number of allocation sites listed.
+        :type limit: int
+        :rtype: str
+        """
+        lines = [f"{self.label or 'memory'}:"]
+        for name, usage in self.classes.items():
+            lines.append(f"  {name:<14}{usage.count:>10} objects {_kib(usage.bytes):>14}")
+        for name, value in self.counts.items():
+            lines.append(f"  {name:<14}{value:>10}")
+        if self.traced is None:
+            lines.append("  tracemalloc is off")
+        else:
+            lines.append(f"  traced memory {_kib(self.traced)}, peak {_kib(self.peak)}")
+            for site, size, count in self.top(limit):
+                lines.append(f"    {_kib(size):>14} {count:>8}  {site}")
+        return "\n".join(lines)
+
+
+def _kib(size, sign=False):
+    return f"{size / 1024:{'+' if sign else ''},.1f} KiB"
+
+
+class MemoryTracker:
+    """
+    Records a :class:`MemoryDiff` around every call of the functions
+    decorated with :meth:`tracked` while :attr:`enabled` is set.
+
+    :param max_diffs: Number of most recent diffs kept.
+    :type max_diffs: int
+    """
+
+    def __init__(self, max_diffs=50):
+        self.enabled = False
+        self.diffs = collections.deque(maxlen=max_diffs)
+        #: Callable returning extra counts for every snapshot, set by the GUI.
+        self.counts = None
+
+    def enable(self, frames=FRAMES):
+        """
+        Start recording diffs, and start :mod:`tracemalloc` if it is not
+        running yet.
+
+        :param frames: Stack frames stored per allocation.
+        :type frames: int
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self.enabled = True
+
+    def disable(self):
+        """Stop recording diffs and stop :mod:`tracemalloc`."""
+        self.enabled = False
+        tracemalloc.stop()
+
+    def snapshot(self, label=""):
+        """
+        Take a snapshot including the GUI's counts.
+
+        :param label: Name shown in reports.
+        :type label: str
+        :rtype: MemorySnapshot
+        """
+        return MemorySnapshot(label, self.counts() if self.counts else None)
+
+    def tracked(self, name=None):
+        """
+        Decorator that records a diff around every call of a function.
+
+        :param name: Name of the diffs, defaults to the function name.
+        :type name: str
+        """
+        def decorator(fn):
+            label = name or fn.__qualname__
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                before = self.snapshot(label)
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.diffs.append(self.snapshot(label).diff(before))
+            return wrapper
+        return decorator
+
+
+memory = MemoryTracker()
+tracked = memory.tracked
+
+
+def enable_if_requested(argv=None):
+    """
+    Turn memory tracking on if ``--memory`` was passed or ``SCHOOL_MEMORY``
+    is set.
+
+    :param argv: Command-line arguments, defaults to ``sys.argv``.
+    :type argv: list[str]
+    :return: True if memory tracking is enabled.
+    :rtype: bool
+    """
+    argv = sys.argv if argv is None else argv
+    if "--memory" in argv or os.environ.get("SCHOOL_MEMORY"):
+        memory.enable()
+    return memory.enabled
+
+
+def find_retained(students, instructors, courses):
+    """
+    Find objects that are no longer in the application's lists but are
+    still referred to by objects that are, such as a course still
+    enrolling a deleted student. Each one keeps the deleted object, and
+    everything it refers to, in memory.
+
+    :param students: The current students.
+    :type students: list
+    :param instructors: The current instructors.
+    :type instructors: list
+    :param courses: The current courses.
+    :type courses: list
+    :return: ``(holder, attribute, retained)`` descriptions such as
+        ``("course C101", "enrolled_students", "student S7")``.
+    :rtype: list[tuple[str, str, str]]
+    """
+    live = {id(o) for o in (*students, *instructors, *courses)}
+    found = []
+
+    def check(holder, attr, items, kind, id_attr):
+        for item in items:
+            if item is not None and id(item) not in live:
+                found.append((holder, attr, f"{kind} {getattr(item, id_attr)}"))
+
+    for s in students:
+        check(f"student {s.student_id}", "registered_courses", s.registered_courses, "course", "course_id")
+    for i in instructors:
+        check(f"instructor {i.instructor_id}", "assigned_courses", i.assigned_courses, "course", "course_id")
+    for c in courses:
+        holder = f"course {c.course_id}"
+        check(holder, "enrolled_students", c.enrolled_students, "student", "student_id")
+        check(holder, "waitlist", c.waitlist, "student", "student_id")
+        check(holder, "instructor", [c.instructor], "instructor", "instructor_id")
+    return found
@@ -0,0 +1,57 @@
+"""
+Chunked parallel processing for large imports.
+
+:func:`map_chunks` splits a list into consecutive chunks and applies a
+function to each one in a :class:`~concurrent.futures.ProcessPoolExecutor`,
+returning the results in input order. Inputs that fit in one chunk, or a
+single worker, are processed inline so small files pay no process start-up
+cost.
+
+The function must be defined at module level so that it can be pickled.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_CHUNK_SIZE = 20000
+
+
+def chunked(items, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Split a list into consecutive slices.
+
+    :param items: Items to split.
+    :type items: list
+    :param chunk_size: Maximum number of items per slice.
+    :type chunk_size: int
+    :return: The slices, in order.
+    :rtype: list[list]
+    :raises ValueError: If ``chunk_size`` is less than 1.
+    """
+    if chunk_size < 1:
+        raise ValueError(f"Chunk size must be at least 1, got {chunk_size}")
+    return [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+
+def map_chunks(fn, items, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Apply ``fn`` to consecutive chunks of ``items`` in worker processes.
+
+    :param fn: Module-level function taking a list and returning a result.
+    :type fn: callable
+    :param items: Items to process.
+    :type items: list
+    :param workers: Number of processes; defaults to the number of CPUs.
+    :type workers: int
+    :param chunk_size: Number of items handed to one call of ``fn``.
+    :type chunk_size: int
+    :return: One result per chunk, in input order.
+    :rtype: list
+    :raises ValueError: If ``chunk_size`` is less than 1.
+    """
+    chunks = chunked(list(items), chunk_size)
+    workers = min(workers or os.cpu_count() or 1, len(chunks))
+    if workers <= 1:
+        return [fn(chunk) for chunk in chunks]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(fn, chunks))
@@ -0,0 +1,228 @@
+"""
+SQL statement profiler and slow-query log.
+
+:class:`QueryProfiler` plugs into :func:`school.db.add_query_hook`. It
+aggregates every statement by fingerprint (the statement with literals
+and placeholder lists normalised) and writes statements slower than a
+threshold, with their query plan, to a rotating JSON-lines log::
+
+    SCHOOL_SLOW_QUERY_MS=20 python school_management_system2.py
+    python -m school --slow-query-ms 20 report
+    python -m school slowlog slow_queries.log
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import re
+import threading
+import time
+
+from school import db
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+
+
+def fingerprint(query):
+    """
+    Normalise a statement so that variants differing only in literal
+    values or the length of an ``IN`` list share one fingerprint.
+
+    :param query: SQL statement.
+    :type query: str
+    :return: Normalised statement.
+    :rtype: str
+    """
+    query = _STRING.sub("?", query)
+    query = _NUMBER.sub("?", query)
+    query = _IN_LIST.sub("IN (...)", query)
+    return _SPACE.sub(" ", query).strip()
+
+
+def params_shape(params):
+    """
+    Describe the parameters of a statement without their values.
+
+    :param params: Parameters passed to the statement.
+    :type params: tuple or dict
+    :return: For example ``"(str, int)"`` or ``"{id: str}"``.
+    :rtype: str
+    """
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in params.items()) + "}"
+    return "(" + ", ".join(type(v).__name__ for v in params) + ")"
+
+
+class QueryProfiler:
+    """
+    Query hook that summarises statements and logs the slow ones.
+
+    :param threshold_ms: Statements at least this slow are logged.
+    :type threshold_ms: float
+    :param log_file: Path of the slow-query log.
+    :type log_file: str
+    :param max_bytes: Size at which the log is rotated.
+    :type max_bytes: int
+    :param backup_count: Number of rotated logs to keep.
+    :type backup_count: int
+    :param explain: Include ``EXPLAIN QUERY PLAN`` output for slow statements.
+    :type explain: bool
+    """
+
+    def __init__(self, threshold_ms=50.0, log_file="slow_queries.log",
+                 max_bytes=1024 * 1024, backup_count=3, explain=True):
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self.stats = {}
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(f"school.slow_queries.{id(self)}")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        self.handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=max_bytes, backupCount=backup_count)
+        self.logger.addHandler(self.handler)
+
+    def __call__(self, query, params, duration_ms, rows):
+        key = fingerprint(query)
+        with self._lock:
+            entry = self.stats.get(key)
+            if entry is None:
+                self.stats[key] = [1, duration_ms, duration_ms, rows if rows > 0 else 0]
+            else:
+                entry[0] += 1
+                entry[1] += duration_ms
+                entry[2] = max(entry[2], duration_ms)
+                entry[3] += rows if rows > 0 else 0
+
+        if duration_ms >= self.threshold_ms:
+            record = {
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "fingerprint": key,
+                "statement": " ".join(query.split()),
+                "params": params_shape(params),
+                "duration_ms": round(duration_ms, 3),
+                "rows": rows,
+            }
+            if self.explain:
+                record["plan"] = self.query_plan(query, params)
+            self.logger.info(json.dumps(record))
+
+    def query_plan(self, query, params):
+        """
+        Get the query plan SQLite chooses for a statement.
+
+        :param query: SQL statement.
+        :type query: str
+        :param params: Parameters of the statement.
+        :type params: tuple or dict
+        :return: One line per plan step, or an error message.
+        :rtype: list[str]
+        """
+        conn = db.connect()
+        try:
+            return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + query, params)]
+        except Exception as e:
+            return [f"unavailable: {e}"]
+        finally:
+            conn.close()
+
+    def summary(self):
+        """
+        Get statistics per fingerprint, largest total time first.
+
+        :return: One dictionary per fingerprint.
+        :rtype: list[dict]
+        """
+        with self._lock:
+            items = list(self.stats.items())
+        rows = [{"fingerprint": key, "count": count, "total_ms": round(total, 3),
+                 "mean_ms": round(total / count, 3), "max_ms": round(worst, 3), "rows": n}
+                for key, (count, total, worst, n) in items]
+        rows.sort(key=lambda r: r["total_ms"], reverse=True)
+        return rows
+
+    def install(self):
+        """Start profiling :func:`school.db.execute_query`."""
+        db.add_query_hook(self)
+
+    def uninstall(self):
+        """Stop profiling and close the log file."""
+        db.remove_query_hook(self)
+        self.logger.removeHandler(self.handler)
+        self.handler.close()
+
+
+def format_summary(rows, limit=20):
+    """
+    Format fingerprint statistics as a table.
+
+    :param rows: Rows as returned by :meth:`QueryProfiler.summary` or
+        :func:`summarize_log`.
+    :type rows: list[dict]
+    :param limit: Maximum number of fingerprints to show.
+    :type limit: int
+    :return: The formatted table.
+    :rtype: str
+    """
+    lines = [f"{'count':>7}{'total ms':>12}{'mean ms':>10}{'max ms':>10}{'rows':>9}  statement"]
+    for r in rows[:limit]:
+        lines.append(f"{r['count']:>7}{r['total_ms']:>12.1f}{r['mean_ms']:>10.2f}"
+                     f"{r['max_ms']:>10.2f}{r['rows']:>9}  {r['fingerprint'][:100]}")
+    return "\n".join(lines)
+
+
+def summarize_log(log_file):
+    """
+    Aggregate a slow-query log, including its rotated files, by fingerprint.
+
+    :param log_file: Path of the current log file.
+    :type log_file: str
+    :return: Statistics per fingerprint, largest total time first.
+    :rtype: list[dict]
+    """
+    stats = {}
+    plans = {}
+    paths = [log_file] + [f"{log_file}.{n}" for n in range(1, 100)]
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                key = record["fingerprint"]
+                entry = stats.setdefault(key, [0, 0.0, 0.0, 0])
+                entry[0] += 1
+                entry[1] += record["duration_ms"]
+                entry[2] = max(entry[2], record["duration_ms"])
+                entry[3] += max(record.get("rows", 0), 0)
+                plans.setdefault(key, record.get("plan"))
+    rows = [{"fingerprint": key, "count": count, "total_ms": round(total, 3),
+             "mean_ms": round(total / count, 3), "max_ms": round(worst, 3), "rows": n,
+             "plan": plans[key]}
+            for key, (count, total, worst, n) in stats.items()]
+    rows.sort(key=lambda r: r["total_ms"], reverse=True)
+    return rows
+
+
+def enable_from_env():
+    """
+    Install a :class:`QueryProfiler` if ``SCHOOL_SLOW_QUERY_MS`` is set.
+    ``SCHOOL_SLOW_QUERY_LOG`` overrides the log file name.
+
+    :return: The installed profiler, or None.
+    :rtype: QueryProfiler
+    """
+    threshold = os.environ.get("SCHOOL_SLOW_QUERY_MS")
+    if not threshold:
+        return None
+    profiler = QueryProfiler(float(threshold),
+                             os.environ.get("SCHOOL_SLOW_QUERY_LOG", "slow_queries.log"))
+    profiler.install()
+    return profiler
@@ -0,0 +1,225 @@
+"""
+Course recommendations: "students who took X also took Y".
+
+:class:`CoEnrolment` keeps the student × course enrolment matrix as one
+set of course numbers per student, and its product with itself, the
+course × course co-enrolment counts, as one sparse row (a dict) per
+course. Only pairs of courses that share a student are stored, so a
+catalogue of thousands of courses costs memory in proportion to the
+pairs actually taken together.
+
+Similarity is the cosine of two course columns, ``shared / sqrt(n_x *
+n_y)``. A student's recommendations add up the similarities of each
+course they take to each course they do not, and the best ``k`` are kept
+with a heap. Registering or dropping one student updates the counts in
+place in time proportional to the number of courses they take, so the
+matrix never needs rebuilding; :meth:`CoEnrolment.sync` picks up what
+other connections changed from ``registration_history``.
+"""
+
+import heapq
+import math
+
+DEFAULT_K = 10
+
+# How far back sync looks for dropped registrations, in case a writer
+# committed well after its trigger stamped the drop.
+SYNC_MARGIN = "-60 seconds"
+
+
+class CoEnrolment:
+    """
+    Item-item co-enrolment counts with incremental updates and top-k
+    queries.
+    """
+
+    def __init__(self):
+        self._index = {}
+        self._courses = []
+        self._count = []
+        self._co = []
+        self._taken = {}
+        self._mark = (0, "")
+
+    def _number(self, course_id):
+        number = self._index.get(course_id)
+        if number is None:
+            number = self._index[course_id] = len(self._courses)
+            self._courses.append(course_id)
+            self._count.append(0)
+            self._co.append({})
+        return number
+
+    @classmethod
+    def from_pairs(cls, pairs):
+        """
+        Build the counts from ``(student_id, course_id)`` pairs.
+
+        :param pairs: Registrations.
+        :type pairs: iterable[tuple[str, str]]
+        :rtype: CoEnrolment
+        """
+        engine = cls()
+        for student_id, course_id in pairs:
+            engine.add(student_id, course_id)
+        return engine
+
+    @classmethod
+    def from_db(cls, conn):
+        """
+        Build the counts from a database's registrations.
+
+        :param conn: Open connection.
+        :type conn: sqlite3.Connection
+        :rtype: CoEnrolment
+        """
+        # Take the mark first: whatever changes while reading is synced again.
+        mark = _history_mark(conn)
+        engine = cls.from_pairs(conn.execute("SELECT student_id, course_id FROM registrations"))
+        engine._mark = mark
+        return engine
+
+    def add(self, student_id, course_id):
+        """
+        Record a registration.
+
+        :param student_id: ID of the student.
+        :type student_id: str
+        :param course_id: ID of the course.
+        :type course_id: str
+        :return: False if it was already recorded.
+        :rtype: bool
+        """
+        taken = self._taken.setdefault(student_id, set())
+        y = self._number(course_id)
+        if y in taken:
+            return False
+        co_y = self._co[y]
+        for x in taken:
+            co_y[x] = co_y.get(x, 0) + 1
+            self._co[x][y] = self._co[x].get(y, 0) + 1
+        taken.add(y)
+        self._count[y] += 1
+        return True
+
+    def remove(self, student_id, course_id):
+        """
+        Forget a registration.
+
+        :param student_id: ID of the student.
+        :type student_id: str
+        :param course_id: ID of the course.
+        :type course_id: str
+        :return: False if it was not recorded.
+        :rtype: bool
+        """
+        taken = self._taken.get(student_id)
+        y = self._index.get(course_id)
+        if not taken or y not in taken:
+            return False
+        taken.discard(y)
+        self._count[y] -= 1
+        co_y = self._co[y]
+        for x in taken:
+            for row, other in ((co_y, x), (self._co[x], y)):
+                if row[other] == 1:
+                    del row[other]
+                else:
+                    row[other] -= 1
+        if not taken:
+            del self._taken[student_id]
+        return True
+
+    def courses_of(self, student_id):
+        """
+        Get the courses recorded for a student.
+
+        :param student_id: ID of the student.
+        :type student_id: str
+        :rtype: set[str]
+        """
+        return {self._courses[x] for x in self._taken.get(student_id, ())}
+
+    def similar(self, course_id, k=DEFAULT_K):
+        """
+        Get the courses most often taken together with a course.
+
+        :param course_id: ID of the course.
+        :type course_id: str
+        :param k: Number of courses.
+        :type k: int
+        :return: ``(course_id, similarity)`` pairs, most similar first.
+        :rtype: list[tuple[str, float]]
+        """
+        x = self._index.get(course_id)
+        if x is None:
+            return []
+        count = self._count
+        scores = ((y, shared / math.sqrt(count[x] * count[y])) for y, shared in self._co[x].items())
+        return [(self._courses[y], round(score, 4)) for y, score in heapq.nlargest(k, scores, key=_score)]
+
+    def recommend(self, student_id, k=DEFAULT_K):
+        """
+        Recommend courses a student does not take yet.
+
+        :param student_id: ID of the student.
+        :type student_id: str
+        :param k: Number of courses.
+        :type k: int
+        :return: ``(course_id, score)`` pairs, best first; empty for a
+            student without registrations.
+        :rtype: list[tuple[str, float]]
+        """
+        taken = self._taken.get(student_id, ())
+        count = self._count
+        scores = {}
+        for x in taken:
+            norm = math.sqrt(count[x])
+            for y, shared in self._co[x].items():
+                if y not in taken:
+                    scores[y] = scores.get(y, 0.0) + shared / (norm * math.sqrt(count[y]))
+        return [(self._courses[y], round(score, 4)) for y, score in heapq.nlargest(k, scores.items(), key=_score)]
+
+    def sync(self, conn):
+        """
+        Catch up with registrations made or dropped through other
+        connections since the counts were built or last synced.
+
+        The students touched since then are found through
+        ``registration_history`` and their courses are read again from
+        ``registrations``, so applying the same change twice is harmless.
+
+        :param conn: Open connection to the same database.
+        :type conn: sqlite3.Connection
+        :return: Number of registrations added or removed.
+        :rtype: int
+        """
+        last_row, since = self._mark
+        mark = _history_mark(conn)
+        students = {r[0] for r in conn.execute(
+            "SELECT student_id FROM registration_history WHERE rowid > ? "
+            "UNION SELECT student_id FROM registration_history WHERE valid_to >= ?", (last_row, since))}
+        changed = 0
+        ids = list(students)
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            current = {}
+            for sid, cid in conn.execute(f"SELECT student_id, course_id FROM registrations "
+                                         f"WHERE student_id IN ({','.join('?' * len(chunk))})", chunk):
+                current.setdefault(sid, set()).add(cid)
+            for sid in chunk:
+                now, before = current.get(sid, set()), self.courses_of(sid)
+                changed += sum(self.remove(sid, cid) for cid in before - now)
+                changed += sum(self.add(sid, cid) for cid in now - before)
+        self._mark = mark
+        return changed
+
+
+def _score(item):
+    return item[1]
+
+
+def _history_mark(conn):
+    # The newest history row and a time a little before now.
+    return conn.execute(f"SELECT (SELECT COALESCE(MAX(rowid), 0) FROM registration_history), "
+                        f"strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime', '{SYNC_MARGIN}')").fetchone()
@@ -0,0 +1,482 @@
+"""
+Local HTTP/JSON service for the school database.
+
+Several front ends and scripts can share one database through this
+service instead of each opening the file themselves. It uses only the
+standard library::
+
+    python -m school serve --port 8765
+    curl 'http://127.0.0.1:8765/students?limit=50'
+    curl 'http://127.0.0.1:8765/students?after=S0000050&limit=50'
+    curl 'http://127.0.0.1:8765/courses?q=math'
+    curl -N 'http://127.0.0.1:8765/stream/students'
+    curl -d '{"course": "C1", "students": ["S1", "S2"]}' http://127.0.0.1:8765/enroll
+    curl -d '[{"path": "/students?limit=1"}, {"path": "/courses?limit=1"}]' http://127.0.0.1:8765/batch
+    curl 'http://127.0.0.1:8765/recommend?student=S1&k=5'
+
+* ``GET /<table>`` returns one page of ``students``, ``instructors`` or
+  ``courses`` ordered by ID. Use ``after`` (the ``next`` value of the
+  previous page) and ``limit`` to page, and ``q`` to search IDs and names.
+* ``GET /stream/<table>`` streams every matching row as JSON lines with
+  chunked transfer encoding, one page at a time.
+* ``POST /enroll`` registers a list of students in a course. Enrolments
+  arriving within a few milliseconds of each other are written in one
+  transaction. Students who find the course full join its waitlist; the
+  response counts both. A course that clashes with a student's
+  timetable is refused with ``409 Conflict``.
+* ``GET /recommend?student=...`` suggests up to ``k`` courses the
+  student does not take, from what students with the same courses took;
+  ``?course=...`` lists the courses most often taken with a course
+  instead (see :mod:`school.recommend`). The co-enrolment counts are
+  built on the first request and then kept up to date incrementally.
+* ``POST /batch`` runs a list of ``{"method", "path", "body"}`` requests
+  and returns their results in order, saving round trips.
+
+Connections are kept alive between requests. All database work runs on
+one thread with one reused SQLite connection, so requests never block the
+event loop and never open the file again.
+"""
+
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qs
+
+from school import db
+from school.recommend import CoEnrolment
+
+COLUMNS = {
+    "students": ("id", "name", "age", "email"),
+    "instructors": ("id", "name", "age", "email"),
+    "courses": ("id", "name", "instructor_id"),
+}
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+MAX_BODY = 16 * 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+class HTTPError(Exception):
+    """An error returned to the client as ``{"error": message}``."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Store:
+    """
+    Runs database operations on a single worker thread that owns one
+    SQLite connection.
+
+    :param db_file: Database file, defaults to :data:`school.db.DB_FILE`.
+    :type db_file: str
+    """
+
+    def __init__(self, db_file=None):
+        self.db_file = db_file
+        self._conn = None
+        self._recommender = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="school-db")
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = db.connect(self.db_file)
+        return self._conn
+
+    async def run(self, fn, *args):
+        """
+        Run ``fn(*args)`` on the database thread.
+
+        :param fn: One of the store's synchronous methods.
+        :type fn: callable
+        :return: The function's result.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def page(self, table, after="", limit=DEFAULT_LIMIT, query=None):
+        """
+        Get rows ordered by ID, starting after a given ID.
+
+        :param table: ``students``, ``instructors`` or ``courses``.
+        :type table: str
+        :param after: Return rows with an ID greater than this.
+        :type after: str
+        :param limit: Maximum number of rows.
+        :type limit: int
+        :param query: Only rows whose ID or name contains this text.
+        :type query: str
+        :return: ``{"items": [...], "next": id or None}``
+        :rtype: dict
+        """
+        columns = COLUMNS[table]
+        sql = f"SELECT {', '.join(columns)} FROM {table} WHERE id > ?"
+        params = [after]
+        if query:
+            like = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            sql += " AND (id LIKE ? ESCAPE '\\' OR name LIKE ? ESCAPE '\\')"
+            params += [like, like]
+        sql += " ORDER BY id LIMIT ?"
+        params.append(limit)
+        items = [dict(zip(columns, row)) for row in self._connection().execute(sql, params)]
+        return {"items": items, "next": items[-1]["id"] if len(items) == limit else None}
+
+    def enroll_many(self, requests):
+        """
+        Register students in courses, all in one transaction.
+
+        :param requests: ``(course_id, student_ids)`` pairs.
+        :type requests: list[tuple[str, list[str]]]
+        :return: Per request, the numbers of new registrations and
+            waitlist entries, or the :class:`~school.timetable.ClashError`
+            of a request that was rejected because of a timetable clash.
+        :rtype: list[school.db.Enrolment or ClashError]
+        """
+        conn = self._connection()
+
+        def attempt():
+            counts = []
+            with conn:
+                for course_id, student_ids in requests:
+                    try:
+                        counts.append(db.register_students(conn, course_id, student_ids))
+                    except db.ClashError as e:
+                        counts.append(e)
+            return counts
+        return db.with_retry(attempt)
+
+    def recommend(self, student_id=None, course_id=None, k=10):
+        """
+        Recommend courses for a student, or find courses similar to one.
+
+        :param student_id: ID of the student.
+        :type student_id: str
+        :param course_id: ID of the course, if no student is given.
+        :type course_id: str
+        :param k: Number of courses.
+        :type k: int
+        :return: ``{"items": [{"course": ..., "score": ...}]}``
+        :rtype: dict
+        """
+        conn = self._connection()
+        if self._recommender is None:
+            self._recommender = CoEnrolment.from_db(conn)
+        else:
+            self._recommender.sync(conn)
+        if student_id is not None:
+            pairs = self._recommender.recommend(student_id, k)
+        else:
+            pairs = self._recommender.similar(course_id, k)
+        return {"items": [{"course": cid, "score": score} for cid, score in pairs]}
+
+    def close(self):
+        """Close the connection and stop the database thread."""
+        def close():
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        self._executor.submit(close).result()
+        self._executor.shutdown()
+
+
+class EnrolBatcher:
+    """
+    Collects enrolment requests for ``delay`` seconds and writes them
+    together with :meth:`Store.enroll_many`.
+
+    :param store: The store to write to.
+    :type store: Store
+    :param delay: Seconds to wait for more requests before writing.
+    :type delay: float
+    """
+
+    def __init__(self, store, delay=0.005):
+        self.store = store
+        self.delay = delay
+        self._pending = []
+        self._task = None
+
+    async def enroll(self, course_id, student_ids):
+        """
+        Queue an enrolment and wait until it is written.
+
+        :param course_id: ID of the course.
+        :type course_id: str
+        :param student_ids: IDs of the students.
+        :type student_ids: list[str]
+        :return: Numbers of new registrations and waitlist entries.
+        :rtype: school.db.Enrolment
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((course_id, student_ids, future))
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._flush_later())
+        return await future
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.delay)
+        batch, self._pending, self._task = self._pending, [], None
+        try:
+            counts = await self.store.run(self.store.enroll_many, [(c, s) for c, s, _ in batch])
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+        else:
+            for (_, _, future), count in zip(batch, counts):
+                if isinstance(count, Exception):
+                    future.set_exception(count)
+                else:
+                    future.set_result(count)
+
+
+class Stream:
+    """
+    Pages of a table fetched one after another, for streaming responses.
+
+    :param store: Store to read from.
+    :type store: Store
+    :param table: ``students``, ``instructors`` or ``courses``.
+    :type table: str
+    :param page_size: Rows fetched per page.
+    :type page_size: int
+    :param query: Only rows whose ID or name contains this text.
+    :type query: str
+    """
+
+    def __init__(self, store, table, page_size=MAX_LIMIT, query=None):
+        self.store = store
+        self.table = table
+        self.page_size = page_size
+        self.query = query
+
+    async def __aiter__(self):
+        after = ""
+        while after is not None:
+            page = await self.store.run(self.store.page, self.table, after, self.page_size, self.query)
+            yield page["items"]
+            after = page["next"]
+
+
+class SchoolService:
+    """
+    The HTTP server. Create it, then ``await service.serve(host, port)``.
+
+    :param db_file: Database file, defaults to :data:`school.db.DB_FILE`.
+    :type db_file: str
+    :param batch_delay: Seconds enrolments wait to be written together.
+    :type batch_delay: float
+    """
+
+    def __init__(self, db_file=None, batch_delay=0.005):
+        self.store = Store(db_file)
+        self.batcher = EnrolBatcher(self.store, batch_delay)
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        """
+        Accept connections until cancelled.
+
+        :param host: Interface to listen on.
+        :type host: str
+        :param port: Port to listen on.
+        :type port: int
+        """
+        server = await asyncio.start_server(self.handle, host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.store.close()
+
+    async def handle(self, reader, writer):
+        """
+        Serve the requests of one keep-alive connection.
+
+        Unexpected errors are logged and answered with ``500 Internal
+        Server Error``; a stream that fails after it started is cut off by
+        closing the connection.
+        """
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    # Without a usable Content-Length the next request
+                    # cannot be found, so the connection is closed.
+                    await self._send(writer, e.status, {"error": str(e)}, False)
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    result = await self.dispatch(method, target, body)
+                except HTTPError as e:
+                    await self._send(writer, e.status, {"error": str(e)}, keep_alive)
+                except Exception:
+                    logger.exception("Failed to serve %s %s", method, target)
+                    await self._send(writer, HTTPStatus.INTERNAL_SERVER_ERROR,
+                                     {"error": "internal server error"}, keep_alive)
+                else:
+                    if isinstance(result, Stream):
+                        await self._send_stream(writer, result, keep_alive)
+                    else:
+                        await self._send(writer, HTTPStatus.OK, result, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception:
+            logger.exception("Connection closed after an error")
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, _ = line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            return None
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = headers.get("content-length", "0")
+        if not length.isdigit():
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Content-Length must be a number")
+        length = int(length)
+        if length > MAX_BODY:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"body larger than {MAX_BODY} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target, headers, body
+
+    async def _send(self, writer, status, payload, keep_alive):
+        data = json.dumps(payload).encode("utf-8")
+        writer.write(self._head(status, keep_alive, f"Content-Length: {len(data)}") + data)
+        await writer.drain()
+
+    async def _send_stream(self, writer, stream, keep_alive):
+        writer.write(self._head(HTTPStatus.OK, keep_alive, "Transfer-Encoding: chunked",
+                                "application/x-ndjson"))
+        async for page in stream:
+            if page:
+                data = "".join(json.dumps(item) + "\n" for item in page).encode("utf-8")
+                writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+                await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    @staticmethod
+    def _head(status, keep_alive, length_header, content_type="application/json"):
+        status = HTTPStatus(status)
+        return (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"{length_header}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode("latin-1")
+
+    async def dispatch(self, method, target, body, allow_stream=True):
+        """
+        Route one request.
+
+        :param method: HTTP method.
+        :type method: str
+        :param target: Path with query string.
+        :type target: str
+        :param body: Request body, JSON for POST requests.
+        :type body: bytes or object
+        :param allow_stream: False inside ``/batch``.
+        :type allow_stream: bool
+        :return: JSON-serialisable result, or a :class:`Stream`.
+        :raises HTTPError: For unknown paths and bad parameters.
+        """
+        try:
+            url = urlsplit(target)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"invalid path {target!r}")
+        parts = [p for p in url.path.split("/") if p]
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        if method == "GET" and len(parts) == 1 and parts[0] in COLUMNS:
+            return await self.store.run(self.store.page, parts[0], params.get("after", ""),
+                                        _limit(params), params.get("q"))
+        if method == "GET" and len(parts) == 2 and parts[0] == "stream" and parts[1] in COLUMNS:
+            if not allow_stream:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "streams cannot be batched")
+            return Stream(self.store, parts[1], _limit(params), params.get("q"))
+        if method == "POST" and parts == ["enroll"]:
+            data = _json_body(body)
+            if not isinstance(data, dict) or "course" not in data or not isinstance(data.get("students"), list):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, 'expected {"course": ..., "students": [...]}')
+            try:
+                result = await self.batcher.enroll(str(data["course"]), [str(s) for s in data["students"]])
+            except db.ClashError as e:
+                raise HTTPError(HTTPStatus.CONFLICT, str(e))
+            return {"added": result.added, "waitlisted": result.waitlisted}
+        if method == "GET" and parts == ["recommend"]:
+            if "student" not in params and "course" not in params:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "give a student or a course")
+            return await self.store.run(self.store.recommend, params.get("student"), params.get("course"),
+                                        _limit(params, "k", 10))
+        if method == "POST" and parts == ["batch"]:
+            requests = _json_body(body)
+            if not isinstance(requests, list):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "expected a list of requests")
+            return await asyncio.gather(*(self._batch_item(r) for r in requests))
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"no route for {method} {url.path}")
+
+    async def _batch_item(self, request):
+        try:
+            if not isinstance(request, dict) or not isinstance(request.get("path"), str):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "each request needs a path")
+            body = request.get("body")
+            method = request.get("method", "POST" if body is not None else "GET")
+            if not isinstance(method, str):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "method must be a string")
+            result = await self.dispatch(method.upper(), request["path"], body, allow_stream=False)
+            return {"status": HTTPStatus.OK.value, "body": result}
+        except HTTPError as e:
+            return {"status": HTTPStatus(e.status).value, "body": {"error": str(e)}}
+        except Exception:
+            logger.exception("Failed to serve batched request %r", request)
+            return {"status": HTTPStatus.INTERNAL_SERVER_ERROR.value, "body": {"error": "internal server error"}}
+
+
+def _limit(params, name="limit", default=DEFAULT_LIMIT):
+    try:
+        limit = int(params.get(name, default))
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be a number")
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _json_body(body):
+    if not isinstance(body, (bytes, str)):
+        return body
+    try:
+        return json.loads(body or b"null")
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "body is not valid JSON")
+
+
+def run(host="127.0.0.1", port=8765, db_file=None):
+    """
+    Run the service until interrupted.
+
+    :param host: Interface to listen on.
+    :type host: str
+    :param port: Port to listen on.
+    :type port: int
+    :param db_file: Database file, defaults to :data:`school.db.DB_FILE`.
+    :type db_file: str
+    """
+    try:
+        asyncio.run(SchoolService(db_file).serve(host, port))
+    except KeyboardInterrupt:
+        pass
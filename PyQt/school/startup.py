@@ -0,0 +1,92 @@
+import os
+import sys
+import time
+
+
+class StartupTimer:
+    """
+    Records how long each startup phase of a GUI takes.
+
+    Call :meth:`mark` at the end of each phase; the time since the previous
+    mark is attributed to that phase. :meth:`first_paint` records the point
+    at which the window became visible, which is checked against
+    ``budget_ms``.
+
+    :param budget_ms: Time-to-first-paint budget in milliseconds.
+    :type budget_ms: float
+    """
+
+    def __init__(self, budget_ms=300.0):
+        self.budget_ms = budget_ms
+        self.phases = []
+        self.first_paint_ms = None
+        self._start = time.perf_counter()
+        self._last = self._start
+
+    def mark(self, phase):
+        """
+        Close the current phase.
+
+        :param phase: Name of the phase that just finished.
+        :type phase: str
+        """
+        now = time.perf_counter()
+        self.phases.append((phase, (now - self._last) * 1000.0))
+        self._last = now
+
+    def first_paint(self):
+        """
+        Record that the window has been painted for the first time.
+        """
+        self.mark("first paint")
+        self.first_paint_ms = self.elapsed_ms()
+
+    def elapsed_ms(self):
+        """
+        Get the time since the timer was created.
+
+        :return: Elapsed time in milliseconds.
+        :rtype: float
+        """
+        return (time.perf_counter() - self._start) * 1000.0
+
+    def over_budget(self):
+        """
+        Check whether the first paint happened later than the budget.
+
+        :return: True if the budget was exceeded.
+        :rtype: bool
+        """
+        return self.first_paint_ms is not None and self.first_paint_ms > self.budget_ms
+
+    def report(self):
+        """
+        Format the timing breakdown.
+
+        :return: One line per phase followed by the totals.
+        :rtype: str
+        """
+        lines = ["startup timing:"]
+        for phase, ms in self.phases:
+            lines.append(f"  {phase:<28}{ms:9.1f} ms")
+        if self.first_paint_ms is not None:
+            status = "OVER BUDGET" if self.over_budget() else "ok"
+            lines.append(f"  {'time to first paint':<28}{self.first_paint_ms:9.1f} ms"
+                         f"  (budget {self.budget_ms:.0f} ms, {status})")
+        lines.append(f"  {'total':<28}{self.elapsed_ms():9.1f} ms")
+        return "\n".join(lines)
+
+
+def timing_requested(argv=None):
+    """
+    Check whether a startup timing report was asked for, either with the
+    ``--startup-timing`` flag or the ``SCHOOL_STARTUP_TIMING`` environment
+    variable.
+
+    :param argv: Command-line arguments, defaults to ``sys.argv``.
+    :type argv: list[str]
+    :return: True if the report should be printed.
+    :rtype: bool
+    """
+    argv = sys.argv if argv is None else argv
+    return "--startup-timing" in argv or bool(os.environ.get("SCHOOL_STARTUP_TIMING"))
@@ -0,0 +1,100 @@
+"""
+Deterministic generator of synthetic school data for benchmarks and
+load tests.
+
+The same arguments always produce the same school, so timings taken on
+different commits are comparable.
+"""
+
+import random
+
+from school import db
+
+_SYLLABLES = ["an", "be", "ca", "da", "el", "fa", "gi", "ha", "is", "jo",
+              "ka", "li", "ma", "no", "or", "pa", "ra", "sa", "ta", "vi"]
+_SUBJECTS = ["Algebra", "Biology", "Chemistry", "Databases", "Economics",
+             "French", "Geometry", "History", "Literature", "Physics",
+             "Programming", "Statistics"]
+
+
+def _name(rng):
+    first = "".join(rng.choice(_SYLLABLES) for _ in range(2)).capitalize()
+    last = "".join(rng.choice(_SYLLABLES) for _ in range(3)).capitalize()
+    return f"{first} {last}"
+
+
+def generate(students=1000, instructors=50, courses=200, courses_per_student=5, seed=0):
+    """
+    Generate a school in the JSON format used by the Tkinter app's
+    ``save_data``.
+
+    :param students: Number of students.
+    :type students: int
+    :param instructors: Number of instructors.
+    :type instructors: int
+    :param courses: Number of courses.
+    :type courses: int
+    :param courses_per_student: Enrolment density, the number of courses
+        each student takes (capped at ``courses``).
+    :type courses_per_student: int
+    :param seed: Seed for the random number generator.
+    :type seed: int
+    :return: Dictionary with ``students``, ``instructors`` and ``courses``.
+    :rtype: dict
+    """
+    rng = random.Random(seed)
+
+    instructor_rows = []
+    for n in range(instructors):
+        name = _name(rng)
+        instructor_rows.append({
+            "type": "instructor",
+            "name": name,
+            "age": rng.randint(28, 70),
+            "email": f"{name.replace(' ', '.').lower()}{n}@staff.school.edu",
+            "instructor_id": f"I{n:06d}",
+            "assigned_courses": [],
+        })
+
+    course_rows = []
+    for n in range(courses):
+        instructor = instructor_rows[rng.randrange(instructors)] if instructors else None
+        course_id = f"C{n:06d}"
+        course_rows.append({
+            "course_id": course_id,
+            "course_name": f"{rng.choice(_SUBJECTS)} {n}",
+            "instructor": instructor["instructor_id"] if instructor else None,
+            "enrolled_students": [],
+        })
+        if instructor:
+            instructor["assigned_courses"].append(course_id)
+
+    student_rows = []
+    per_student = min(courses_per_student, courses)
+    for n in range(students):
+        name = _name(rng)
+        student_id = f"S{n:07d}"
+        taken = rng.sample(range(courses), per_student)
+        for c in taken:
+            course_rows[c]["enrolled_students"].append(student_id)
+        student_rows.append({
+            "type": "student",
+            "name": name,
+            "age": rng.randint(17, 30),
+            "email": f"{name.replace(' ', '.').lower()}{n}@school.edu",
+            "student_id": student_id,
+            "registered_courses": [course_rows[c]["course_id"] for c in taken],
+        })
+
+    return {"students": student_rows, "instructors": instructor_rows, "courses": course_rows}
+
+
+def write_db(data):
+    """
+    Write generated data into the current database file.
+
+    :param data: Data as returned by :func:`generate`.
+    :type data: dict
+    """
+    db.init_db()
+    db.import_records(db.records_from_dict(data))
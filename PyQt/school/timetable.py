@@ -0,0 +1,378 @@
+"""
+Weekly timetables and clash detection.
+
+A course meets in weekly :class:`Slot` s, written like ``Mon 09:00-10:30
+B101`` (the room is optional) and separated by ``;`` when there are
+several. Times are stored as minutes from Monday 00:00, so a slot is a
+half-open interval ``[start, end)`` on one week.
+
+Each student, instructor and room keeps an :class:`IntervalIndex` of the
+slots it is booked for. Bookings of one owner never overlap, so the
+index is a sorted list and a clash check is a binary search:
+:meth:`IntervalIndex.clash` is O(log n). :func:`find_clashes` finds every
+clash in a whole school at once by sorting all bookings and sweeping
+through them, for data that was loaded or imported without the checks.
+"""
+
+import bisect
+import heapq
+import re
+from collections import namedtuple
+
+DAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+MINUTES_PER_DAY = 24 * 60
+
+_SLOT = re.compile(r"^\s*(\w{3})\w*\s+(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})(?:\s+(\S.*?))?\s*$")
+
+Slot = namedtuple("Slot", "start end room")
+Slot.__doc__ = """
+A weekly meeting of a course.
+
+:param start: Minutes from Monday 00:00.
+:type start: int
+:param end: Minutes from Monday 00:00, after ``start``.
+:type end: int
+:param room: Room, or None.
+:type room: str
+"""
+
+
+class ClashError(ValueError):
+    """
+    Raised when a booking overlaps another one of the same student,
+    instructor or room.
+
+    :param clashes: ``(kind, owner, course_id, other_course_id)`` tuples,
+        ``kind`` being ``student``, ``instructor`` or ``room``.
+    :type clashes: list[tuple]
+    """
+
+    def __init__(self, clashes):
+        self.clashes = list(clashes)
+        kind, owner, course_id, other = self.clashes[0]
+        message = f"{course_id} clashes with {other} for {kind} {owner}"
+        if len(self.clashes) > 1:
+            message += f" (and {len(self.clashes) - 1} more)"
+        super().__init__(message)
+
+
+def parse_slot(text):
+    """
+    Parse one slot such as ``Mon 09:00-10:30 B101``.
+
+    :param text: Day, start and end time, and optionally a room.
+    :type text: str
+    :return: The slot.
+    :rtype: Slot
+    :raises ValueError: If the text is not a valid slot.
+    """
+    match = _SLOT.match(text)
+    day = match and match.group(1).capitalize()
+    if not match or day not in DAYS:
+        raise ValueError(f"Invalid time slot {text!r}, expected e.g. 'Mon 09:00-10:30 B101'")
+    sh, sm, eh, em = (int(g) for g in match.group(2, 3, 4, 5))
+    start, end = sh * 60 + sm, eh * 60 + em
+    if sm > 59 or em > 59 or not 0 <= start < end <= MINUTES_PER_DAY:
+        raise ValueError(f"Invalid time slot {text!r}: the end must be after the start on the same day")
+    base = DAYS.index(day) * MINUTES_PER_DAY
+    return Slot(base + start, base + end, match.group(6))
+
+
+def parse_slots(text):
+    """
+    Parse ``;``-separated slots. An empty string gives no slots.
+
+    :param text: Slots as written by :func:`format_slots`.
+    :type text: str
+    :return: The slots, ordered by start.
+    :rtype: list[Slot]
+    :raises ValueError: If a slot is invalid or two of them overlap.
+    """
+    slots = sorted(parse_slot(part) for part in (text or "").split(";") if part.strip())
+    for a, b in zip(slots, slots[1:]):
+        if b.start < a.end:
+            raise ValueError(f"Time slots {format_slot(a)!r} and {format_slot(b)!r} overlap")
+    return slots
+
+
+def format_slot(slot):
+    """
+    Format a slot as ``Mon 09:00-10:30 B101``.
+
+    :param slot: The slot.
+    :type slot: Slot
+    :rtype: str
+    """
+    day, start = divmod(slot.start, MINUTES_PER_DAY)
+    end = slot.end - day * MINUTES_PER_DAY
+    text = f"{DAYS[day]} {start // 60:02d}:{start % 60:02d}-{end // 60:02d}:{end % 60:02d}"
+    return f"{text} {slot.room}" if slot.room else text
+
+
+def format_slots(slots):
+    """
+    Format slots for display or saving; the inverse of :func:`parse_slots`.
+
+    :param slots: The slots.
+    :type slots: iterable[Slot]
+    :rtype: str
+    """
+    return "; ".join(format_slot(s) for s in slots)
+
+
+class IntervalIndex:
+    """
+    Non-overlapping intervals, each labelled with a key (a course ID),
+    kept sorted by start.
+    """
+
+    def __init__(self):
+        self._starts = []
+        self._ends = []
+        self._keys = []
+
+    def __len__(self):
+        return len(self._starts)
+
+    def find(self, start, end, ignore=None):
+        """
+        Find the key of an interval overlapping ``[start, end)``.
+
+        Only the last interval starting before ``end`` can overlap: every
+        earlier one ends before that one starts.
+
+        :param start: Start of the interval.
+        :type start: int
+        :param end: End of the interval.
+        :type end: int
+        :param ignore: Key whose intervals do not count.
+        :return: The key, or None.
+        """
+        i = bisect.bisect_left(self._starts, end) - 1
+        while i >= 0 and self._keys[i] == ignore:
+            i -= 1
+        if i >= 0 and self._ends[i] > start:
+            return self._keys[i]
+        return None
+
+    def clash(self, slots, ignore=None):
+        """
+        Find a booking that overlaps any of the slots.
+
+        :param slots: Slots to check.
+        :type slots: iterable[Slot]
+        :param ignore: Key whose bookings do not count.
+        :return: The key of the first overlapping booking, or None.
+        """
+        for slot in slots:
+            key = self.find(slot.start, slot.end, ignore)
+            if key is not None:
+                return key
+        return None
+
+    def add(self, slots, key):
+        """
+        Book slots under ``key`` without checking for clashes.
+
+        :param slots: Slots to book.
+        :type slots: iterable[Slot]
+        :param key: Label of the booking.
+        """
+        for slot in slots:
+            i = bisect.bisect_left(self._starts, slot.start)
+            self._starts.insert(i, slot.start)
+            self._ends.insert(i, slot.end)
+            self._keys.insert(i, key)
+
+    def remove(self, slots, key):
+        """
+        Release slots booked under ``key``. Slots that are not booked are
+        ignored.
+
+        :param slots: Slots to release.
+        :type slots: iterable[Slot]
+        :param key: Label of the booking.
+        """
+        for slot in slots:
+            i = bisect.bisect_left(self._starts, slot.start)
+            while i < len(self._starts) and self._starts[i] == slot.start:
+                if self._keys[i] == key:
+                    del self._starts[i], self._ends[i], self._keys[i]
+                    break
+                i += 1
+
+
+class Timetable:
+    """
+    One :class:`IntervalIndex` per owner, for example per room.
+
+    :param kind: Name used in clash messages, such as ``room``.
+    :type kind: str
+    """
+
+    def __init__(self, kind="room"):
+        self.kind = kind
+        self._indexes = {}
+
+    def clash(self, owner, slots, ignore=None):
+        """
+        Find a booking of ``owner`` that overlaps any of the slots.
+
+        :param owner: The owner, e.g. a room name.
+        :param slots: Slots to check.
+        :type slots: iterable[Slot]
+        :param ignore: Key whose bookings do not count.
+        :return: The key of the overlapping booking, or None.
+        """
+        index = self._indexes.get(owner)
+        return index.clash(slots, ignore) if index else None
+
+    def book(self, owner, slots, key):
+        """
+        Book slots for an owner.
+
+        :param owner: The owner.
+        :param slots: Slots to book.
+        :type slots: iterable[Slot]
+        :param key: Label of the booking.
+        :raises ClashError: If a slot overlaps another booking; nothing is
+            booked then.
+        """
+        slots = list(slots)
+        other = self.clash(owner, slots, key)
+        if other is not None:
+            raise ClashError([(self.kind, owner, key, other)])
+        self._indexes.setdefault(owner, IntervalIndex()).add(slots, key)
+
+    def release(self, owner, slots, key):
+        """
+        Release slots booked with :meth:`book`.
+
+        :param owner: The owner.
+        :param slots: Slots to release.
+        :type slots: iterable[Slot]
+        :param key: Label of the booking.
+        """
+        index = self._indexes.get(owner)
+        if index:
+            index.remove(slots, key)
+
+    def clear(self):
+        """Forget every booking."""
+        self._indexes.clear()
+
+
+def book_rooms(rooms, course_id, slots):
+    """
+    Book the rooms of a course's slots in a room :class:`Timetable`.
+
+    :param rooms: Room timetable.
+    :type rooms: Timetable
+    :param course_id: ID of the course.
+    :type course_id: str
+    :param slots: The course's slots.
+    :type slots: list[Slot]
+    :raises ClashError: If a room is taken; nothing is booked then.
+    """
+    by_room = {}
+    for slot in slots:
+        if slot.room:
+            by_room.setdefault(slot.room, []).append(slot)
+    for room, room_slots in by_room.items():
+        other = rooms.clash(room, room_slots, course_id)
+        if other is not None:
+            raise ClashError([("room", room, course_id, other)])
+    for room, room_slots in by_room.items():
+        rooms.book(room, room_slots, course_id)
+
+
+def release_rooms(rooms, course_id, slots):
+    """
+    Release the rooms booked with :func:`book_rooms`.
+
+    :param rooms: Room timetable.
+    :type rooms: Timetable
+    :param course_id: ID of the course.
+    :type course_id: str
+    :param slots: The course's slots.
+    :type slots: list[Slot]
+    """
+    for slot in slots:
+        if slot.room:
+            rooms.release(slot.room, [slot], course_id)
+
+
+def find_clashes(bookings):
+    """
+    Find every pair of overlapping bookings of the same owner.
+
+    The bookings are sorted by owner and start, then swept once while a
+    heap holds the bookings still running, so the cost is O(n log n) plus
+    the number of clashes reported.
+
+    :param bookings: ``(kind, owner, start, end, course_id)`` tuples.
+    :type bookings: iterable[tuple]
+    :return: ``(kind, owner, course_id, other_course_id)`` tuples, one per
+        clashing pair of courses and owner.
+    :rtype: list[tuple]
+    """
+    clashes = []
+    seen = set()
+    active = []
+    current = None
+    for kind, owner, start, end, course_id in sorted(bookings, key=lambda b: (b[0], b[1], b[2])):
+        if (kind, owner) != current:
+            current = (kind, owner)
+            active = []
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+        for _, other in active:
+            pair = (kind, owner) + tuple(sorted((other, course_id)))
+            if other != course_id and pair not in seen:
+                seen.add(pair)
+                clashes.append(pair)
+        heapq.heappush(active, (end, course_id))
+    return clashes
+
+
+def course_bookings(courses):
+    """
+    List the bookings of in-memory courses for :func:`find_clashes`: one
+    per slot for its room, the course's instructor and each enrolled
+    student.
+
+    :param courses: Objects with ``course_id``, ``slots``, ``instructor``
+        and ``enrolled_students``.
+    :type courses: iterable
+    :return: ``(kind, owner, start, end, course_id)`` tuples.
+    :rtype: list[tuple]
+    """
+    bookings = []
+    for course in courses:
+        for slot in course.slots:
+            if slot.room:
+                bookings.append(("room", slot.room, slot.start, slot.end, course.course_id))
+            if course.instructor:
+                bookings.append(("instructor", course.instructor.instructor_id, slot.start, slot.end,
+                                 course.course_id))
+            for student in course.enrolled_students:
+                bookings.append(("student", student.student_id, slot.start, slot.end, course.course_id))
+    return bookings
+
+
+def room_timetable(courses):
+    """
+    Build a room :class:`Timetable` from in-memory courses, without
+    checking for clashes.
+
+    :param courses: Objects with ``course_id`` and ``slots``.
+    :type courses: iterable
+    :return: The room timetable.
+    :rtype: Timetable
+    """
+    rooms = Timetable("room")
+    for course in courses:
+        for slot in course.slots:
+            if slot.room:
+                rooms._indexes.setdefault(slot.room, IntervalIndex()).add([slot], course.course_id)
+    return rooms
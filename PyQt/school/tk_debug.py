@@ -0,0 +1,130 @@
+"""
+Debug windows (timings and memory) for the Tkinter apps.
+
+Kept separate from the rest of the package so that only the GUIs import
+tkinter.
+"""
+
+import tkinter as tk
+from tkinter import ttk, messagebox
+
+from school.instrument import instrumentation
+from school.memory import MemorySnapshot, find_retained, memory
+
+TIMING_COLUMNS = ("name", "category", "count", "total_ms", "mean_ms", "min_ms", "max_ms")
+
+
+def show_timings(root):
+    """
+    Open a window listing the instrumentation statistics.
+
+    :param root: Parent window.
+    :type root: tk.Tk
+    """
+    window = tk.Toplevel(root)
+    window.title("Timings")
+    window.geometry("900x400")
+
+    tree = ttk.Treeview(window, columns=TIMING_COLUMNS, show="headings")
+    for col in TIMING_COLUMNS:
+        tree.heading(col, text=col)
+        tree.column(col, width=340 if col == "name" else 80, anchor="w" if col == "name" else "e")
+    tree.pack(fill="both", expand=True)
+
+    def refresh():
+        tree.delete(*tree.get_children())
+        for row in instrumentation.summary():
+            tree.insert("", "end", values=tuple(row[c] for c in TIMING_COLUMNS))
+
+    def reset():
+        instrumentation.reset()
+        refresh()
+
+    def dump_json():
+        instrumentation.dump_json("timings.json")
+        messagebox.showinfo("Timings", "Timings written to timings.json", parent=window)
+
+    def dump_trace():
+        instrumentation.dump_chrome_trace("trace.json")
+        messagebox.showinfo("Timings", "Chrome trace written to trace.json", parent=window)
+
+    buttons = tk.Frame(window)
+    buttons.pack(fill="x")
+    tk.Button(buttons, text="Refresh", command=refresh).pack(side="left")
+    tk.Button(buttons, text="Reset", command=reset).pack(side="left")
+    tk.Button(buttons, text="Export JSON", command=dump_json).pack(side="left")
+    tk.Button(buttons, text="Export Chrome Trace", command=dump_trace).pack(side="left")
+    refresh()
+
+
+def show_memory(root, records, counts=None):
+    """
+    Open a window with memory reports: snapshots and their differences,
+    the diffs recorded around operations, and deleted objects that are
+    still referred to.
+
+    :param root: Parent window.
+    :type root: tk.Tk
+    :param records: Callable returning the current ``(students,
+        instructors, courses)`` lists.
+    :type records: callable
+    :param counts: Callable returning extra counts such as Treeview rows.
+    :type counts: callable
+    """
+    window = tk.Toplevel(root)
+    window.title("Memory")
+    window.geometry("900x500")
+
+    text = tk.Text(window, font="TkFixedFont", wrap="none")
+    text.pack(fill="both", expand=True)
+    last = []
+
+    def show(report):
+        text.delete("1.0", "end")
+        text.insert("end", report)
+
+    def snapshot():
+        snap = MemorySnapshot("now", counts() if counts else None)
+        report = snap.format()
+        if last:
+            change = snap.diff(last[0])
+            change.label = "since last snapshot"
+            report += "\n\n" + change.format()
+        last[:] = [snap]
+        show(report)
+
+    def operations():
+        if not memory.diffs:
+            show("No operations recorded; start tracking first.")
+            return
+        show("\n\n".join(d.format() for d in memory.diffs))
+
+    def toggle_tracking():
+        if memory.enabled:
+            memory.disable()
+        else:
+            memory.enable()
+        track_btn.config(text="Stop Tracking" if memory.enabled else "Start Tracking")
+
+    def retained():
+        found = find_retained(*records())
+        lines = [f"{holder} {attr} -> {item}" for holder, attr, item in found[:500]]
+        if len(found) > 500:
+            lines.append(f"... and {len(found) - 500} more")
+        show("\n".join(lines) if found else "No deleted objects are retained.")
+
+    def export():
+        with open("memory_report.txt", "w") as f:
+            f.write(text.get("1.0", "end"))
+        messagebox.showinfo("Memory", "Report written to memory_report.txt", parent=window)
+
+    buttons = tk.Frame(window)
+    buttons.pack(fill="x")
+    tk.Button(buttons, text="Snapshot", command=snapshot).pack(side="left")
+    tk.Button(buttons, text="Operations", command=operations).pack(side="left")
+    tk.Button(buttons, text="Find Retained Objects", command=retained).pack(side="left")
+    track_btn = tk.Button(buttons, text="Stop Tracking" if memory.enabled else "Start Tracking",
+                          command=toggle_tracking)
+    track_btn.pack(side="left")
+    tk.Button(buttons, text="Export", command=export).pack(side="left")
+    snapshot()
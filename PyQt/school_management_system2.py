@@ -1,82 +1,57 @@
-import sys, re, csv, sqlite3, shutil
+import sys, re, sqlite3
+from school.startup import StartupTimer, timing_requested
+
+startup = StartupTimer()
+
+from PyQt5.QtCore import QThread, QTimer, pyqtSignal
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QLabel, QLineEdit,
     QPushButton, QVBoxLayout, QFormLayout, QTabWidget,
     QComboBox, QMessageBox, QTableWidget, QTableWidgetItem,
-    QHBoxLayout
+    QHBoxLayout, QListWidget, QAbstractItemView
 )
 
+from school.db import (init_db, connect, execute_query, write_csv, backup, enroll_students,
+                       copy_roster, drop_section, delete_ids, ChangeWatcher,
+                       add_course, assign_instructor, course_rows, ClashError)
+from school.timetable import parse_slots
+from school.exams import load_enrolments, parse_rooms, schedule_exams
+from school.campus import district_from_env
+from school.instrument import instrumentation, timed, enable_if_requested
+from school.profiling import enable_from_env
 
-DB_FILE = "school.db"
-
-def init_db():
-    """
-    Create database tables for Students, Instructors, Courses, and Registrations.
-    Ensures schema exists before app runs.
-    """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+startup.mark("imports")
 
-    
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS students (
-        id TEXT PRIMARY KEY,
-        name TEXT NOT NULL,
-        age INTEGER NOT NULL,
-        email TEXT NOT NULL
-    )
-    """)
 
-    
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS instructors (
-        id TEXT PRIMARY KEY,
-        name TEXT NOT NULL,
-        age INTEGER NOT NULL,
-        email TEXT NOT NULL
-    )
-    """)
+class InitialLoader(QThread):
+    """
+    Runs the schema check and the initial queries off the GUI thread.
 
-    
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS courses (
-        id TEXT PRIMARY KEY,
-        name TEXT NOT NULL,
-        instructor_id TEXT,
-        FOREIGN KEY (instructor_id) REFERENCES instructors(id)
-    )
-    """)
+    Emits ``loaded`` with a dictionary of rows for each table once done.
+    """
 
-   
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS registrations (
-        student_id TEXT,
-        course_id TEXT,
-        PRIMARY KEY (student_id, course_id),
-        FOREIGN KEY (student_id) REFERENCES students(id),
-        FOREIGN KEY (course_id) REFERENCES courses(id)
-    )
-    """)
+    loaded = pyqtSignal(object)
 
-    conn.commit()
-    conn.close()
+    def run(self):
+        init_db()
+        self.loaded.emit({
+            "students": execute_query("SELECT * FROM students", fetch=True),
+            "instructors": execute_query("SELECT * FROM instructors", fetch=True),
+            "courses": course_rows(),
+        })
 
 
-def execute_query(query, params=(), fetch=False):
-    """
-    Run SQL queries in a safe manner  against the database.
-    - query: SQL command
-    - params: tuple of values for placeholders
-    - fetch: if True, return results
-    """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute(query, params)
-    data = cursor.fetchall() if fetch else None
-    conn.commit()
-    conn.close()
-    return data
+# How often the window checks whether another instance changed the database.
+POLL_INTERVAL_MS = 1000
 
+# Most records the District tab shows, and its column headers by choice.
+DISTRICT_LIMIT = 1000
+DISTRICT_HEADERS = {
+    "Students": ["Campus", "ID", "Name", "Age", "Email"],
+    "Instructors": ["Campus", "ID", "Name", "Age", "Email"],
+    "Courses": ["Campus", "ID", "Course Name", "Instructor ID", "Enrolled"],
+    "Report": ["Campus", "Students", "Instructors", "Courses", "Registrations"],
+}
 
 
 class SchoolManagementSystem(QMainWindow):
@@ -89,33 +64,151 @@ class SchoolManagementSystem(QMainWindow):
       - Display and manage records such as (delete, export, backup)
     """
 
-    def __init__(self):
+    def __init__(self, lazy=True, district=None):
+        """
+        Build the main window.
+
+        :param lazy: If True, only the first tab is built up front, the
+            remaining tabs are built when first shown and the schema check
+            and initial data load run in the background after the window
+            appears. If False, everything is built and loaded before
+            returning.
+        :type lazy: bool
+        :param district: Campus databases. The window then edits one
+            campus at a time, chosen next to the tabs, and gets a District
+            tab listing the records of every campus.
+        :type district: school.campus.District
+        """
         super().__init__()
         self.setWindowTitle("School Management System")
         self.setGeometry(200, 200, 950, 650)
 
-
-        init_db()
-
-
         self.tabs = QTabWidget()
         self.setCentralWidget(self.tabs)
 
+        self.district = district
+        if district:
+            district.init_db()
+            district.use(next(iter(district.campuses)))
+            self.campus_dropdown = QComboBox()
+            self.campus_dropdown.addItems(list(district.campuses))
+            self.campus_dropdown.currentTextChanged.connect(self.switch_campus)
+            self.tabs.setCornerWidget(self.campus_dropdown)
+
+        self.tab_builders = {
+            "Students": self.add_student_tab,
+            "Instructors": self.add_instructor_tab,
+            "Courses": self.add_course_tab,
+            "Registration": self.add_registration_tab,
+            "Assignments": self.add_assignment_tab,
+            "Records": self.add_records_tab,
+            "Exams": self.add_exams_tab,
+        }
+        if district:
+            self.tab_builders["District"] = self.add_district_tab
+        if instrumentation.enabled:
+            self.tab_builders["Debug"] = self.add_debug_tab
+        self.built_tabs = set()
+        self.data_loaded = False
+        self.watcher = None
+        for title in self.tab_builders:
+            self.tabs.addTab(QWidget(), title)
+        self.tabs.currentChanged.connect(self.build_tab)
+
+        if lazy:
+            self.build_tab(0)
+            startup.mark("build first tab")
+            self.show()
+            startup.mark("show")
+            QTimer.singleShot(0, self.start_background_load)
+        else:
+            init_db()
+            for index in range(self.tabs.count()):
+                self.build_tab(index)
+            self.data_loaded = True
+            self.start_watching()
+            self.refresh_records()
+            self.update_dropdowns()
+            self.show()
+
+    @timed(category="widgets")
+    def build_tab(self, index):
+        """
+        Build the widgets of a tab the first time it is activated.
+
+        :param index: Index of the tab in the tab widget.
+        :type index: int
+        """
+        title = self.tabs.tabText(index)
+        if title in self.built_tabs or title not in self.tab_builders:
+            return
+        self.tab_builders[title](self.tabs.widget(index))
+        self.built_tabs.add(title)
+        if self.data_loaded:
+            if title == "Records":
+                self.refresh_records()
+            else:
+                self.update_dropdowns()
+
+    def start_background_load(self):
+        """Record the first paint and start loading data in the background."""
+        startup.first_paint()
+        self.start_watching()
+        self.loader = InitialLoader()
+        self.loader.loaded.connect(self.apply_initial_data)
+        self.loader.start()
+
+    def start_watching(self):
+        """
+        Poll for commits by other instances every :data:`POLL_INTERVAL_MS`
+        and refresh when there are any.
+        """
+        self.watcher = ChangeWatcher()
+        self.poll_timer = QTimer(self)
+        self.poll_timer.timeout.connect(self.poll_changes)
+        self.poll_timer.start(POLL_INTERVAL_MS)
+
+    def poll_changes(self):
+        """Refresh the records and dropdowns if the database changed."""
+        if self.watcher.changed():
+            self.refresh_records()
+            self.update_dropdowns()
 
-        self.add_student_tab()
-        self.add_instructor_tab()
-        self.add_course_tab()
-        self.add_registration_tab()
-        self.add_assignment_tab()
-        self.add_records_tab()
-
-    
+    def switch_campus(self, campus):
+        """
+        Send all reads and writes to another campus's database and reload
+        what is shown.
+
+        :param campus: Name of the campus.
+        :type campus: str
+        """
+        self.district.use(campus)
+        if self.watcher:
+            self.watcher.close()
+            self.watcher = ChangeWatcher()
         self.refresh_records()
         self.update_dropdowns()
 
-        self.show()
-
-  
+    @timed(category="refresh")
+    def apply_initial_data(self, rows):
+        """
+        Fill the built tabs with the rows loaded by :class:`InitialLoader`.
+
+        :param rows: Rows for ``students``, ``instructors`` and ``courses``.
+        :type rows: dict
+        """
+        startup.mark("background load")
+        self.data_loaded = True
+        if "Records" in self.built_tabs:
+            self.fill_table(self.student_table, rows["students"])
+            self.fill_table(self.instructor_table, rows["instructors"])
+            self.fill_table(self.course_table, rows["courses"])
+        self.update_dropdowns(rows)
+        startup.mark("populate widgets")
+        if timing_requested():
+            print(startup.report(), file=sys.stderr)
+
+    @timed(category="validation")
     def validate_input(self, name=None, age=None, email=None, id_value=None):
         """Validate user inputs for name, age, email, and IDs."""
         if name is not None:
@@ -142,8 +235,7 @@ class SchoolManagementSystem(QMainWindow):
         return True
 
     
-    def add_student_tab(self):
-        tab = QWidget()
+    def add_student_tab(self, tab):
         layout = QFormLayout()
 
         
@@ -163,8 +255,8 @@ class SchoolManagementSystem(QMainWindow):
         layout.addRow(btn)
 
         tab.setLayout(layout)
-        self.tabs.addTab(tab, "Students")
 
+    @timed()
     def add_student(self):
         """Insert a new student record into database."""
         name, sid, age, email = (
@@ -180,12 +272,13 @@ class SchoolManagementSystem(QMainWindow):
             QMessageBox.information(self, "Success", f"Student {name} added!")
             self.refresh_records()
             self.update_dropdowns()
-        except sqlite3.IntegrityError:
-            QMessageBox.warning(self, "Error", "Student ID already exists.")
+        except sqlite3.IntegrityError as e:
+            # The unique email index is named <table>_email.
+            taken = "email" if "_email" in str(e) else "ID"
+            QMessageBox.warning(self, "Error", f"Student {taken} already exists.")
 
     
-    def add_instructor_tab(self):
-        tab = QWidget()
+    def add_instructor_tab(self, tab):
         layout = QFormLayout()
 
         self.instructor_name = QLineEdit()
@@ -203,8 +296,8 @@ class SchoolManagementSystem(QMainWindow):
         layout.addRow(btn)
 
         tab.setLayout(layout)
-        self.tabs.addTab(tab, "Instructors")
 
+    @timed()
     def add_instructor(self):
         """Add  a new instructor record into the  database."""
         name, iid, age, email = (
@@ -220,76 +313,149 @@ class SchoolManagementSystem(QMainWindow):
             QMessageBox.information(self, "Success", f"Instructor {name} added!")
             self.refresh_records()
             self.update_dropdowns()
-        except sqlite3.IntegrityError:
-            QMessageBox.warning(self, "Error", "Instructor ID already exists.")
+        except sqlite3.IntegrityError as e:
+            # The unique email index is named <table>_email.
+            taken = "email" if "_email" in str(e) else "ID"
+            QMessageBox.warning(self, "Error", f"Instructor {taken} already exists.")
 
     
-    def add_course_tab(self):
-        tab = QWidget()
+    def add_course_tab(self, tab):
         layout = QFormLayout()
 
         self.course_id = QLineEdit()
         self.course_name = QLineEdit()
         self.course_instructor = QComboBox()
+        self.course_slots = QLineEdit()
+        self.course_slots.setPlaceholderText("Mon 09:00-10:30 B101; Wed 09:00-10:30 B101")
+        self.course_capacity = QLineEdit()
+        self.course_capacity.setPlaceholderText("unlimited")
 
         layout.addRow("Course ID:", self.course_id)
         layout.addRow("Course Name:", self.course_name)
         layout.addRow("Instructor:", self.course_instructor)
+        layout.addRow("Timetable:", self.course_slots)
+        layout.addRow("Seats:", self.course_capacity)
 
         btn = QPushButton("Add Course")
         btn.clicked.connect(self.add_course)
         layout.addRow(btn)
 
         tab.setLayout(layout)
-        self.tabs.addTab(tab, "Courses")
 
+    @timed()
     def add_course(self):
-        """Insert a new course record into database."""
+        """Insert a new course record and its timetable into database."""
         cid, cname, inst = self.course_id.text(), self.course_name.text(), self.course_instructor.currentText()
         if not self.validate_input(name=cname, id_value=cid):
             return
         inst_id = inst.split(" - ")[0] if inst else None
+        seats = self.course_capacity.text().strip()
+        if seats and (not seats.isdigit() or int(seats) == 0):
+            QMessageBox.warning(self, "Error", "Seats must be a positive number.")
+            return
         try:
-            execute_query("INSERT INTO courses VALUES (?, ?, ?)", (cid, cname, inst_id))
+            add_course(cid, cname, inst_id, parse_slots(self.course_slots.text()), int(seats) if seats else None)
             QMessageBox.information(self, "Success", f"Course {cname} added!")
             self.refresh_records()
             self.update_dropdowns()
         except sqlite3.IntegrityError:
             QMessageBox.warning(self, "Error", "Course ID already exists.")
+        except ValueError as e:
+            QMessageBox.warning(self, "Error", str(e))
 
    
-    def add_registration_tab(self):
-        tab = QWidget()
+    def add_registration_tab(self, tab):
         layout = QFormLayout()
 
-        self.student_dropdown = QComboBox()
+        self.student_dropdown = QListWidget()
+        self.student_dropdown.setSelectionMode(QAbstractItemView.ExtendedSelection)
         self.course_dropdown = QComboBox()
+        self.roster_dropdown = QComboBox()
 
-        layout.addRow("Select Student:", self.student_dropdown)
+        layout.addRow("Select Students:", self.student_dropdown)
         layout.addRow("Select Course:", self.course_dropdown)
 
-        btn = QPushButton("Register Student to Course")
+        btn = QPushButton("Register Students to Course")
         btn.clicked.connect(self.register_student)
         layout.addRow(btn)
 
+        layout.addRow("Copy Roster From:", self.roster_dropdown)
+        buttons = QHBoxLayout()
+        copy_btn = QPushButton("Copy Roster")
+        copy_btn.clicked.connect(self.copy_roster)
+        drop_btn = QPushButton("Drop Section")
+        drop_btn.clicked.connect(self.drop_section)
+        buttons.addWidget(copy_btn)
+        buttons.addWidget(drop_btn)
+        layout.addRow(buttons)
+
         tab.setLayout(layout)
-        self.tabs.addTab(tab, "Registration")
 
+    def selected_course(self, combo):
+        """
+        Get the course ID chosen in a dropdown.
+
+        :param combo: A course dropdown.
+        :type combo: QComboBox
+        :return: The course ID, or None if nothing is chosen.
+        :rtype: str
+        """
+        return combo.currentText().split(" - ")[0] if combo.currentText() else None
+
+    @timed()
     def register_student(self):
-        """Register a student for a course."""
-        if not self.student_dropdown.currentText() or not self.course_dropdown.currentText():
+        """Register the selected students for a course in one transaction."""
+        students = [item.text().split(" - ")[0] for item in self.student_dropdown.selectedItems()]
+        course = self.selected_course(self.course_dropdown)
+        if not students or not course:
             return
-        student = self.student_dropdown.currentText().split(" - ")[0]
-        course = self.course_dropdown.currentText().split(" - ")[0]
         try:
-            execute_query("INSERT INTO registrations VALUES (?, ?)", (student, course))
-            QMessageBox.information(self, "Success", "Student registered to course.")
-        except sqlite3.IntegrityError:
-            QMessageBox.warning(self, "Error", "Student already registered for this course.")
+            added, waitlisted = enroll_students(course, students)
+        except ClashError as e:
+            QMessageBox.warning(self, "Timetable Clash", str(e))
+            return
+        skipped = len(students) - added - waitlisted
+        message = f"{added} student(s) registered to course."
+        if waitlisted:
+            message += f" The course is full: {waitlisted} put on the waitlist."
+        if skipped:
+            message += f" {skipped} already registered or waiting."
+        QMessageBox.information(self, "Success", message)
+        self.refresh_records()
+
+    @timed()
+    def copy_roster(self):
+        """Register every student of the roster course in the selected course."""
+        source = self.selected_course(self.roster_dropdown)
+        target = self.selected_course(self.course_dropdown)
+        if not source or not target or source == target:
+            return
+        try:
+            added, waitlisted = copy_roster(source, target)
+        except ClashError as e:
+            QMessageBox.warning(self, "Timetable Clash", str(e))
+            return
+        message = f"{added} student(s) copied to {target}."
+        if waitlisted:
+            message += f" {waitlisted} put on the waitlist."
+        QMessageBox.information(self, "Success", message)
+        self.refresh_records()
+
+    @timed()
+    def drop_section(self):
+        """Remove every registration of the selected course."""
+        course = self.selected_course(self.course_dropdown)
+        if not course:
+            return
+        answer = QMessageBox.question(self, "Drop Section", f"Remove all students from {course}?")
+        if answer != QMessageBox.Yes:
+            return
+        removed = drop_section(course)
+        QMessageBox.information(self, "Success", f"{removed} registration(s) removed.")
+        self.refresh_records()
 
  
-    def add_assignment_tab(self):
-        tab = QWidget()
+    def add_assignment_tab(self, tab):
         layout = QFormLayout()
 
         self.instructor_dropdown = QComboBox()
@@ -303,22 +469,25 @@ class SchoolManagementSystem(QMainWindow):
         layout.addRow(btn)
 
         tab.setLayout(layout)
-        self.tabs.addTab(tab, "Assignments")
 
+    @timed()
     def assign_instructor(self):
         """Assign an instructor to a course."""
         if not self.instructor_dropdown.currentText() or not self.course_assign_dropdown.currentText():
             return
         instructor = self.instructor_dropdown.currentText().split(" - ")[0]
         course = self.course_assign_dropdown.currentText().split(" - ")[0]
-        execute_query("UPDATE courses SET instructor_id=? WHERE id=?", (instructor, course))
+        try:
+            assign_instructor(course, instructor)
+        except ClashError as e:
+            QMessageBox.warning(self, "Timetable Clash", str(e))
+            return
         QMessageBox.information(self, "Success", "Instructor assigned to course.")
         self.refresh_records()
         self.update_dropdowns()
 
    
-    def add_records_tab(self):
-        tab = QWidget()
+    def add_records_tab(self, tab):
         layout = QVBoxLayout()
 
         
@@ -337,11 +506,22 @@ class SchoolManagementSystem(QMainWindow):
 
     
         self.course_table = QTableWidget()
-        self.course_table.setColumnCount(3)
-        self.course_table.setHorizontalHeaderLabels(["ID", "Course Name", "Instructor ID"])
+        self.course_table.setColumnCount(5)
+        self.course_table.setHorizontalHeaderLabels(["ID", "Course Name", "Instructor ID", "Timetable", "Seats"])
         layout.addWidget(QLabel("Courses"))
         layout.addWidget(self.course_table)
 
+        # The delete button takes the focus when clicked, so remember which
+        # table the user selected in last.
+        self.record_tables = {self.student_table: "students",
+                              self.instructor_table: "instructors",
+                              self.course_table: "courses"}
+        self.active_table = None
+        for table in self.record_tables:
+            table.setSelectionBehavior(QAbstractItemView.SelectRows)
+            table.setSelectionMode(QAbstractItemView.ExtendedSelection)
+            table.itemSelectionChanged.connect(self.track_active_table)
+
        
         btn_layout = QHBoxLayout()
         delete_btn = QPushButton("Delete Selected")
@@ -357,100 +537,240 @@ class SchoolManagementSystem(QMainWindow):
         layout.addLayout(btn_layout)
 
         tab.setLayout(layout)
-        self.tabs.addTab(tab, "Records")
 
+    def track_active_table(self):
+        """Remember a records table when the user changes its selection."""
+        table = self.sender()
+        if table.hasFocus():
+            self.active_table = table
+
+    @timed(category="refresh")
     def refresh_records(self):
         """Reload all tables from the database."""
-       
-        rows = execute_query("SELECT * FROM students", fetch=True)
-        self.student_table.setRowCount(len(rows))
-        for r, s in enumerate(rows):
-            for c, val in enumerate(s):
-                self.student_table.setItem(r, c, QTableWidgetItem(str(val)))
-
-        rows = execute_query("SELECT * FROM instructors", fetch=True)
-        self.instructor_table.setRowCount(len(rows))
-        for r, s in enumerate(rows):
-            for c, val in enumerate(s):
-                self.instructor_table.setItem(r, c, QTableWidgetItem(str(val)))
-
-       
-        rows = execute_query("SELECT * FROM courses", fetch=True)
-        self.course_table.setRowCount(len(rows))
-        for r, s in enumerate(rows):
-            for c, val in enumerate(s):
-                self.course_table.setItem(r, c, QTableWidgetItem(str(val)))
-
+        if self.watcher:
+            self.watcher.mark()
+        if "Records" not in self.built_tabs:
+            return
+        self.fill_table(self.student_table, execute_query("SELECT * FROM students", fetch=True))
+        self.fill_table(self.instructor_table, execute_query("SELECT * FROM instructors", fetch=True))
+        self.fill_table(self.course_table, course_rows())
+
+    @timed(category="widgets")
+    def fill_table(self, table, rows):
+        """
+        Replace the contents of a table widget with ``rows``.
+
+        :param table: Table to fill.
+        :type table: QTableWidget
+        :param rows: Rows returned by :func:`execute_query`.
+        :type rows: list[tuple]
+        """
+        table.setRowCount(len(rows))
+        for r, row in enumerate(rows):
+            for c, val in enumerate(row):
+                table.setItem(r, c, QTableWidgetItem(str(val)))
+
+    @timed()
     def delete_record(self):
-        """Delete the selected record from the table that has focus."""
-        if self.student_table.hasFocus():
-            row = self.student_table.currentRow()
-            sid = self.student_table.item(row, 0).text()
-            execute_query("DELETE FROM students WHERE id=?", (sid,))
-        elif self.instructor_table.hasFocus():
-            row = self.instructor_table.currentRow()
-            iid = self.instructor_table.item(row, 0).text()
-            execute_query("DELETE FROM instructors WHERE id=?", (iid,))
-        elif self.course_table.hasFocus():
-            row = self.course_table.currentRow()
-            cid = self.course_table.item(row, 0).text()
-            execute_query("DELETE FROM courses WHERE id=?", (cid,))
+        """
+        Delete the selected rows of the table selected in last, with one
+        statement in one transaction. The database removes the records'
+        registrations and unassigns a deleted instructor's courses.
+        """
+        table = self.active_table
+        if table is None:
+            return
+        rows = {index.row() for index in table.selectionModel().selectedRows()}
+        ids = [table.item(row, 0).text() for row in sorted(rows)]
+        if not ids:
+            return
+        if len(ids) > 1:
+            answer = QMessageBox.question(self, "Delete", f"Delete {len(ids)} records?")
+            if answer != QMessageBox.Yes:
+                return
+        delete_ids(self.record_tables[table], ids)
         self.refresh_records()
         self.update_dropdowns()
 
+    @timed()
     def export_csv(self):
         """Export all the records to CSV for external use."""
-        with open("school_records.csv", "w", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow(["--- Students ---"])
-            writer.writerow(["ID", "Name", "Age", "Email"])
-            for row in execute_query("SELECT * FROM students", fetch=True):
-                writer.writerow(row)
-            writer.writerow([])
-
-            writer.writerow(["--- Instructors ---"])
-            writer.writerow(["ID", "Name", "Age", "Email"])
-            for row in execute_query("SELECT * FROM instructors", fetch=True):
-                writer.writerow(row)
-            writer.writerow([])
-
-            writer.writerow(["--- Courses ---"])
-            writer.writerow(["ID", "Name", "Instructor ID"])
-            for row in execute_query("SELECT * FROM courses", fetch=True):
-                writer.writerow(row)
-
+        write_csv("school_records.csv")
         QMessageBox.information(self, "Exported", "Data exported to school_records.csv")
 
+    @timed()
     def backup_db(self):
         """Backup the database file to backup_school.db"""
         try:
-            shutil.copy(DB_FILE, "backup_school.db")
+            backup("backup_school.db")
             QMessageBox.information(self, "Backup Complete", "Database backed up to backup_school.db")
         except Exception as e:
             QMessageBox.warning(self, "Error", f"Backup failed: {e}")
 
-   
-    def update_dropdowns(self):
-        """Refresh dropdowns for Students, Courses, and Instructors."""
-        self.student_dropdown.clear()
-        self.course_dropdown.clear()
-        self.instructor_dropdown.clear()
-        self.course_assign_dropdown.clear()
-        self.course_instructor.clear()
+    def add_exams_tab(self, tab):
+        """Build the tab that generates an exam timetable."""
+        layout = QVBoxLayout()
+
+        form = QFormLayout()
+        self.exam_rooms = QLineEdit()
+        self.exam_rooms.setPlaceholderText("B101:120, B102:60 (leave empty to ignore rooms)")
+        form.addRow("Rooms:", self.exam_rooms)
+        layout.addLayout(form)
+
+        generate_btn = QPushButton("Generate Exam Timetable")
+        generate_btn.clicked.connect(self.generate_exams)
+        layout.addWidget(generate_btn)
 
-        for s in execute_query("SELECT id, name FROM students", fetch=True):
-            self.student_dropdown.addItem(f"{s[0]} - {s[1]}")
+        self.exam_table = QTableWidget()
+        self.exam_table.setColumnCount(4)
+        self.exam_table.setHorizontalHeaderLabels(["Slot", "Course ID", "Room", "Students"])
+        layout.addWidget(self.exam_table)
 
-        for c in execute_query("SELECT id, name FROM courses", fetch=True):
-            self.course_dropdown.addItem(f"{c[0]} - {c[1]}")
-            self.course_assign_dropdown.addItem(f"{c[0]} - {c[1]}")
+        self.exam_summary = QLabel()
+        layout.addWidget(self.exam_summary)
+
+        tab.setLayout(layout)
+
+    @timed()
+    def generate_exams(self):
+        """
+        Give every course an exam slot, and a room if rooms are given, so
+        that no student has two exams at once.
+        """
+        try:
+            rooms = parse_rooms(self.exam_rooms.text())
+            conn = connect()
+            try:
+                enrolments = load_enrolments(conn)
+            finally:
+                conn.close()
+            exams = schedule_exams(enrolments, rooms)
+        except ValueError as e:
+            QMessageBox.warning(self, "Error", str(e))
+            return
+        self.fill_table(self.exam_table, [(e.slot, e.course, e.room or "", e.students) for e in exams])
+        slots = max((e.slot for e in exams), default=0)
+        self.exam_summary.setText(f"{len(exams)} exams in {slots} slots")
 
-        for i in execute_query("SELECT id, name FROM instructors", fetch=True):
-            self.instructor_dropdown.addItem(f"{i[0]} - {i[1]}")
-            self.course_instructor.addItem(f"{i[0]} - {i[1]}")
+    def add_district_tab(self, tab):
+        """Build the tab that lists and searches the records of every campus."""
+        layout = QVBoxLayout()
+
+        search_layout = QHBoxLayout()
+        self.district_table_choice = QComboBox()
+        self.district_table_choice.addItems(["Students", "Instructors", "Courses", "Report"])
+        self.district_search = QLineEdit()
+        self.district_search.setPlaceholderText("ID, name or email contains...")
+        search_btn = QPushButton("Search All Campuses")
+        search_btn.clicked.connect(self.search_district)
+        self.district_search.returnPressed.connect(self.search_district)
+        for w in (self.district_table_choice, self.district_search, search_btn):
+            search_layout.addWidget(w)
+        layout.addLayout(search_layout)
+
+        self.district_table = QTableWidget()
+        layout.addWidget(self.district_table)
+
+        tab.setLayout(layout)
+
+    @timed()
+    def search_district(self):
+        """Fill the District tab with the matching records of every campus."""
+        choice = self.district_table_choice.currentText()
+        if choice == "Report":
+            rows = [(campus or "Total", *counts) for campus, *counts in self.district.report()]
+        else:
+            rows = self.district.search(choice.lower(), self.district_search.text().strip(),
+                                        DISTRICT_LIMIT)
+        headers = DISTRICT_HEADERS[choice]
+        self.district_table.setColumnCount(len(headers))
+        self.district_table.setHorizontalHeaderLabels(headers)
+        self.fill_table(self.district_table, rows)
+
+    def add_debug_tab(self, tab):
+        """Build the tab that shows instrumentation timings."""
+        layout = QVBoxLayout()
+
+        self.timings_table = QTableWidget()
+        self.timings_table.setColumnCount(7)
+        self.timings_table.setHorizontalHeaderLabels(
+            ["Name", "Category", "Count", "Total ms", "Mean ms", "Min ms", "Max ms"])
+        layout.addWidget(self.timings_table)
+
+        btn_layout = QHBoxLayout()
+        refresh_btn = QPushButton("Refresh")
+        reset_btn = QPushButton("Reset")
+        json_btn = QPushButton("Export JSON")
+        trace_btn = QPushButton("Export Chrome Trace")
+
+        refresh_btn.clicked.connect(self.refresh_timings)
+        reset_btn.clicked.connect(self.reset_timings)
+        json_btn.clicked.connect(self.export_timings)
+        trace_btn.clicked.connect(self.export_trace)
+
+        for b in (refresh_btn, reset_btn, json_btn, trace_btn):
+            btn_layout.addWidget(b)
+        layout.addLayout(btn_layout)
+
+        tab.setLayout(layout)
+        self.refresh_timings()
+
+    def refresh_timings(self):
+        """Show the current instrumentation statistics."""
+        rows = [(r["name"], r["category"], r["count"], r["total_ms"], r["mean_ms"], r["min_ms"], r["max_ms"])
+                for r in instrumentation.summary()]
+        self.fill_table(self.timings_table, rows)
+
+    def reset_timings(self):
+        """Discard the collected statistics."""
+        instrumentation.reset()
+        self.refresh_timings()
+
+    def export_timings(self):
+        """Write the statistics to timings.json."""
+        instrumentation.dump_json("timings.json")
+        QMessageBox.information(self, "Exported", "Timings written to timings.json")
+
+    def export_trace(self):
+        """Write the recorded events to trace.json in Chrome trace format."""
+        instrumentation.dump_chrome_trace("trace.json")
+        QMessageBox.information(self, "Exported", "Chrome trace written to trace.json")
+
+   
+    @timed(category="refresh")
+    def update_dropdowns(self, rows=None):
+        """
+        Refresh dropdowns for Students, Courses, and Instructors on the tabs built so far.
+
+        :param rows: Already loaded rows per table; queried when not given.
+        :type rows: dict
+        """
+        if self.watcher and rows is None:
+            self.watcher.mark()
+        combos = []
+        if "Courses" in self.built_tabs:
+            combos.append((self.course_instructor, "instructors"))
+        if "Registration" in self.built_tabs:
+            combos.append((self.student_dropdown, "students"))
+            combos.append((self.course_dropdown, "courses"))
+            combos.append((self.roster_dropdown, "courses"))
+        if "Assignments" in self.built_tabs:
+            combos.append((self.instructor_dropdown, "instructors"))
+            combos.append((self.course_assign_dropdown, "courses"))
+
+        items = {}
+        for combo, table in combos:
+            if table not in items:
+                source = rows[table] if rows else execute_query(f"SELECT id, name FROM {table}", fetch=True)
+                items[table] = [f"{r[0]} - {r[1]}" for r in source]
+            combo.clear()
+            combo.addItems(items[table])
 
 
 if __name__ == "__main__":
+    enable_if_requested()
+    enable_from_env()
     app = QApplication(sys.argv)
-    window = SchoolManagementSystem()
+    startup.mark("QApplication")
+    window = SchoolManagementSystem(district=district_from_env())
     sys.exit(app.exec_())
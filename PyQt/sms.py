@@ -1,14 +1,28 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 
+from main import Student, Instructor, Course
+from school.dedupe import normalize_email
+from school.instrument import instrumentation, timed, enable_if_requested
+from school.memory import memory, tracked, enable_if_requested as enable_memory_if_requested
+from school.timetable import ClashError, Timetable, book_rooms, parse_slots, find_clashes, course_bookings
+
 # Global storage
 students = []
 instructors = []
 courses = []
+rooms = Timetable("room")
 
 # ---------------- GUI FUNCTIONS ----------------
 
+# Refuse an email that is already used, ignoring case
+def check_email_free(email, people):
+    key = normalize_email(email)
+    if any(normalize_email(p.get_email()) == key for p in people):
+        raise ValueError(f"Email {email} is already used")
+
 # Add Student
+@timed()
 def add_student():
     try:
         name = student_name_entry.get()
@@ -17,6 +31,7 @@ def add_student():
         student_id = student_id_entry.get()
 
         student = Student(name, age, email, student_id)
+        check_email_free(email, students)
         students.append(student)
 
         messagebox.showinfo("Success", f"Student {name} added!")
@@ -26,6 +41,7 @@ def add_student():
         messagebox.showerror("Error", str(e))
 
 # Add Instructor
+@timed()
 def add_instructor():
     try:
         name = instr_name_entry.get()
@@ -34,6 +50,7 @@ def add_instructor():
         instructor_id = instr_id_entry.get()
 
         instructor = Instructor(name, age, email, instructor_id)
+        check_email_free(email, instructors)
         instructors.append(instructor)
 
         messagebox.showinfo("Success", f"Instructor {name} added!")
@@ -43,47 +60,122 @@ def add_instructor():
         messagebox.showerror("Error", str(e))
 
 # Add Course
+@timed()
 def add_course():
-    course_id = course_id_entry.get()
-    course_name = course_name_entry.get()
-    course = Course(course_id, course_name, None)
-    courses.append(course)
-    messagebox.showinfo("Success", f"Course {course_name} added!")
-    refresh_dropdowns()
-    refresh_table()
+    try:
+        course_id = course_id_entry.get()
+        course_name = course_name_entry.get()
+        capacity = int(course_capacity_entry.get()) if course_capacity_entry.get().strip() else None
+        if capacity is not None and capacity < 1:
+            raise ValueError("Capacity must be a positive number")
+        course = Course(course_id, course_name, None, parse_slots(course_slots_entry.get()), capacity)
+        book_rooms(rooms, course_id, course.slots)
+        courses.append(course)
+        messagebox.showinfo("Success", f"Course {course_name} added!")
+        refresh_dropdowns()
+        refresh_table()
+    except ValueError as e:
+        messagebox.showerror("Error", str(e))
 
 # Register Student to Course
+@timed()
 def register_student_to_course():
     student_name = student_select.get()
     course_name = course_select.get()
     student = next((s for s in students if s.name == student_name), None)
     course = next((c for c in courses if c.course_name == course_name), None)
     if student and course:
-        student.register_course(course)
-        course.add_student(student)
-        messagebox.showinfo("Success", f"{student.name} registered in {course.course_name}")
+        try:
+            seated = course.register(student)
+        except ClashError as e:
+            messagebox.showerror("Timetable Clash", str(e))
+            return
+        if seated:
+            messagebox.showinfo("Success", f"{student.name} registered in {course.course_name}")
+        else:
+            messagebox.showinfo("Course Full", f"{course.course_name} is full; {student.name} was put on the waitlist")
+        refresh_table()
+
+# Register the students selected in the list to the chosen course
+@timed()
+def register_selected_students():
+    course = next((c for c in courses if c.course_name == course_select.get()), None)
+    picked = [students[i] for i in student_list.curselection()]
+    if course and picked:
+        try:
+            added = course.enroll(picked)
+        except ClashError as e:
+            messagebox.showerror("Timetable Clash", str(e))
+            return
+        messagebox.showinfo("Success", f"{len(added)} student(s) registered in {course.course_name}, "
+                                       f"{len(course.waitlist)} waiting")
+        refresh_table()
+
+# Copy the roster of one course into the chosen course
+@timed()
+def copy_roster():
+    target = next((c for c in courses if c.course_name == course_select.get()), None)
+    source = next((c for c in courses if c.course_name == roster_select.get()), None)
+    if target and source and target is not source:
+        try:
+            added = target.copy_roster(source)
+        except ClashError as e:
+            messagebox.showerror("Timetable Clash", str(e))
+            return
+        messagebox.showinfo("Success", f"{len(added)} student(s) copied to {target.course_name}, "
+                                       f"{len(target.waitlist)} waiting")
+        refresh_table()
+
+# Remove every student from the chosen course
+@timed()
+def drop_section():
+    course = next((c for c in courses if c.course_name == course_select.get()), None)
+    if course and messagebox.askyesno("Drop Section", f"Remove all students from {course.course_name}?"):
+        dropped = course.drop_all()
+        messagebox.showinfo("Success", f"{len(dropped)} student(s) removed from {course.course_name}")
         refresh_table()
 
 # Assign Instructor to Course
+@timed()
 def assign_instructor_to_course():
     instr_name = instr_select.get()
     course_name = course_assign_select.get()
     instructor = next((i for i in instructors if i.name == instr_name), None)
     course = next((c for c in courses if c.course_name == course_name), None)
     if instructor and course:
-        instructor.assign_course(course)
+        try:
+            instructor.assign_course(course)
+        except ClashError as e:
+            messagebox.showerror("Timetable Clash", str(e))
+            return
         course.instructor = instructor
         messagebox.showinfo("Success", f"{instructor.name} assigned to {course.course_name}")
         refresh_table()
 
+# List every student, instructor and room booked twice at the same time
+@timed()
+def show_clashes():
+    clashes = find_clashes(course_bookings(courses))
+    if clashes:
+        lines = [f"{kind} {owner}: {a} and {b}" for kind, owner, a, b in clashes[:30]]
+        messagebox.showwarning("Timetable", f"{len(clashes)} clashes:\n" + "\n".join(lines))
+    else:
+        messagebox.showinfo("Timetable", "No clashes found.")
+
 # Refresh dropdowns
+@timed(category="refresh")
 def refresh_dropdowns():
     student_select["values"] = [s.name for s in students]
     course_select["values"] = [c.course_name for c in courses]
+    roster_select["values"] = [c.course_name for c in courses]
+    student_list.delete(0, "end")
+    student_list.insert("end", *[f"{s.student_id} - {s.name}" for s in students])
     instr_select["values"] = [i.name for i in instructors]
     course_assign_select["values"] = [c.course_name for c in courses]
 
 # Refresh table
+@tracked()
+@timed(category="refresh")
 def refresh_table():
     for row in tree.get_children():
         tree.delete(row)
@@ -92,10 +184,10 @@ def refresh_table():
     for i in instructors:
         tree.insert("", "end", values=("Instructor", i.name, i.instructor_id))
     for c in courses:
-        instr_name = c.instructor.name if c.instructor else "None"
-        tree.insert("", "end", values=("Course", c.course_name, instr_name))
+        tree.insert("", "end", values=("Course", c.course_name, c.instructor_name))
 
 # Search records
+@timed()
 def search_records():
     query = search_entry.get().lower()
     for row in tree.get_children():
@@ -108,76 +200,120 @@ def search_records():
             tree.insert("", "end", values=("Instructor", i.name, i.instructor_id))
     for c in courses:
         if query in c.course_name.lower() or query in c.course_id.lower():
-            instr_name = c.instructor.name if c.instructor else "None"
-            tree.insert("", "end", values=("Course", c.course_name, instr_name))
+            tree.insert("", "end", values=("Course", c.course_name, c.instructor_name))
 
 # ---------------- GUI LAYOUT ----------------
-root = tk.Tk()
-root.title("School Management System")
-root.geometry("900x700")
-
-# Student form
-student_frame = tk.LabelFrame(root, text="Add Student")
-student_frame.pack(fill="x", padx=10, pady=5)
-tk.Label(student_frame, text="Name").grid(row=0, column=0)
-student_name_entry = tk.Entry(student_frame); student_name_entry.grid(row=0, column=1)
-tk.Label(student_frame, text="Age").grid(row=1, column=0)
-student_age_entry = tk.Entry(student_frame); student_age_entry.grid(row=1, column=1)
-tk.Label(student_frame, text="Email").grid(row=2, column=0)
-student_email_entry = tk.Entry(student_frame); student_email_entry.grid(row=2, column=1)
-tk.Label(student_frame, text="ID").grid(row=3, column=0)
-student_id_entry = tk.Entry(student_frame); student_id_entry.grid(row=3, column=1)
-tk.Button(student_frame, text="Add Student", command=add_student).grid(row=4, columnspan=2, pady=5)
-
-# Instructor form
-instr_frame = tk.LabelFrame(root, text="Add Instructor")
-instr_frame.pack(fill="x", padx=10, pady=5)
-tk.Label(instr_frame, text="Name").grid(row=0, column=0)
-instr_name_entry = tk.Entry(instr_frame); instr_name_entry.grid(row=0, column=1)
-tk.Label(instr_frame, text="Age").grid(row=1, column=0)
-instr_age_entry = tk.Entry(instr_frame); instr_age_entry.grid(row=1, column=1)
-tk.Label(instr_frame, text="Email").grid(row=2, column=0)
-instr_email_entry = tk.Entry(instr_frame); instr_email_entry.grid(row=2, column=1)
-tk.Label(instr_frame, text="ID").grid(row=3, column=0)
-instr_id_entry = tk.Entry(instr_frame); instr_id_entry.grid(row=3, column=1)
-tk.Button(instr_frame, text="Add Instructor", command=add_instructor).grid(row=4, columnspan=2, pady=5)
-
-# Course form
-course_frame = tk.LabelFrame(root, text="Add Course")
-course_frame.pack(fill="x", padx=10, pady=5)
-tk.Label(course_frame, text="Course ID").grid(row=0, column=0)
-course_id_entry = tk.Entry(course_frame); course_id_entry.grid(row=0, column=1)
-tk.Label(course_frame, text="Course Name").grid(row=1, column=0)
-course_name_entry = tk.Entry(course_frame); course_name_entry.grid(row=1, column=1)
-tk.Button(course_frame, text="Add Course", command=add_course).grid(row=2, columnspan=2, pady=5)
-
-# Student Registration
-reg_frame = tk.LabelFrame(root, text="Register Student to Course")
-reg_frame.pack(fill="x", padx=10, pady=5)
-student_select = ttk.Combobox(reg_frame); student_select.grid(row=0, column=0, padx=5)
-course_select = ttk.Combobox(reg_frame); course_select.grid(row=0, column=1, padx=5)
-tk.Button(reg_frame, text="Register", command=register_student_to_course).grid(row=0, column=2, padx=5)
-
-# Instructor Assignment
-assign_frame = tk.LabelFrame(root, text="Assign Instructor to Course")
-assign_frame.pack(fill="x", padx=10, pady=5)
-instr_select = ttk.Combobox(assign_frame); instr_select.grid(row=0, column=0, padx=5)
-course_assign_select = ttk.Combobox(assign_frame); course_assign_select.grid(row=0, column=1, padx=5)
-tk.Button(assign_frame, text="Assign", command=assign_instructor_to_course).grid(row=0, column=2, padx=5)
-
-# Records Display
-display_frame = tk.LabelFrame(root, text="All Records")
-display_frame.pack(fill="both", expand=True, padx=10, pady=5)
-tree = ttk.Treeview(display_frame, columns=("Type", "Name", "ID/Instructor"), show="headings")
-tree.heading("Type", text="Type")
-tree.heading("Name", text="Name")
-tree.heading("ID/Instructor", text="ID / Instructor")
-tree.pack(fill="both", expand=True)
-
-# Search
-search_frame = tk.Frame(root)
-search_frame.pack(fill="x", padx=10, pady=5)
-search_entry = tk.Entry(search_frame); search_entry.pack(side="left", fill="x", expand=True, padx=5)
-tk.Button(search_frame, text="Search", command=search_records).pack(side="left")
-
-root.mainloop()
+def build_gui():
+    """Create the main window and all of its widgets."""
+    global root, student_name_entry, student_age_entry, student_email_entry, student_id_entry
+    global instr_name_entry, instr_age_entry, instr_email_entry, instr_id_entry
+    global course_id_entry, course_name_entry, course_slots_entry, course_capacity_entry, student_select, course_select
+    global instr_select, course_assign_select, tree, search_entry
+    global student_list, roster_select
+    root = tk.Tk()
+    root.title("School Management System")
+    root.geometry("900x700")
+
+    # Student form
+    student_frame = tk.LabelFrame(root, text="Add Student")
+    student_frame.pack(fill="x", padx=10, pady=5)
+    tk.Label(student_frame, text="Name").grid(row=0, column=0)
+    student_name_entry = tk.Entry(student_frame); student_name_entry.grid(row=0, column=1)
+    tk.Label(student_frame, text="Age").grid(row=1, column=0)
+    student_age_entry = tk.Entry(student_frame); student_age_entry.grid(row=1, column=1)
+    tk.Label(student_frame, text="Email").grid(row=2, column=0)
+    student_email_entry = tk.Entry(student_frame); student_email_entry.grid(row=2, column=1)
+    tk.Label(student_frame, text="ID").grid(row=3, column=0)
+    student_id_entry = tk.Entry(student_frame); student_id_entry.grid(row=3, column=1)
+    tk.Button(student_frame, text="Add Student", command=add_student).grid(row=4, columnspan=2, pady=5)
+
+    # Instructor form
+    instr_frame = tk.LabelFrame(root, text="Add Instructor")
+    instr_frame.pack(fill="x", padx=10, pady=5)
+    tk.Label(instr_frame, text="Name").grid(row=0, column=0)
+    instr_name_entry = tk.Entry(instr_frame); instr_name_entry.grid(row=0, column=1)
+    tk.Label(instr_frame, text="Age").grid(row=1, column=0)
+    instr_age_entry = tk.Entry(instr_frame); instr_age_entry.grid(row=1, column=1)
+    tk.Label(instr_frame, text="Email").grid(row=2, column=0)
+    instr_email_entry = tk.Entry(instr_frame); instr_email_entry.grid(row=2, column=1)
+    tk.Label(instr_frame, text="ID").grid(row=3, column=0)
+    instr_id_entry = tk.Entry(instr_frame); instr_id_entry.grid(row=3, column=1)
+    tk.Button(instr_frame, text="Add Instructor", command=add_instructor).grid(row=4, columnspan=2, pady=5)
+
+    # Course form
+    course_frame = tk.LabelFrame(root, text="Add Course")
+    course_frame.pack(fill="x", padx=10, pady=5)
+    tk.Label(course_frame, text="Course ID").grid(row=0, column=0)
+    course_id_entry = tk.Entry(course_frame); course_id_entry.grid(row=0, column=1)
+    tk.Label(course_frame, text="Course Name").grid(row=1, column=0)
+    course_name_entry = tk.Entry(course_frame); course_name_entry.grid(row=1, column=1)
+    tk.Label(course_frame, text="Timetable").grid(row=2, column=0)
+    course_slots_entry = tk.Entry(course_frame, width=40); course_slots_entry.grid(row=2, column=1)
+    tk.Label(course_frame, text="e.g. Mon 09:00-10:30 B101; Wed 09:00-10:30 B101").grid(row=2, column=2)
+    tk.Label(course_frame, text="Capacity").grid(row=3, column=0)
+    course_capacity_entry = tk.Entry(course_frame); course_capacity_entry.grid(row=3, column=1)
+    tk.Label(course_frame, text="empty for no limit").grid(row=3, column=2)
+    tk.Button(course_frame, text="Add Course", command=add_course).grid(row=4, column=0, columnspan=2, pady=5)
+    tk.Button(course_frame, text="Find Clashes", command=show_clashes).grid(row=4, column=2, pady=5)
+
+    # Student Registration
+    reg_frame = tk.LabelFrame(root, text="Register Student to Course")
+    reg_frame.pack(fill="x", padx=10, pady=5)
+    student_select = ttk.Combobox(reg_frame); student_select.grid(row=0, column=0, padx=5)
+    course_select = ttk.Combobox(reg_frame); course_select.grid(row=0, column=1, padx=5)
+    tk.Button(reg_frame, text="Register", command=register_student_to_course).grid(row=0, column=2, padx=5)
+    student_list = tk.Listbox(reg_frame, selectmode="extended", height=4, exportselection=False)
+    student_list.grid(row=1, column=0, padx=5, pady=5)
+    tk.Button(reg_frame, text="Register Selected", command=register_selected_students).grid(row=1, column=1, padx=5)
+    roster_select = ttk.Combobox(reg_frame); roster_select.grid(row=2, column=0, padx=5)
+    tk.Button(reg_frame, text="Copy Roster", command=copy_roster).grid(row=2, column=1, padx=5)
+    tk.Button(reg_frame, text="Drop Section", command=drop_section).grid(row=2, column=2, padx=5)
+
+    # Instructor Assignment
+    assign_frame = tk.LabelFrame(root, text="Assign Instructor to Course")
+    assign_frame.pack(fill="x", padx=10, pady=5)
+    instr_select = ttk.Combobox(assign_frame); instr_select.grid(row=0, column=0, padx=5)
+    course_assign_select = ttk.Combobox(assign_frame); course_assign_select.grid(row=0, column=1, padx=5)
+    tk.Button(assign_frame, text="Assign", command=assign_instructor_to_course).grid(row=0, column=2, padx=5)
+
+    # Records Display
+    display_frame = tk.LabelFrame(root, text="All Records")
+    display_frame.pack(fill="both", expand=True, padx=10, pady=5)
+    tree = ttk.Treeview(display_frame, columns=("Type", "Name", "ID/Instructor"), show="headings")
+    tree.heading("Type", text="Type")
+    tree.heading("Name", text="Name")
+    tree.heading("ID/Instructor", text="ID / Instructor")
+    tree.pack(fill="both", expand=True)
+
+    # Search
+    search_frame = tk.Frame(root)
+    search_frame.pack(fill="x", padx=10, pady=5)
+    search_entry = tk.Entry(search_frame); search_entry.pack(side="left", fill="x", expand=True, padx=5)
+    tk.Button(search_frame, text="Search", command=search_records).pack(side="left")
+    if instrumentation.enabled:
+        from school.tk_debug import show_timings
+        tk.Button(search_frame, text="Timings", command=lambda: show_timings(root)).pack(side="left")
+
+    # Debug menu
+    menubar = tk.Menu(root)
+    debug_menu = tk.Menu(menubar, tearoff=0)
+    debug_menu.add_command(label="Memory Report", command=show_memory)
+    menubar.add_cascade(label="Debug", menu=debug_menu)
+    root.config(menu=menubar)
+
+# Count the rows of the records table, for memory reports
+def tree_counts():
+    return {"table rows": len(tree.get_children())}
+
+# Open the memory report window
+def show_memory():
+    from school.tk_debug import show_memory as show
+    show(root, lambda: (students, instructors, courses), tree_counts)
+
+
+if __name__ == "__main__":
+    enable_if_requested()
+    enable_memory_if_requested()
+    memory.counts = tree_counts
+    build_gui()
+    root.mainloop()
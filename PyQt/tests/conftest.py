@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The lab 3 modules are scripts next to each other, not a package.
+LAB3_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "lab 3")
+if LAB3_DIR not in sys.path:
+    sys.path.insert(0, LAB3_DIR)
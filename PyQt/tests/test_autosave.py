@@ -0,0 +1,72 @@
+import pytest
+
+import school_autosave
+from school_autosave import Autosaver
+from school_management import Student
+
+
+@pytest.fixture
+def base(tmp_path):
+    return str(tmp_path / "autosave")
+
+
+def test_failed_snapshot_keeps_pending_changes(base, monkeypatch):
+    autosaver = Autosaver(base)
+    try:
+        autosaver.added(Student("Ann", 20, "ann@example.com", "S1"))
+
+        def fail(*args, **kwargs):
+            raise OSError("disk full")
+        monkeypatch.setattr(school_autosave, "save_data", fail)
+        with pytest.raises(OSError):
+            autosaver.compact([], [], [])
+        assert autosaver.tracker.dirty
+    finally:
+        autosaver.close()
+
+
+def test_crash_before_emptying_journal_does_not_replay_it(base, monkeypatch):
+    ann = Student("Ann", 20, "ann@example.com", "S1")
+    autosaver = Autosaver(base)
+    try:
+        autosaver.added(ann)
+        autosaver.flush([ann], [], [])
+        # A change the journal does not hold, only the snapshot will.
+        ann.name = "Ann Smith"
+
+        def crash(generation=None):
+            raise KeyboardInterrupt
+        monkeypatch.setattr(autosaver.journal, "truncate", crash)
+        with pytest.raises(KeyboardInterrupt):
+            autosaver.compact([ann], [], [])
+    finally:
+        autosaver.close()
+    monkeypatch.undo()
+
+    autosaver = Autosaver(base)
+    try:
+        students, _, _ = autosaver.recover()
+        assert [s.name for s in students] == ["Ann Smith"]
+        assert autosaver.journal.length == 0
+    finally:
+        autosaver.close()
+
+
+def test_recover_replays_journal_after_snapshot(base):
+    ann = Student("Ann", 20, "ann@example.com", "S1")
+    autosaver = Autosaver(base)
+    try:
+        autosaver.added(ann)
+        autosaver.compact([ann], [], [])
+        bob = Student("Bob", 21, "bob@example.com", "S2")
+        autosaver.added(bob)
+        autosaver.flush([ann, bob], [], [])
+    finally:
+        autosaver.close()
+
+    autosaver = Autosaver(base)
+    try:
+        students, _, _ = autosaver.recover()
+        assert sorted(s.student_id for s in students) == ["S1", "S2"]
+    finally:
+        autosaver.close()
@@ -0,0 +1,138 @@
+import pytest
+
+from school import db
+from school.timetable import parse_slots
+
+from school_management import Course, Student, detach
+
+
+@pytest.fixture
+def school_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_FILE", str(tmp_path / "school.db"))
+    db.init_db()
+
+
+def records(capacity, students=3):
+    return {
+        "students": [(f"S{n}", f"Student {n}", 20, f"s{n}@example.com") for n in range(students)],
+        "instructors": [],
+        "courses": [("C1", "Algebra", None)],
+        "registrations": [(f"S{n}", "C1") for n in range(students)],
+        "capacity": [("C1", capacity)],
+    }
+
+
+def seats():
+    return db.execute_query("SELECT capacity, taken FROM course_seats WHERE course_id='C1'", fetch=True)
+
+
+def registered():
+    return sorted(r[0] for r in db.execute_query("SELECT student_id FROM registrations", fetch=True))
+
+
+def test_import_uses_the_imported_capacity(school_db):
+    # The course is full under the old capacity; the import raises it.
+    db.import_records(records(1, students=1))
+    db.import_records(records(3))
+    assert registered() == ["S0", "S1", "S2"]
+    assert seats() == [(3, 3)]
+
+
+def test_import_keeps_roster_over_capacity(school_db):
+    db.import_records(records(2))
+    assert registered() == ["S0", "S1", "S2"]
+    assert seats() == [(2, 3)]
+    assert db.waitlist("C1") == []
+
+
+@pytest.fixture
+def course(school_db):
+    # C1 has two seats on Monday morning; C2 overlaps it and has no limit.
+    db.execute_many("INSERT INTO students VALUES (?, ?, ?, ?)",
+                    [(f"S{n}", f"Student {n}", 20, f"s{n}@example.com") for n in range(4)])
+    db.add_course("C1", "Algebra", slots=parse_slots("Mon 09:00-10:00"), capacity=2)
+    db.add_course("C2", "Biology", slots=parse_slots("Mon 09:30-10:30"))
+    return "C1"
+
+
+def test_enroll_fills_seats_then_waitlist(course):
+    assert db.enroll_students(course, ["S0", "S1", "S2", "S3"]) == (2, 2)
+    assert db.enroll_students(course, ["S0", "S2"]) == (0, 0)
+    assert registered() == ["S0", "S1"]
+    assert seats() == [(2, 2)]
+    assert db.waitlist(course) == ["S2", "S3"]
+
+
+def test_drop_promotes_first_waiting(course):
+    db.enroll_students(course, ["S0", "S1", "S2", "S3"])
+    assert db.drop_students(course, ["S0"]) == 1
+    assert registered() == ["S1", "S2"]
+    assert db.waitlist(course) == ["S3"]
+    assert seats() == [(2, 2)]
+
+
+def test_promotion_skips_a_clashing_student(course):
+    db.enroll_students(course, ["S0", "S1", "S2", "S3"])
+    db.execute_query("INSERT INTO registrations VALUES ('S2', 'C2')")
+    db.drop_students(course, ["S0"])
+    assert db.waitlist(course) == ["S2"]
+    assert sorted(db.execute_query("SELECT student_id FROM registrations WHERE course_id='C1'",
+                                   fetch=True)) == [("S1",), ("S3",)]
+
+
+def test_deleting_students_promotes(course):
+    db.enroll_students(course, ["S0", "S1", "S2", "S3"])
+    db.delete_ids("students", ["S0", "S1"])
+    assert registered() == ["S2", "S3"]
+    assert db.waitlist(course) == []
+
+
+def test_set_capacity(course):
+    db.enroll_students(course, ["S0", "S1", "S2", "S3"])
+    assert db.set_capacity(course, 3) == 1
+    assert db.waitlist(course) == ["S3"]
+    assert db.set_capacity(course, 1) == 0
+    assert registered() == ["S0", "S1", "S2"]
+    assert seats() == [(1, 3)]
+    assert db.set_capacity(course, None) == 0
+    assert db.waitlist(course) == []
+    assert seats() == []
+
+
+def make_course(capacity, students=4):
+    algebra = Course("C1", "Algebra", parse_slots("Mon 09:00-10:00"), capacity)
+    people = [Student(f"Student {n}", 20, f"s{n}@example.com", f"S{n}") for n in range(students)]
+    return algebra, people
+
+
+def test_register_joins_waitlist_when_full():
+    algebra, people = make_course(2)
+    assert [s.register_course(algebra) for s in people] == [True, True, False, False]
+    assert algebra.enrolled_students == people[:2]
+    assert algebra.waitlist == people[2:]
+    assert people[2].registered_courses == []
+    assert algebra.seats_display == "2/2 (2 waiting)"
+
+
+def test_drop_course_promotes_in_memory():
+    algebra, people = make_course(2)
+    biology = Course("C2", "Biology", parse_slots("Mon 09:30-10:30"))
+    for s in people:
+        s.register_course(algebra)
+    people[2].register_course(biology)
+    people[0].drop_course(algebra)
+    assert algebra.enrolled_students == [people[1], people[3]]
+    assert algebra.waitlist == [people[2]]
+    assert people[3].registered_courses == [algebra]
+    people[2].drop_course(algebra)
+    assert algebra.waitlist == []
+
+
+def test_detach_then_promote():
+    algebra, people = make_course(1, students=2)
+    for s in people:
+        s.register_course(algebra)
+    assert detach(people[0], [algebra]) == [algebra]
+    assert algebra.promote() == [people[1]]
+    assert algebra.enrolled_students == [people[1]]
+    assert algebra.waitlist == []
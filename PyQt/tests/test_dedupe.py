@@ -0,0 +1,96 @@
+import sqlite3
+
+import pytest
+
+from school import db
+from school.dedupe import claim_emails, find_duplicates, normalize_email, normalize_name
+
+EMAILS = [
+    "ann@example.com",
+    "  Ann@Example.COM  ",
+    "\tann@example.com",
+    "ann@example.com\n",
+    "ÄNN@example.com",
+    "Ärger@Example.com",
+    "İlke@example.com",
+    "STRASSE@example.com",
+    "straße@example.com",
+    "",
+]
+
+
+@pytest.mark.parametrize("email", EMAILS)
+def test_normalize_email_matches_sqlite(email):
+    conn = sqlite3.connect(":memory:")
+    try:
+        assert normalize_email(email) == conn.execute("SELECT lower(trim(?))", (email,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_normalize_name():
+    assert normalize_name("Smith, Jöhn") == "smith john"
+    # Letters without an ASCII base are dropped.
+    assert normalize_name("  O'Brien-Søren ") == "o brien sren"
+
+
+@pytest.fixture
+def school_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_FILE", str(tmp_path / "school.db"))
+    db.init_db()
+
+
+def test_claim_emails_agrees_with_unique_index(school_db):
+    db.execute_query("INSERT INTO students VALUES ('S0', 'Ann', 20, 'ann@example.com')")
+    rows = [(f"S{n}", "Someone", 20, email) for n, email in enumerate(EMAILS[1:], 1)]
+    rows.append(("S0", "Ann", 21, " ANN@example.com"))
+    accepted, rejected = claim_emails(rows, db.email_owners("students"))
+
+    assert [r[0] for r in rejected] == ["S1"]
+    assert rejected[0][1] == "email   Ann@Example.COM   is already used by S0"
+    assert "S0" in [r[0] for r in accepted]
+    # What was accepted fits the index; what was rejected would not.
+    db.execute_many(db.UPSERT_PERSON.format(table="students"), accepted)
+    with pytest.raises(sqlite3.IntegrityError):
+        db.execute_many(db.UPSERT_PERSON.format(table="students"), [rows[0]])
+
+
+def test_claim_emails_keeps_first_of_a_batch():
+    owners = {}
+    rows = [("S1", "Ann", 20, "ann@example.com"), ("S2", "Ann", 20, "ANN@example.com "),
+            ("S1", "Ann", 20, "ann@example.com")]
+    accepted, rejected = claim_emails(rows, owners)
+    assert accepted == [rows[0], rows[2]]
+    assert [r[0] for r in rejected] == ["S2"]
+    assert owners == {"ann@example.com": "S1"}
+
+
+def test_same_email_is_a_match():
+    matches = find_duplicates([("S1", "Ann Lee", 20, "ann@example.com"),
+                               ("S2", "Zed Zee", 50, " ANN@example.com"),
+                               ("S3", "Bob Ray", 20, "\tann@example.com")])
+    assert matches == [("S1", "S2", 1.0, "email")]
+
+
+def test_near_duplicates():
+    rows = [
+        ("S1", "Jon Smith", 20, "j.smith+school@example.com"),
+        ("S2", "John Smith", 21, "jsmith@example.com"),
+        ("S3", "Smith, Jon", 40, "jsmith@example.org"),
+        ("S4", "John Smith", 20, "jsmith2@example.com"),
+        ("S5", "John Smith", 20, "jsmith7@example.com"),
+        ("S6", "Mary Jones", 20, "mjones@example.com"),
+    ]
+    pairs = {(m.first, m.second) for m in find_duplicates(rows)}
+    assert ("S1", "S2") in pairs
+    # Too far apart in age, and differently numbered namesakes.
+    assert not any("S3" in pair for pair in pairs)
+    assert ("S4", "S5") not in pairs
+    assert not any("S6" in pair for pair in pairs)
+    assert all(m.score >= 0.85 for m in find_duplicates(rows))
+
+
+def test_same_email_found_when_buckets_are_skipped():
+    rows = [(f"S{n}", "John Smith", 20, f"john{n}smith@example.com") for n in range(5)]
+    rows.append(("S9", "Jon Smith", 20, "John1Smith@example.com"))
+    assert {(m.first, m.second) for m in find_duplicates(rows, max_bucket=3)} == {("S1", "S9")}
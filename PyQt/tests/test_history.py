@@ -0,0 +1,83 @@
+from datetime import date, datetime
+
+import pytest
+
+from school import db
+
+
+@pytest.fixture
+def school_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_FILE", str(tmp_path / "school.db"))
+    db.init_db()
+
+
+@pytest.fixture
+def history(school_db):
+    # S3 was registered before history was kept, hence ''.
+    db.execute_many("INSERT INTO registration_history VALUES (?, 'C1', ?, ?)", [
+        ("S1", "2024-01-10 09:00:00.000", "2024-03-01 12:00:00.000"),
+        ("S2", "2024-02-01 08:00:00.000", None),
+        ("S3", "", None),
+    ])
+    db.execute_many("INSERT INTO assignment_history VALUES ('C1', ?, ?, ?)", [
+        ("I1", "2024-01-01 00:00:00.000", "2024-02-01 00:00:00.000"),
+        ("I2", "2024-02-01 00:00:00.000", None),
+    ])
+
+
+@pytest.mark.parametrize("when, roster", [
+    ("2024-01-09", ["S3"]),
+    ("2024-01-10", ["S1", "S3"]),
+    ("2024-01-10 08:59", ["S3"]),
+    (date(2024, 2, 1), ["S1", "S2", "S3"]),
+    (datetime(2024, 3, 1, 11, 59), ["S1", "S2", "S3"]),
+    ("2024-03-01", ["S2", "S3"]),
+    (None, ["S2", "S3"]),
+])
+def test_roster_at(history, when, roster):
+    assert db.roster_at("C1", when) == roster
+
+
+@pytest.mark.parametrize("when, instructor", [
+    ("2023-12-31", None),
+    ("2024-01-31", "I1"),
+    (datetime(2024, 1, 31, 23, 59, 59, 999999), "I1"),
+    ("2024-02-01 00:00", "I2"),
+    (None, "I2"),
+])
+def test_instructor_at(history, when, instructor):
+    assert db.instructor_at("C1", when) == instructor
+
+
+def test_student_history_overlaps_the_period(history):
+    row = ("C1", "2024-01-10 09:00:00.000", "2024-03-01 12:00:00.000")
+    assert db.student_history("S1") == [row]
+    assert db.student_history("S1", "2024-03-01", "2024-03-01") == [row]
+    assert db.student_history("S1", "2024-03-02") == []
+    assert db.student_history("S1", end="2024-01-09") == []
+    assert db.student_history("S3", end="2000-01-01") == [("C1", "", None)]
+
+
+def test_invalid_date(history):
+    with pytest.raises(ValueError):
+        db.roster_at("C1", "last term")
+
+
+def test_changes_are_recorded(school_db):
+    db.execute_many("INSERT INTO instructors VALUES (?, ?, 40, ?)",
+                    [("I1", "Cy", "cy@example.com"), ("I2", "Di", "di@example.com")])
+    db.execute_query("INSERT INTO students VALUES ('S1', 'Ann', 20, 'ann@example.com')")
+    db.add_course("C1", "Algebra", instructor_id="I1")
+    db.enroll_students("C1", ["S1"])
+    assert db.execute_query("SELECT valid_to FROM registration_history", fetch=True) == [(None,)]
+    assert db.roster_at("C1") == ["S1"]
+
+    db.drop_students("C1", ["S1"])
+    db.assign_instructor("C1", "I2")
+    assert db.roster_at("C1") == []
+    [(opened, closed)] = db.execute_query("SELECT valid_from, valid_to FROM registration_history", fetch=True)
+    assert opened <= closed
+    assert db.instructor_at("C1") == "I2"
+    assignments = db.execute_query("SELECT instructor_id, valid_to IS NULL FROM assignment_history "
+                                   "ORDER BY valid_from, valid_to IS NULL", fetch=True)
+    assert assignments == [("I1", 0), ("I2", 1)]
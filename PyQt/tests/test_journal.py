@@ -0,0 +1,53 @@
+import json
+
+from school.journal import Journal
+
+
+def op(number):
+    return {"op": "register", "student": f"S{number}", "course": "C1"}
+
+
+def torn_journal(path):
+    # A journal whose last append was interrupted half way through a line.
+    journal = Journal(str(path))
+    journal.append([op(1), op(2)])
+    with open(path, "a") as f:
+        f.write(json.dumps(op(3))[:20])
+    return Journal(str(path))
+
+
+def test_replay_skips_torn_last_line(tmp_path):
+    journal = torn_journal(tmp_path / "autosave.journal")
+    assert list(journal.replay()) == [op(1), op(2)]
+    assert journal.length == 2
+
+
+def test_append_after_torn_line_is_replayed(tmp_path):
+    journal = torn_journal(tmp_path / "autosave.journal")
+    journal.append([op(4)])
+    journal.append([op(5)])
+    assert list(journal.replay()) == [op(1), op(2), op(4), op(5)]
+    assert list(Journal(journal.path).replay()) == [op(1), op(2), op(4), op(5)]
+
+
+def test_repair_keeps_only_valid_lines(tmp_path):
+    path = tmp_path / "autosave.journal"
+    journal = torn_journal(path)
+    journal.append([op(4)])
+    assert journal.repair() == 1
+    assert journal.repair() == 0
+    assert [json.loads(line) for line in path.read_text().splitlines()] == [op(1), op(2), op(4)]
+    assert journal.length == 3
+
+
+def test_truncate_starts_a_new_generation(tmp_path):
+    path = str(tmp_path / "autosave.journal")
+    journal = Journal(path)
+    assert journal.generation == 0
+    journal.append([op(1)])
+    journal.truncate()
+    journal.append([op(2)])
+    reopened = Journal(path)
+    assert reopened.generation == 1
+    assert reopened.length == 1
+    assert list(reopened.replay()) == [op(2)]
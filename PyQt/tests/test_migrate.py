@@ -0,0 +1,76 @@
+import sqlite3
+
+import pytest
+
+from school import db
+
+# The tables as the first version of the app created them, before the
+# foreign keys had ON DELETE actions.
+OLD_SCHEMA = """
+CREATE TABLE students (id TEXT PRIMARY KEY, name TEXT NOT NULL, age INTEGER NOT NULL, email TEXT NOT NULL);
+CREATE TABLE instructors (id TEXT PRIMARY KEY, name TEXT NOT NULL, age INTEGER NOT NULL, email TEXT NOT NULL);
+CREATE TABLE courses (
+    id TEXT PRIMARY KEY, name TEXT NOT NULL, instructor_id TEXT,
+    FOREIGN KEY (instructor_id) REFERENCES instructors(id)
+);
+CREATE TABLE registrations (
+    student_id TEXT, course_id TEXT, PRIMARY KEY (student_id, course_id),
+    FOREIGN KEY (student_id) REFERENCES students(id),
+    FOREIGN KEY (course_id) REFERENCES courses(id)
+);
+INSERT INTO students VALUES ('S1', 'Ann', 20, 'ann@example.com'), ('S2', 'Bob', 21, 'bob@example.com');
+INSERT INTO instructors VALUES ('I1', 'Cy', 40, 'cy@example.com');
+INSERT INTO courses VALUES ('C1', 'Algebra', 'I1'), ('C2', 'Biology', 'I9');
+INSERT INTO registrations VALUES ('S1', 'C1'), ('S2', 'C1'), ('S2', 'C2'), ('S9', 'C1'), ('S1', 'C9');
+"""
+
+
+@pytest.fixture
+def old_db(tmp_path, monkeypatch):
+    db_file = str(tmp_path / "school.db")
+    conn = sqlite3.connect(db_file)
+    conn.executescript(OLD_SCHEMA)
+    conn.close()
+    monkeypatch.setattr(db, "DB_FILE", db_file)
+    return db_file
+
+
+def rows(query):
+    return sorted(db.execute_query(query, fetch=True))
+
+
+def test_init_db_migrates_old_schema(old_db):
+    db.init_db()
+    conn = db.connect()
+    try:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == db.SCHEMA_VERSION
+        assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+    finally:
+        conn.close()
+    # Orphaned registrations are dropped and the unknown instructor
+    # cleared, while every valid row survives the rebuild.
+    assert rows("SELECT * FROM registrations") == [("S1", "C1"), ("S2", "C1"), ("S2", "C2")]
+    assert rows("SELECT id, instructor_id FROM courses") == [("C1", "I1"), ("C2", None)]
+
+
+def test_migrate_restores_foreign_keys(old_db):
+    conn = db.connect()
+    try:
+        db.migrate(conn)
+        assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+    finally:
+        conn.close()
+
+
+def test_deletes_cascade_after_migration(old_db):
+    db.init_db()
+    db.delete_ids("students", ["S2"])
+    assert rows("SELECT * FROM registrations") == [("S1", "C1")]
+    db.delete_ids("courses", ["C1"])
+    assert rows("SELECT * FROM registrations") == []
+
+
+def test_deleting_instructor_clears_course_after_migration(old_db):
+    db.init_db()
+    db.delete_ids("instructors", ["I1"])
+    assert rows("SELECT id, instructor_id FROM courses") == [("C1", None), ("C2", None)]
@@ -0,0 +1,159 @@
+import asyncio
+import json
+
+import pytest
+
+from school import db
+from school.service import SchoolService
+from school.timetable import parse_slots
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_FILE", str(tmp_path / "school.db"))
+    db.init_db()
+    db.execute_many("INSERT INTO students VALUES (?, ?, ?, ?)",
+                    [(f"S{n}", f"Student {n}", 20, f"s{n}@example.com") for n in range(1, 4)])
+    db.add_course("C1", "Algebra", slots=parse_slots("Mon 09:00-10:00"), capacity=2)
+    db.add_course("C2", "Biology", slots=parse_slots("Mon 09:30-10:30"))
+    service = SchoolService(batch_delay=0)
+    yield service
+    service.store.close()
+
+
+def http(method, path, body=None, close=False):
+    data = b"" if body is None else body if isinstance(body, bytes) else json.dumps(body).encode()
+    head = f"{method} {path} HTTP/1.1\r\nContent-Length: {len(data)}\r\n"
+    if close:
+        head += "Connection: close\r\n"
+    return head.encode() + b"\r\n" + data
+
+
+def exchange(service, *requests):
+    # Sends the requests over one connection and returns each response
+    # as (status, body), reading until the server closes it.
+    async def talk():
+        server = await asyncio.start_server(service.handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"".join(requests))
+        await writer.drain()
+        responses = []
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            status = int(line.split()[1])
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line == b"\r\n":
+                    break
+                name, _, value = line.decode().partition(":")
+                headers[name.lower()] = value.strip()
+            if "content-length" in headers:
+                body = json.loads(await reader.readexactly(int(headers["content-length"])))
+            else:
+                body = b""
+                while True:
+                    size = int(await reader.readline(), 16)
+                    if not size:
+                        await reader.readline()
+                        break
+                    body += await reader.readexactly(size)
+                    await reader.readline()
+                body = [json.loads(line) for line in body.splitlines()]
+            responses.append((status, body))
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return responses
+    return asyncio.run(talk())
+
+
+def test_pages_are_ordered_by_id(service):
+    first, second = exchange(service, http("GET", "/students?limit=2"),
+                             http("GET", "/students?after=S2&limit=2", close=True))
+    assert first == (200, {"items": [
+        {"id": "S1", "name": "Student 1", "age": 20, "email": "s1@example.com"},
+        {"id": "S2", "name": "Student 2", "age": 20, "email": "s2@example.com"},
+    ], "next": "S2"})
+    assert second[0] == 200
+    assert [item["id"] for item in second[1]["items"]] == ["S3"]
+    assert second[1]["next"] is None
+
+
+def test_search_escapes_wildcards(service):
+    [(status, body)] = exchange(service, http("GET", "/courses?q=%25", close=True))
+    assert (status, body["items"]) == (200, [])
+
+
+def test_stream_returns_every_row(service):
+    [(status, rows)] = exchange(service, http("GET", "/stream/students?limit=1", close=True))
+    assert status == 200
+    assert [row["id"] for row in rows] == ["S1", "S2", "S3"]
+
+
+def test_enroll_fills_seats_then_waitlist(service):
+    [(status, body)] = exchange(service, http("POST", "/enroll", {"course": "C1", "students": ["S1", "S2", "S3"]},
+                                              close=True))
+    assert (status, body) == (200, {"added": 2, "waitlisted": 1})
+    assert db.waitlist("C1") == ["S3"]
+
+
+def test_enroll_refuses_a_clash(service):
+    db.enroll_students("C1", ["S1"])
+    [(status, body)] = exchange(service, http("POST", "/enroll", {"course": "C2", "students": ["S1"]},
+                                              close=True))
+    assert status == 409
+    assert "C2 clashes with C1" in body["error"]
+
+
+@pytest.mark.parametrize("raw, status", [
+    (http("GET", "/nothing"), 404),
+    (http("GET", "/students?limit=many"), 400),
+    (http("POST", "/enroll", b"{not json"), 400),
+    (http("POST", "/enroll", {"course": "C1"}), 400),
+    (http("GET", "/recommend"), 400),
+    (http("POST", "/batch", {"path": "/students"}), 400),
+])
+def test_bad_requests_keep_the_connection(service, raw, status):
+    responses = exchange(service, raw, http("GET", "/courses?limit=1", close=True))
+    assert [r[0] for r in responses] == [status, 200]
+    assert "error" in responses[0][1]
+
+
+def test_bad_content_length_closes_the_connection(service):
+    responses = exchange(service, b"POST /enroll HTTP/1.1\r\nContent-Length: ten\r\n\r\n",
+                         http("GET", "/courses"))
+    assert responses == [(400, {"error": "Content-Length must be a number"})]
+
+
+def test_unexpected_error_is_a_500(service, monkeypatch):
+    page = service.store.page
+
+    def fail_on_students(table, *args):
+        if table == "students":
+            raise RuntimeError("disk on fire")
+        return page(table, *args)
+    monkeypatch.setattr(service.store, "page", fail_on_students)
+    responses = exchange(service, http("GET", "/students"), http("GET", "/courses?limit=1", close=True))
+    assert responses[0] == (500, {"error": "internal server error"})
+    assert responses[1][0] == 200
+
+
+def test_batch_returns_each_result(service, monkeypatch):
+    def fail(*args):
+        raise RuntimeError("disk on fire")
+    monkeypatch.setattr(service.store, "recommend", fail)
+    [(status, body)] = exchange(service, http("POST", "/batch", [
+        {"path": "/courses?limit=1"},
+        {"path": "/enroll", "body": {"course": "C1", "students": ["S1"]}},
+        {"path": "/stream/students"},
+        {"path": "/students", "method": 1},
+        {"path": "/recommend?student=S1"},
+    ], close=True))
+    assert status == 200
+    assert [item["status"] for item in body] == [200, 200, 400, 400, 500]
+    assert body[1]["body"] == {"added": 1, "waitlisted": 0}
+    assert body[4]["body"] == {"error": "internal server error"}
@@ -0,0 +1,49 @@
+from school import db
+
+import school_management
+from school_storage import SQLiteStorage
+
+
+def test_load_keeps_registrations_over_capacity(tmp_path):
+    db_file = str(tmp_path / "school.db")
+    storage = SQLiteStorage(db_file)
+    conn = db.connect(db_file)
+    with conn:
+        conn.executemany("INSERT INTO students VALUES (?, ?, ?, ?)",
+                         [(f"S{n}", f"Student {n}", 20, f"s{n}@example.com") for n in range(3)])
+        conn.execute("INSERT INTO courses VALUES ('C1', 'Algebra', NULL)")
+        conn.executemany("INSERT INTO registrations VALUES (?, 'C1')", [(f"S{n}",) for n in range(3)])
+        # Lowered after the students registered, so the course is over capacity.
+        conn.execute("INSERT INTO course_seats VALUES ('C1', 2, 3)")
+    conn.close()
+
+    events = []
+
+    def listener(event, *objects):
+        events.append(event)
+    school_management.add_change_listener(listener)
+    try:
+        students, _, courses = storage.load()
+    finally:
+        school_management.remove_change_listener(listener)
+
+    (course,) = courses
+    assert [s.student_id for s in course.enrolled_students] == ["S0", "S1", "S2"]
+    assert course.waitlist == []
+    assert all(s.registered_courses == [course] for s in students)
+    assert events == []
+
+
+def test_delete_students_promotes_waiting(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_FILE", str(tmp_path / "school.db"))
+    storage = SQLiteStorage(db.DB_FILE)
+    db.execute_many("INSERT INTO students VALUES (?, ?, ?, ?)",
+                    [(f"S{n}", f"Student {n}", 20, f"s{n}@example.com") for n in range(3)])
+    db.add_course("C1", "Algebra", capacity=1)
+    db.enroll_students("C1", ["S0", "S1", "S2"])
+    storage.load()
+
+    storage.delete_students(["S0"])
+    _, _, (course,) = storage.load()
+    assert [s.student_id for s in course.enrolled_students] == ["S1"]
+    assert [s.student_id for s in course.waitlist] == ["S2"]
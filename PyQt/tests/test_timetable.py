@@ -0,0 +1,93 @@
+import itertools
+import random
+
+import pytest
+
+from school.timetable import ClashError, IntervalIndex, Slot, Timetable, find_clashes, parse_slots
+
+
+def index(*bookings):
+    result = IntervalIndex()
+    for key, start, end in bookings:
+        result.add([Slot(start, end, None)], key)
+    return result
+
+
+def test_find_on_empty_index():
+    assert IntervalIndex().find(0, 10) is None
+
+
+@pytest.mark.parametrize("start, end, key", [
+    (0, 10, None),
+    (10, 20, "A"),
+    (15, 16, "A"),
+    (19, 30, "A"),
+    (20, 30, None),
+    (25, 35, "B"),
+    (0, 100, "B"),
+])
+def test_find_overlap(start, end, key):
+    assert index(("A", 10, 20), ("B", 30, 40)).find(start, end) == key
+
+
+def test_find_ignores_key():
+    bookings = index(("A", 10, 20), ("B", 30, 40), ("C", 50, 60))
+    assert bookings.find(35, 55, ignore="C") == "B"
+    assert bookings.find(15, 55, ignore="C") == "B"
+    # Skipping B and C still finds A behind them.
+    assert index(("A", 10, 20), ("B", 30, 40), ("B", 50, 60)).find(15, 55, ignore="B") == "A"
+    assert bookings.find(31, 32, ignore="B") is None
+
+
+def test_remove_only_the_given_key():
+    bookings = index(("A", 10, 20), ("B", 30, 40))
+    bookings.remove([Slot(10, 20, None)], "B")
+    assert len(bookings) == 2
+    bookings.remove([Slot(10, 20, None)], "A")
+    assert len(bookings) == 1
+    assert bookings.find(0, 100) == "B"
+
+
+def test_timetable_book_refuses_clash():
+    rooms = Timetable("room")
+    rooms.book("B101", parse_slots("Mon 09:00-10:00 B101"), "C1")
+    with pytest.raises(ClashError) as error:
+        rooms.book("B101", parse_slots("Mon 09:30-10:30 B101"), "C2")
+    assert error.value.clashes == [("room", "B101", "C2", "C1")]
+    # Rebooking a course over its own slots is not a clash.
+    rooms.book("B101", parse_slots("Mon 09:30-10:30 B101"), "C1")
+    assert rooms.clash("B102", parse_slots("Mon 09:00-10:00"), None) is None
+
+
+def test_find_clashes_reports_each_pair_once():
+    bookings = [
+        ("student", "S1", 0, 60, "C1"),
+        ("student", "S1", 30, 90, "C2"),
+        ("student", "S1", 45, 50, "C3"),
+        ("student", "S1", 1440, 1500, "C1"),
+        ("student", "S1", 1450, 1460, "C2"),
+        ("student", "S2", 0, 60, "C1"),
+        ("student", "S2", 60, 120, "C2"),
+        ("room", "S1", 30, 40, "C4"),
+    ]
+    assert sorted(find_clashes(bookings)) == [
+        ("student", "S1", "C1", "C2"),
+        ("student", "S1", "C1", "C3"),
+        ("student", "S1", "C2", "C3"),
+    ]
+
+
+def test_find_clashes_matches_pairwise_check():
+    rng = random.Random(41)
+    bookings = []
+    for n in range(300):
+        start = rng.randrange(0, 2000)
+        bookings.append(("student", f"S{rng.randrange(10)}", start, start + rng.randrange(1, 120),
+                         f"C{rng.randrange(40)}"))
+    expected = set()
+    for a, b in itertools.combinations(bookings, 2):
+        if a[:2] == b[:2] and a[4] != b[4] and a[2] < b[3] and b[2] < a[3]:
+            expected.add(a[:2] + tuple(sorted((a[4], b[4]))))
+    clashes = find_clashes(bookings)
+    assert len(clashes) == len(set(clashes))
+    assert set(clashes) == expected
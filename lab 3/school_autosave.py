@@ -0,0 +1,200 @@
+import os
+
+from school.atomic import load_json
+from school.journal import ChangeTracker, Journal
+
+import school_management
+from school_management import Student, Instructor, Course, save_data, link_records, detach
+
+
+class Autosaver:
+    """
+    Incremental autosave for the in-memory students, instructors and courses.
+
+    Changes are collected by a :class:`ChangeTracker`: relationship changes
+    arrive from the model's change listeners, added and deleted entities
+    are reported with :meth:`added` and :meth:`deleted`. :meth:`flush`
+    appends only those changes to ``<base>.journal``; once the journal
+    holds ``compact_every`` operations, :meth:`compact` writes a full
+    snapshot to ``<base>.json`` and empties the journal. The snapshot
+    records the journal generation that follows it, so :meth:`recover`
+    does not replay a journal the snapshot already contains.
+
+    :param base: Path of the autosave files without extension.
+    :type base: str
+    :param compact_every: Journal length that triggers a compaction.
+    :type compact_every: int
+    """
+
+    def __init__(self, base="autosave", compact_every=1000):
+        self.snapshot_path = base + ".json"
+        self.journal = Journal(base + ".journal")
+        self.compact_every = compact_every
+        self.tracker = ChangeTracker()
+        school_management.add_change_listener(self._on_change)
+
+    def _on_change(self, event, owner, course):
+        if event == "register":
+            self.tracker.register(owner.student_id, course.course_id)
+        elif event == "drop":
+            self.tracker.drop(owner.student_id, course.course_id)
+        elif event == "waitlist":
+            self.tracker.waitlist(owner.student_id, course.course_id)
+        elif event == "assign":
+            self.tracker.assign(owner.instructor_id, course.course_id)
+
+    def added(self, obj):
+        """
+        Report a newly added student, instructor or course.
+
+        :param obj: The new object.
+        :type obj: Student or Instructor or Course
+        """
+        if isinstance(obj, Student):
+            self.tracker.upsert("student", obj.student_id, obj.to_dict())
+        elif isinstance(obj, Instructor):
+            self.tracker.upsert("instructor", obj.instructor_id, obj.to_dict())
+        else:
+            self.tracker.upsert("course", obj.course_id, obj.to_dict())
+
+    def deleted(self, kind, id_value):
+        """
+        Report a deleted student, instructor or course.
+
+        :param kind: ``student``, ``instructor`` or ``course``.
+        :type kind: str
+        :param id_value: ID of the deleted object.
+        :type id_value: str
+        """
+        self.tracker.delete(kind, id_value)
+
+    def flush(self, students, instructors, courses):
+        """
+        Append pending changes to the journal, compacting it when it has
+        grown past ``compact_every`` operations.
+
+        :param students: Current list of Student objects
+        :type students: list[Student]
+        :param instructors: Current list of Instructor objects
+        :type instructors: list[Instructor]
+        :param courses: Current list of Course objects
+        :type courses: list[Course]
+        :return: Number of operations written.
+        :rtype: int
+        """
+        ops = self.tracker.drain()
+        self.journal.append(ops)
+        if self.journal.length >= self.compact_every:
+            self.compact(students, instructors, courses)
+        return len(ops)
+
+    def compact(self, students, instructors, courses):
+        """
+        Write a full snapshot and empty the journal.
+
+        :param students: Current list of Student objects
+        :type students: list[Student]
+        :param instructors: Current list of Instructor objects
+        :type instructors: list[Instructor]
+        :param courses: Current list of Course objects
+        :type courses: list[Course]
+        """
+        generation = self.journal.generation + 1
+        save_data(self.snapshot_path, students, instructors, courses, {"journal_generation": generation})
+        # Only now are the pending changes safely in the snapshot. A crash
+        # before the journal is emptied leaves a journal of an older
+        # generation, which recover skips.
+        self.tracker.clear()
+        self.journal.truncate(generation)
+
+    def recover(self):
+        """
+        Rebuild the last autosaved state from the snapshot and the journal.
+        Journal lines torn by a crash are removed first, so operations
+        appended after recovering are not lost behind them, and a journal
+        the snapshot already contains is emptied instead of replayed.
+
+        :return: Tuple of lists (students, instructors, courses), empty if
+            nothing was autosaved.
+        :rtype: tuple[list[Student], list[Instructor], list[Course]]
+        """
+        self.journal.repair()
+        students, instructors, courses = [], [], []
+        generation = 0
+        if os.path.exists(self.snapshot_path):
+            data = load_json(self.snapshot_path)
+            generation = data.get("journal_generation", 0)
+            students = [Student.from_dict(s) for s in data["students"]]
+            instructors = [Instructor.from_dict(i) for i in data["instructors"]]
+            courses = [Course.from_dict(c) for c in data["courses"]]
+            link_records(data, students, instructors, courses)
+
+        state = {
+            "student": {s.student_id: s for s in students},
+            "instructor": {i.instructor_id: i for i in instructors},
+            "course": {c.course_id: c for c in courses},
+        }
+        if self.journal.generation < generation:
+            # Compaction stopped between the snapshot and emptying the
+            # journal: its operations are all in the snapshot.
+            self.journal.truncate(generation)
+        school_management.remove_change_listener(self._on_change)
+        try:
+            for op in self.journal.replay():
+                apply_op(state, op)
+        finally:
+            school_management.add_change_listener(self._on_change)
+        return (list(state["student"].values()), list(state["instructor"].values()),
+                list(state["course"].values()))
+
+    def close(self):
+        """Stop listening to model changes."""
+        school_management.remove_change_listener(self._on_change)
+
+
+def apply_op(state, op):
+    """
+    Apply one journal operation to objects indexed by kind and ID.
+
+    An ``upsert`` replaces any existing object with the same ID by a fresh
+    one without relationships; operations that refer to missing objects
+    are skipped. Registrations and assignments are replayed without
+    checking for timetable clashes, since they were checked when made.
+
+    :param state: ``{"student": {id: Student}, "instructor": {...}, "course": {...}}``
+    :type state: dict
+    :param op: Operation as written by the journal.
+    :type op: dict
+    """
+    kind = op.get("kind")
+    if op["op"] in ("upsert", "delete"):
+        old = state[kind].pop(op["id"], None)
+        if old is not None:
+            detach(old, state["course"].values())
+        if op["op"] == "upsert":
+            cls = {"student": Student, "instructor": Instructor, "course": Course}[kind]
+            state[kind][op["id"]] = cls.from_dict(op["data"])
+    elif op["op"] == "register":
+        student = state["student"].get(op["student"])
+        course = state["course"].get(op["course"])
+        if student and course:
+            student.register_course(course, check=False)
+    elif op["op"] == "drop":
+        student = state["student"].get(op["student"])
+        course = state["course"].get(op["course"])
+        if student and course:
+            student.drop_course(course)
+    elif op["op"] == "waitlist":
+        student = state["student"].get(op["student"])
+        course = state["course"].get(op["course"])
+        if student and course:
+            course.join_waitlist(student)
+    elif op["op"] == "assign":
+        instructor = state["instructor"].get(op["instructor"])
+        course = state["course"].get(op["course"])
+        if instructor and course:
+            if course.instructor and course in course.instructor.assigned_courses:
+                course.instructor.assigned_courses.remove(course)
+                course.instructor.timetable.remove(course.slots, course.course_id)
+                course.instructor.invalidate_display()
+            instructor.assign_course(course, check=False)
@@ -1,5 +1,46 @@
-import json
 import re
+import threading
+
+from school.atomic import dump_json, load_json
+from school.parallel import map_chunks, DEFAULT_CHUNK_SIZE
+from school.timetable import ClashError, IntervalIndex, course_bookings, find_clashes, format_slots, parse_slots
+
+_change_listeners = []
+
+
+def add_change_listener(listener):
+    """
+    Register a function to be told about relationship changes.
+
+    The listener is called as ``listener("register", student, course)``
+    when a student registers in a course,
+    ``listener("waitlist", student, course)`` when a student joins a full
+    course's waitlist, ``listener("drop", student, course)`` when a
+    student leaves a course or its waitlist and
+    ``listener("assign", instructor, course)`` when an instructor is
+    assigned a course.
+
+    :param listener: Callable taking the event name and the objects involved.
+    :type listener: callable
+    """
+    if listener not in _change_listeners:
+        _change_listeners.append(listener)
+
+
+def remove_change_listener(listener):
+    """
+    Unregister a listener added with :func:`add_change_listener`.
+
+    :param listener: The listener to remove.
+    :type listener: callable
+    """
+    if listener in _change_listeners:
+        _change_listeners.remove(listener)
+
+
+def _notify(event, *objects):
+    for listener in _change_listeners:
+        listener(event, *objects)
 
 
 class Person:
@@ -13,19 +54,36 @@ class Person:
     :param email: email of person
     :type email: str
 
+    :param validate: check age and email; False for data already checked
+    :type validate: bool
+
     :raises ValueError: If age is negative or email is invalid
     """
 
-    def __init__(self, name: str, age: int, email: str):
-        if age < 0:
-            raise ValueError("Age cannot be negative")
-        if not re.match(r"[^@]+@[^@]+\.[^@]+", email):
-            raise ValueError("Invalid email format")
+    def __init__(self, name: str, age: int, email: str, validate: bool = True):
+        if validate:
+            self.validate(age, email)
 
         self.name = name
         self.age = age
         self._email = email
 
+    @staticmethod
+    def validate(age, email):
+        """
+        checks age and email of a person
+
+        :param age: age of person
+        :type age: int
+        :param email: email of person
+        :type email: str
+        :raises ValueError: If age is negative or email is invalid
+        """
+        if age < 0:
+            raise ValueError("Age cannot be negative")
+        if not re.match(r"[^@]+@[^@]+\.[^@]+", email):
+            raise ValueError("Invalid email format")
+
     def introduce(self):
         """
         prints hello message for person
@@ -42,16 +100,18 @@ class Person:
         return {"name": self.name, "age": self.age, "email": self._email}
 
     @classmethod
-    def from_dict(cls, data):
+    def from_dict(cls, data, validate=True):
         """
         creates person from dict
 
         :param data: Dictionary containing person data
         :type data: dict
+        :param validate: check age and email
+        :type validate: bool
         :return: Person object
         :rtype: Person
         """
-        return cls(data["name"], data["age"], data["email"])
+        return cls(data["name"], data["age"], data["email"], validate)
 
 
 class Student(Person):
@@ -68,22 +128,77 @@ class Student(Person):
     :type student_id: str
     """
 
-    def __init__(self, name, age, email, student_id):
-        super().__init__(name, age, email)
+    def __init__(self, name, age, email, student_id, validate=True):
+        super().__init__(name, age, email, validate)
         self.student_id = student_id
         self.registered_courses = []
+        self.timetable = IntervalIndex()
+        self._courses_display = None
+
+    @property
+    def courses_display(self):
+        """
+        Comma-separated IDs of the registered courses, cached until the
+        registrations change.
 
-    def register_course(self, course):
+        :rtype: str
+        """
+        if self._courses_display is None:
+            self._courses_display = ",".join([c.course_id for c in self.registered_courses])
+        return self._courses_display
+
+    def invalidate_display(self):
+        """
+        Forget cached display strings; call after changing
+        ``registered_courses`` directly.
+        """
+        self._courses_display = None
+
+    def register_course(self, course, check=True):
         """
         registers student in course
 
 
         :param course: Course object to register
         :type course: Course
+        :param check: refuse a course that clashes with the student's timetable
+        :type check: bool
+        :return: True if the student has a seat, False if the course is full
+            and the student was put on its waitlist
+        :rtype: bool
+        :raises ClashError: If the course overlaps another of the student's courses
         """
         if course not in self.registered_courses:
+            other = self.timetable.clash(course.slots, course.course_id) if check else None
+            if other is not None:
+                raise ClashError([("student", self.student_id, course.course_id, other)])
+            if not course.add_student(self):
+                course.join_waitlist(self)
+                return False
             self.registered_courses.append(course)
-            course.add_student(self)
+            self.timetable.add(course.slots, course.course_id)
+            self._courses_display = None
+            _notify("register", self, course)
+        return True
+
+    def drop_course(self, course):
+        """
+        removes student from course, or from its waitlist; the freed seat
+        goes to the first waiting student
+
+        :param course: Course object to leave
+        :type course: Course
+        """
+        if course in self.registered_courses:
+            self.registered_courses.remove(course)
+            self.timetable.remove(course.slots, course.course_id)
+            self._courses_display = None
+            course.enrolled_students.remove(self)
+            course.invalidate_display()
+            _notify("drop", self, course)
+            course.promote()
+        elif course.leave_waitlist(self):
+            _notify("drop", self, course)
 
     def to_dict(self):
         """
@@ -102,16 +217,18 @@ class Student(Person):
         }
 
     @classmethod
-    def from_dict(cls, data):
+    def from_dict(cls, data, validate=True):
         """
         Creates a Student instance from a dictionary.
 
         :param data: Dictionary containing student data
         :type data: dict
+        :param validate: Check age and email
+        :type validate: bool
         :return: Student object
         :rtype: Student
         """
-        return cls(data["name"], data["age"], data["email"], data["student_id"])
+        return cls(data["name"], data["age"], data["email"], data["student_id"], validate)
 
 
 class Instructor(Person):
@@ -128,21 +245,51 @@ class Instructor(Person):
     :type instructor_id: str
     """
 
-    def __init__(self, name, age, email, instructor_id):
-        super().__init__(name, age, email)
+    def __init__(self, name, age, email, instructor_id, validate=True):
+        super().__init__(name, age, email, validate)
         self.instructor_id = instructor_id
         self.assigned_courses = []
+        self.timetable = IntervalIndex()
+        self._courses_display = None
+
+    @property
+    def courses_display(self):
+        """
+        Comma-separated IDs of the assigned courses, cached until the
+        assignments change.
+
+        :rtype: str
+        """
+        if self._courses_display is None:
+            self._courses_display = ",".join([c.course_id for c in self.assigned_courses])
+        return self._courses_display
 
-    def assign_course(self, course):
+    def invalidate_display(self):
+        """
+        Forget cached display strings; call after changing
+        ``assigned_courses`` directly.
+        """
+        self._courses_display = None
+
+    def assign_course(self, course, check=True):
         """
         Assigns a course to the instructor and sets the instructor of the course.
 
         :param course: Course object to assign
         :type course: Course
+        :param check: Refuse a course that clashes with the instructor's timetable
+        :type check: bool
+        :raises ClashError: If the course overlaps another of the instructor's courses
         """
         if course not in self.assigned_courses:
+            other = self.timetable.clash(course.slots, course.course_id) if check else None
+            if other is not None:
+                raise ClashError([("instructor", self.instructor_id, course.course_id, other)])
             self.assigned_courses.append(course)
+            self.timetable.add(course.slots, course.course_id)
+            self._courses_display = None
             course.instructor = self
+            _notify("assign", self, course)
 
     def to_dict(self):
         """
@@ -161,16 +308,18 @@ class Instructor(Person):
         }
 
     @classmethod
-    def from_dict(cls, data):
+    def from_dict(cls, data, validate=True):
         """
         Creates an Instructor instance from a dictionary.
 
         :param data: Dictionary containing instructor data
         :type data: dict
+        :param validate: Check age and email
+        :type validate: bool
         :return: Instructor object
         :rtype: Instructor
         """
-        return cls(data["name"], data["age"], data["email"], data["instructor_id"])
+        return cls(data["name"], data["age"], data["email"], data["instructor_id"], validate)
 
 
 class Course:
@@ -181,23 +330,245 @@ class Course:
     :type course_id: str
     :param course_name: Name of the course
     :type course_name: str
+    :param slots: Weekly meetings of the course, with their rooms
+    :type slots: list[school.timetable.Slot]
+    :param capacity: Number of seats, None for no limit
+    :type capacity: int
     """
 
-    def __init__(self, course_id, course_name):
+    def __init__(self, course_id, course_name, slots=None, capacity=None):
         self.course_id = course_id
         self.course_name = course_name
+        self.slots = list(slots or [])
+        self.capacity = capacity
         self.instructor = None
         self.enrolled_students = []
+        self.waitlist = []
+        # Guards the seat count, so two threads cannot take the last seat.
+        self._seats = threading.RLock()
+        self._students_display = None
+
+    @property
+    def students_display(self):
+        """
+        Comma-separated IDs of the enrolled students, cached until the
+        enrolment changes.
+
+        :rtype: str
+        """
+        if self._students_display is None:
+            self._students_display = ",".join([s.student_id for s in self.enrolled_students])
+        return self._students_display
+
+    @property
+    def slots_display(self):
+        """
+        The weekly slots, e.g. ``Mon 09:00-10:30 B101; Wed 09:00-10:30 B101``.
+
+        :rtype: str
+        """
+        return format_slots(self.slots)
+
+    @property
+    def instructor_name(self):
+        """
+        Name of the course's instructor, or an empty string.
+
+        :rtype: str
+        """
+        return self.instructor.name if self.instructor else ""
+
+    @property
+    def enrolment_count(self):
+        """
+        Number of enrolled students.
+
+        :rtype: int
+        """
+        return len(self.enrolled_students)
+
+    @property
+    def seats_left(self):
+        """
+        Number of free seats, None if the course has no limit.
+
+        :rtype: int
+        """
+        if self.capacity is None:
+            return None
+        return max(self.capacity - len(self.enrolled_students), 0)
+
+    @property
+    def seats_display(self):
+        """
+        Seats taken out of the capacity and the waitlist length, e.g.
+        ``30/30 (4 waiting)``; empty for courses without a limit.
+
+        :rtype: str
+        """
+        if self.capacity is None:
+            return ""
+        text = f"{len(self.enrolled_students)}/{self.capacity}"
+        return text + (f" ({len(self.waitlist)} waiting)" if self.waitlist else "")
+
+    def invalidate_display(self):
+        """
+        Forget cached display strings; call after changing
+        ``enrolled_students`` directly.
+        """
+        self._students_display = None
 
     def add_student(self, student):
         """
-        Adds a student to the enrolled students list if not already present.
+        Adds a student to the enrolled students list if not already present
+        and a seat is free. Checking and taking the seat happen under one
+        lock, so concurrent registrations cannot overbook the course.
 
         :param student: Student object to add
         :type student: Student
+        :return: True if the student is enrolled, False if the course is full
+        :rtype: bool
         """
-        if student not in self.enrolled_students:
+        with self._seats:
+            if student in self.enrolled_students:
+                return True
+            if self.seats_left == 0:
+                return False
             self.enrolled_students.append(student)
+            self._students_display = None
+            if student in self.waitlist:
+                self.waitlist.remove(student)
+            return True
+
+    def join_waitlist(self, student):
+        """
+        Puts a student at the end of the waitlist.
+
+        :param student: Student object waiting for a seat
+        :type student: Student
+        :return: False if the student was already enrolled or waiting
+        :rtype: bool
+        """
+        with self._seats:
+            if student in self.waitlist or student in self.enrolled_students:
+                return False
+            self.waitlist.append(student)
+        _notify("waitlist", student, self)
+        return True
+
+    def leave_waitlist(self, student):
+        """
+        Removes a student from the waitlist.
+
+        :param student: Student object
+        :type student: Student
+        :return: True if the student was waiting
+        :rtype: bool
+        """
+        with self._seats:
+            if student in self.waitlist:
+                self.waitlist.remove(student)
+                return True
+            return False
+
+    def promote(self):
+        """
+        Gives free seats to waiting students, first come first served. A
+        waiting student whose timetable now clashes with the course keeps
+        their place.
+
+        :return: The students that were registered
+        :rtype: list[Student]
+        """
+        promoted = []
+        with self._seats:
+            for student in list(self.waitlist):
+                if self.seats_left == 0:
+                    break
+                if student.timetable.clash(self.slots, self.course_id) is None:
+                    student.register_course(self, check=False)
+                    promoted.append(student)
+        return promoted
+
+    def enroll(self, students):
+        """
+        Registers many students in this course at once. Students already
+        enrolled are skipped; the check uses a set, so enrolling a whole
+        cohort stays linear in its size.
+
+        :param students: Students to enroll
+        :type students: iterable[Student]
+        :return: The students that were newly enrolled; once the course is
+            full the others join the waitlist in order
+        :rtype: list[Student]
+        :raises ClashError: If the course clashes with any of the students'
+            timetables; nobody is enrolled then.
+        """
+        enrolled = {id(s) for s in self.enrolled_students}
+        new = []
+        for student in students:
+            if id(student) not in enrolled:
+                enrolled.add(id(student))
+                new.append(student)
+        clashes = []
+        for student in new:
+            other = student.timetable.clash(self.slots, self.course_id)
+            if other is not None:
+                clashes.append(("student", student.student_id, self.course_id, other))
+        if clashes:
+            raise ClashError(clashes)
+        added = []
+        with self._seats:
+            free = self.seats_left
+            if free is not None and free < len(new):
+                new, waiting = new[:free], new[free:]
+                for student in waiting:
+                    self.join_waitlist(student)
+            for student in new:
+                if self not in student.registered_courses:
+                    student.registered_courses.append(self)
+                    student.timetable.add(self.slots, self.course_id)
+                    student.invalidate_display()
+                if student in self.waitlist:
+                    self.waitlist.remove(student)
+                self.enrolled_students.append(student)
+                added.append(student)
+                _notify("register", student, self)
+        if added:
+            self._students_display = None
+        return added
+
+    def copy_roster(self, source):
+        """
+        Enrolls every student of another course in this one.
+
+        :param source: Course whose students are copied
+        :type source: Course
+        :return: The students that were newly enrolled
+        :rtype: list[Student]
+        """
+        return self.enroll(list(source.enrolled_students))
+
+    def drop_all(self):
+        """
+        Removes every student from this course and empties its waitlist.
+
+        :return: The students that were dropped
+        :rtype: list[Student]
+        """
+        with self._seats:
+            dropped, self.enrolled_students = self.enrolled_students, []
+            waiting, self.waitlist = self.waitlist, []
+        for student in waiting:
+            _notify("drop", student, self)
+        self._students_display = None
+        for student in dropped:
+            if self in student.registered_courses:
+                student.registered_courses.remove(self)
+                student.timetable.remove(self.slots, self.course_id)
+                student.invalidate_display()
+            _notify("drop", student, self)
+        return dropped
 
     def to_dict(self):
         """
@@ -211,6 +582,9 @@ class Course:
             "course_name": self.course_name,
             "instructor": self.instructor.instructor_id if self.instructor else None,
             "enrolled_students": [s.student_id for s in self.enrolled_students],
+            "slots": self.slots_display,
+            "capacity": self.capacity,
+            "waitlist": [s.student_id for s in self.waitlist],
         }
 
     @classmethod
@@ -222,14 +596,19 @@ class Course:
         :type data: dict
         :return: Course object
         :rtype: Course
+        :raises ValueError: If the slots are not valid
         """
-        return cls(data["course_id"], data["course_name"])
+        return cls(data["course_id"], data["course_name"], parse_slots(data.get("slots", "")),
+                   data.get("capacity"))
 
 
-def save_data(filename, students, instructors, courses):
+def save_data(filename, students, instructors, courses, extra=None):
     """
     Saves students, instructors, and courses data into a JSON file.
 
+    The file is replaced atomically and ends with a checksum line, so an
+    interrupted save leaves the previous file intact.
+
     :param filename: Path to the output JSON file
     :type filename: str
     :param students: List of Student objects
@@ -238,30 +617,157 @@ def save_data(filename, students, instructors, courses):
     :type instructors: list[Instructor]
     :param courses: List of Course objects
     :type courses: list[Course]
+    :param extra: Further top-level keys to store, ignored by :func:`load_data`
+    :type extra: dict
     """
     data = {
         "students": [s.to_dict() for s in students],
         "instructors": [i.to_dict() for i in instructors],
         "courses": [c.to_dict() for c in courses],
     }
-    with open(filename, "w") as f:
-        json.dump(data, f, indent=4)
+    data.update(extra or {})
+    dump_json(data, filename)
 
 
-def load_data(filename):
+def load_data(filename, workers=1, chunk_size=DEFAULT_CHUNK_SIZE):
     """
-    Loads students, instructors, and courses data from a JSON file.
+    Loads students, instructors, and courses data from a JSON file and
+    re-links which students are enrolled in which courses and which
+    instructor teaches each course.
+
+    The ages and emails of large files are validated in chunks by a pool
+    of worker processes; the objects are then created without checking
+    again. The first invalid record raises, as in a sequential load.
 
     :param filename: Path to the input JSON file
     :type filename: str
+    :param workers: Number of processes, None for one per CPU
+    :type workers: int
+    :param chunk_size: Records validated per task
+    :type chunk_size: int
     :return: Tuple of lists (students, instructors, courses)
     :rtype: tuple[list[Student], list[Instructor], list[Course]]
+    :raises ValueError: If ``chunk_size`` is less than 1, a record is
+        invalid or the file's checksum does not match its contents.
     """
-    with open(filename, "r") as f:
-        data = json.load(f)
-
-    students = [Student.from_dict(s) for s in data["students"]]
-    instructors = [Instructor.from_dict(i) for i in data["instructors"]]
+    if chunk_size < 1:
+        raise ValueError(f"Chunk size must be at least 1, got {chunk_size}")
+    data = load_json(filename)
+
+    for rows in (data["students"], data["instructors"]):
+        for error in map_chunks(_first_error, rows, workers, chunk_size):
+            if error:
+                raise ValueError(error)
+    students = [Student.from_dict(s, validate=False) for s in data["students"]]
+    instructors = [Instructor.from_dict(i, validate=False) for i in data["instructors"]]
     courses = [Course.from_dict(c) for c in data["courses"]]
+    link_records(data, students, instructors, courses)
 
     return students, instructors, courses
+
+
+def _first_error(rows):
+    # Runs in a worker process; returns only a message so little is pickled.
+    for row in rows:
+        try:
+            Person.validate(row["age"], row["email"])
+        except ValueError as e:
+            return str(e)
+    return None
+
+
+def link_records(data, students, instructors, courses):
+    """
+    Restores the relationships recorded in saved data between freshly
+    created objects and fills the students' and instructors' timetables.
+    No change listeners are notified and clashes are not checked; use
+    :func:`find_all_clashes` for that.
+
+    :param data: Dictionary as written by :func:`save_data`
+    :type data: dict
+    :param students: Student objects created from ``data["students"]``
+    :type students: list[Student]
+    :param instructors: Instructor objects created from ``data["instructors"]``
+    :type instructors: list[Instructor]
+    :param courses: Course objects created from ``data["courses"]``
+    :type courses: list[Course]
+    """
+    course_dict = {c.course_id: c for c in courses}
+    student_dict = {s.student_id: s for s in students}
+    instructor_dict = {i.instructor_id: i for i in instructors}
+
+    for c_data, c_obj in zip(data["courses"], courses):
+        if c_data["instructor"]:
+            c_obj.instructor = instructor_dict.get(c_data["instructor"])
+        for sid in c_data["enrolled_students"]:
+            if sid in student_dict:
+                c_obj.enrolled_students.append(student_dict[sid])
+        for sid in c_data.get("waitlist", []):
+            if sid in student_dict:
+                c_obj.waitlist.append(student_dict[sid])
+
+    for s_data, s_obj in zip(data["students"], students):
+        for cid in s_data["registered_courses"]:
+            if cid in course_dict:
+                s_obj.registered_courses.append(course_dict[cid])
+                s_obj.timetable.add(course_dict[cid].slots, cid)
+
+    for i_data, i_obj in zip(data["instructors"], instructors):
+        for cid in i_data["assigned_courses"]:
+            if cid in course_dict:
+                i_obj.assigned_courses.append(course_dict[cid])
+                i_obj.timetable.add(course_dict[cid].slots, cid)
+
+
+def detach(obj, courses=()):
+    """
+    Removes every link to a student, instructor or course that is being
+    deleted, so the remaining objects do not keep it (and everything it
+    refers to) in memory. No change listeners are notified and no waiting
+    student is promoted; call :meth:`Course.promote` on the returned
+    courses once every deleted object is detached.
+
+    :param obj: The Student, Instructor or Course being deleted
+    :type obj: Student or Instructor or Course
+    :param courses: Courses whose waitlists may hold a deleted student
+    :type courses: iterable[Course]
+    :return: The courses that lost a student and so have a free seat
+    :rtype: list[Course]
+    """
+    freed = []
+    if isinstance(obj, Student):
+        for course in obj.registered_courses:
+            if obj in course.enrolled_students:
+                course.enrolled_students.remove(obj)
+                course.invalidate_display()
+                freed.append(course)
+        for course in courses:
+            course.leave_waitlist(obj)
+    elif isinstance(obj, Instructor):
+        for course in obj.assigned_courses:
+            if course.instructor is obj:
+                course.instructor = None
+    else:
+        for student in obj.enrolled_students:
+            if obj in student.registered_courses:
+                student.registered_courses.remove(obj)
+                student.timetable.remove(obj.slots, obj.course_id)
+                student.invalidate_display()
+        if obj.instructor and obj in obj.instructor.assigned_courses:
+            obj.instructor.assigned_courses.remove(obj)
+            obj.instructor.timetable.remove(obj.slots, obj.course_id)
+            obj.instructor.invalidate_display()
+    return freed
+
+
+def find_all_clashes(courses):
+    """
+    Finds every student, instructor and room booked for two courses at
+    the same time, in one sort-and-sweep pass over all the bookings.
+
+    :param courses: List of Course objects
+    :type courses: list[Course]
+    :return: ``(kind, owner, course_id, other_course_id)`` per clashing pair
+    :rtype: list[tuple]
+    """
+    return find_clashes(course_bookings(courses))
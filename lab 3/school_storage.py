@@ -0,0 +1,367 @@
+from school.db import (connect, init_db, delete_rows, limited_courses_of, promote, with_retry, UPSERT_PERSON,
+                       UPSERT_COURSE, INSERT_REGISTRATION, INSERT_SLOT, JOIN_WAITLIST)
+from school.timetable import Slot
+
+from school_management import Student, Instructor, Course
+
+
+class SQLiteStorage:
+    """
+    Stores students, instructors and courses in the SQLite database used by
+    the PyQt app (tables ``students``, ``instructors``, ``courses`` and
+    ``registrations``), so both front ends can share one file.
+
+    Every change can be written on its own with the ``save_*``,
+    ``delete_*`` and registration methods. :meth:`save` writes a whole set
+    of objects but only touches the rows that changed since the last
+    :meth:`load` or :meth:`save`.
+
+    :param db_file: Path of the database file.
+    :type db_file: str
+    """
+
+    def __init__(self, db_file="school.db"):
+        self.db_file = db_file
+        init_db(db_file)
+        self._rows = {"students": {}, "instructors": {}, "courses": {}}
+        self._registrations = set()
+
+    def _transaction(self, fn):
+        # Runs fn(conn) in one transaction, retried while another writer
+        # holds the lock.
+        def attempt():
+            conn = connect(self.db_file)
+            try:
+                with conn:
+                    fn(conn)
+            finally:
+                conn.close()
+        with_retry(attempt)
+
+    def _write(self, statements):
+        def write(conn):
+            for query, params in statements:
+                conn.execute(query, params)
+        self._transaction(write)
+
+    def _write_many(self, query, rows):
+        self._transaction(lambda conn: conn.executemany(query, rows))
+
+    @staticmethod
+    def _person_row(person, id_value):
+        return (id_value, person.name, person.age, person._email)
+
+    @staticmethod
+    def _course_row(course):
+        return (course.course_id, course.course_name,
+                course.instructor.instructor_id if course.instructor else None, tuple(course.slots),
+                course.capacity, tuple(s.student_id for s in course.waitlist))
+
+    @staticmethod
+    def _course_statements(row):
+        # The course row followed by its timetable, seats and waitlist,
+        # replacing the old ones.
+        cid = row[0]
+        statements = [(UPSERT_COURSE, row[:3]), ("DELETE FROM course_slots WHERE course_id=?", (cid,))]
+        statements += [(INSERT_SLOT, (slot.start, slot.end, slot.room, cid)) for slot in row[3]]
+        if row[4] is None:
+            statements.append(("DELETE FROM course_seats WHERE course_id=?", (cid,)))
+        else:
+            statements.append(("INSERT OR REPLACE INTO course_seats VALUES "
+                               "(?, ?, (SELECT COUNT(*) FROM registrations WHERE course_id=?))", (cid, row[4], cid)))
+        statements.append(("DELETE FROM waitlist WHERE course_id=?", (cid,)))
+        statements += [(JOIN_WAITLIST, (sid, cid)) for sid in row[5]]
+        return statements
+
+    def load(self):
+        """
+        Load all records and link students, instructors and courses. The
+        stored registrations are kept even if a course holds more students
+        than its capacity; no change listeners are notified.
+
+        :return: Tuple of lists (students, instructors, courses)
+        :rtype: tuple[list[Student], list[Instructor], list[Course]]
+        """
+        conn = connect(self.db_file)
+        try:
+            student_rows = conn.execute("SELECT id, name, age, email FROM students").fetchall()
+            instructor_rows = conn.execute("SELECT id, name, age, email FROM instructors").fetchall()
+            course_rows = conn.execute("SELECT id, name, instructor_id FROM courses").fetchall()
+            registrations = conn.execute("SELECT student_id, course_id FROM registrations").fetchall()
+            slot_rows = conn.execute("SELECT course_id, start_min, end_min, room FROM course_slots "
+                                     "ORDER BY course_id, start_min").fetchall()
+            capacity = dict(conn.execute("SELECT course_id, capacity FROM course_seats").fetchall())
+            waiting = conn.execute("SELECT course_id, student_id FROM waitlist ORDER BY id").fetchall()
+        finally:
+            conn.close()
+
+        slots = {}
+        for cid, start, end, room in slot_rows:
+            slots.setdefault(cid, []).append(Slot(start, end, room))
+
+        students = [Student(name, age, email, sid) for sid, name, age, email in student_rows]
+        instructors = [Instructor(name, age, email, iid) for iid, name, age, email in instructor_rows]
+        courses = [Course(cid, name, slots.get(cid), capacity.get(cid)) for cid, name, _ in course_rows]
+
+        student_by_id = {s.student_id: s for s in students}
+        instructor_by_id = {i.instructor_id: i for i in instructors}
+        course_by_id = {c.course_id: c for c in courses}
+
+        # Link the stored rows as they are, like link_records: the database
+        # already decided who has a seat, so no capacity check and no
+        # change listeners.
+        for course, (_, _, iid) in zip(courses, course_rows):
+            if iid in instructor_by_id:
+                instructor = instructor_by_id[iid]
+                course.instructor = instructor
+                instructor.assigned_courses.append(course)
+                instructor.timetable.add(course.slots, course.course_id)
+        for sid, cid in registrations:
+            if sid in student_by_id and cid in course_by_id:
+                student, course = student_by_id[sid], course_by_id[cid]
+                course.enrolled_students.append(student)
+                student.registered_courses.append(course)
+                student.timetable.add(course.slots, cid)
+        for cid, sid in waiting:
+            if sid in student_by_id and cid in course_by_id:
+                course_by_id[cid].waitlist.append(student_by_id[sid])
+
+        self._rows = {
+            "students": {r[0]: tuple(r) for r in student_rows},
+            "instructors": {r[0]: tuple(r) for r in instructor_rows},
+            "courses": {c.course_id: self._course_row(c) for c in courses},
+        }
+        self._registrations = {(s.student_id, c.course_id)
+                               for s in students for c in s.registered_courses}
+        return students, instructors, courses
+
+    def save_student(self, student):
+        """
+        Insert or update one student.
+
+        :param student: Student to write.
+        :type student: Student
+        """
+        row = self._person_row(student, student.student_id)
+        self._write([(self._upsert("students"), row)])
+        self._rows["students"][row[0]] = row
+
+    def save_instructor(self, instructor):
+        """
+        Insert or update one instructor.
+
+        :param instructor: Instructor to write.
+        :type instructor: Instructor
+        """
+        row = self._person_row(instructor, instructor.instructor_id)
+        self._write([(self._upsert("instructors"), row)])
+        self._rows["instructors"][row[0]] = row
+
+    def save_course(self, course):
+        """
+        Insert or update one course, including its instructor and
+        timetable.
+
+        :param course: Course to write.
+        :type course: Course
+        """
+        row = self._course_row(course)
+        self._write(self._course_statements(row))
+        self._rows["courses"][row[0]] = row
+
+    def add_registration(self, student, course):
+        """
+        Record that a student is registered in a course.
+
+        :param student: The student.
+        :type student: Student
+        :param course: The course.
+        :type course: Course
+        """
+        pair = (student.student_id, course.course_id)
+        self._write([(INSERT_REGISTRATION, pair)])
+        self._registrations.add(pair)
+
+    def remove_registration(self, student, course):
+        """
+        Remove a student's registration in a course.
+
+        :param student: The student.
+        :type student: Student
+        :param course: The course.
+        :type course: Course
+        """
+        pair = (student.student_id, course.course_id)
+        self._write([("DELETE FROM registrations WHERE student_id=? AND course_id=?", pair)])
+        self._registrations.discard(pair)
+
+    def add_registrations(self, pairs):
+        """
+        Record many registrations in one transaction.
+
+        :param pairs: ``(student, course)`` pairs.
+        :type pairs: iterable[tuple[Student, Course]]
+        """
+        rows = [(s.student_id, c.course_id) for s, c in pairs]
+        self._write_many(INSERT_REGISTRATION, rows)
+        self._registrations.update(rows)
+
+    def remove_registrations(self, pairs):
+        """
+        Remove many registrations in one transaction.
+
+        :param pairs: ``(student, course)`` pairs.
+        :type pairs: iterable[tuple[Student, Course]]
+        """
+        rows = [(s.student_id, c.course_id) for s, c in pairs]
+        self._write_many("DELETE FROM registrations WHERE student_id=? AND course_id=?", rows)
+        self._registrations.difference_update(rows)
+
+    def delete_student(self, student_id):
+        """
+        Delete a student; the database cascades the delete to their
+        registrations.
+
+        :param student_id: ID of the student.
+        :type student_id: str
+        """
+        self.delete_students([student_id])
+
+    def delete_students(self, student_ids):
+        """
+        Delete many students in one transaction. The seats they free go
+        to waiting students, as :meth:`Course.promote` does in memory.
+
+        :param student_ids: IDs of the students.
+        :type student_ids: iterable[str]
+        """
+        ids = list(set(student_ids))
+        freed = {}
+
+        def delete(conn):
+            freed.clear()
+            courses = limited_courses_of(conn, ids)
+            delete_rows(conn, "students", ids)
+            for cid in courses:
+                promote(conn, cid)
+                freed[cid] = (
+                    {r[0] for r in conn.execute("SELECT student_id FROM registrations WHERE course_id=?", (cid,))},
+                    tuple(r[0] for r in conn.execute(
+                        "SELECT student_id FROM waitlist WHERE course_id=? ORDER BY id", (cid,))))
+
+        self._transaction(delete)
+        for sid in ids:
+            self._rows["students"].pop(sid, None)
+        self._registrations = {p for p in self._registrations if p[0] not in ids and p[1] not in freed}
+        for cid, (enrolled, waiting) in freed.items():
+            self._registrations.update((sid, cid) for sid in enrolled)
+            row = self._rows["courses"].get(cid)
+            if row is not None:
+                self._rows["courses"][cid] = row[:5] + (waiting,)
+
+    def delete_instructor(self, instructor_id):
+        """
+        Delete an instructor; the database unassigns them from their
+        courses.
+
+        :param instructor_id: ID of the instructor.
+        :type instructor_id: str
+        """
+        self.delete_instructors([instructor_id])
+
+    def delete_instructors(self, instructor_ids):
+        """
+        Delete many instructors in one transaction.
+
+        :param instructor_ids: IDs of the instructors.
+        :type instructor_ids: iterable[str]
+        """
+        ids = set(instructor_ids)
+        self._delete("instructors", ids)
+        for iid in ids:
+            self._rows["instructors"].pop(iid, None)
+        for cid, row in self._rows["courses"].items():
+            if row[2] in ids:
+                self._rows["courses"][cid] = (row[0], row[1], None) + row[3:]
+
+    def delete_course(self, course_id):
+        """
+        Delete a course; the database cascades the delete to its
+        registrations.
+
+        :param course_id: ID of the course.
+        :type course_id: str
+        """
+        self.delete_courses([course_id])
+
+    def delete_courses(self, course_ids):
+        """
+        Delete many courses in one transaction.
+
+        :param course_ids: IDs of the courses.
+        :type course_ids: iterable[str]
+        """
+        ids = set(course_ids)
+        self._delete("courses", ids)
+        for cid in ids:
+            self._rows["courses"].pop(cid, None)
+        self._registrations = {p for p in self._registrations if p[1] not in ids}
+
+    def _delete(self, table, ids):
+        self._transaction(lambda conn: delete_rows(conn, table, ids))
+
+    def save(self, students, instructors, courses):
+        """
+        Bring the database in line with the given objects, writing only
+        the rows that were added, changed or removed since the last
+        :meth:`load` or :meth:`save`. All writes happen in one transaction.
+
+        :param students: List of Student objects
+        :type students: list[Student]
+        :param instructors: List of Instructor objects
+        :type instructors: list[Instructor]
+        :param courses: List of Course objects
+        :type courses: list[Course]
+        :return: Number of rows written.
+        :rtype: int
+        """
+        current = {
+            "students": {s.student_id: self._person_row(s, s.student_id) for s in students},
+            "instructors": {i.instructor_id: self._person_row(i, i.instructor_id) for i in instructors},
+            "courses": {c.course_id: self._course_row(c) for c in courses},
+        }
+        registrations = {(s.student_id, c.course_id) for s in students for c in s.registered_courses}
+
+        statements = []
+        for table in ("students", "instructors"):
+            old, new = self._rows[table], current[table]
+            statements += [(self._upsert(table), row) for key, row in new.items() if old.get(key) != row]
+        old = self._rows["courses"]
+        for key, row in current["courses"].items():
+            if old.get(key) != row:
+                statements += self._course_statements(row)
+        # Drops first, so the seats they free can be taken by new registrations.
+        statements += [("DELETE FROM registrations WHERE student_id=? AND course_id=?", pair)
+                       for pair in self._registrations - registrations]
+        statements += [(INSERT_REGISTRATION, pair)
+                       for pair in registrations - self._registrations]
+        removed = {table: self._rows[table].keys() - current[table].keys()
+                   for table in ("courses", "instructors", "students")}
+
+        def write(conn):
+            for query, params in statements:
+                conn.execute(query, params)
+            for table, ids in removed.items():
+                delete_rows(conn, table, ids)
+
+        if statements or any(removed.values()):
+            self._transaction(write)
+        self._rows = current
+        self._registrations = registrations
+        return len(statements) + sum(len(ids) for ids in removed.values())
+
+    @staticmethod
+    def _upsert(table):
+        if table == "courses":
+            return UPSERT_COURSE
+        return UPSERT_PERSON.format(table=table)
@@ -1,148 +1,160 @@
+import sys
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import json
+
+from school.startup import StartupTimer, timing_requested
+from school.instrument import instrumentation, timed, enable_if_requested
+from school.memory import memory, tracked, enable_if_requested as enable_memory_if_requested
+from school.dedupe import normalize_email
+from school.timetable import ClashError, parse_slots, book_rooms, release_rooms, room_timetable
+
+import school_management
 from school_management import Student, Instructor, Course
+from school_storage import SQLiteStorage
+from school_autosave import Autosaver
+
+startup = StartupTimer()
 
 students = []
 instructors = []
 courses = []
 
-root = tk.Tk()
-root.title("School Management System")
-root.geometry("1000x600")
+# Bookings of every room, rebuilt whenever ``courses`` is replaced.
+rooms = room_timetable([])
+
+# Set by open_database(); when present every change is written through to SQLite.
+storage = None
 
-tabControl = ttk.Notebook(root)
-tab_students = ttk.Frame(tabControl)
-tab_instructors = ttk.Frame(tabControl)
-tab_courses = ttk.Frame(tabControl)
-tabControl.add(tab_students, text='Students')
-tabControl.add(tab_instructors, text='Instructors')
-tabControl.add(tab_courses, text='Courses')
-tabControl.pack(expand=1, fill="both")
+# Journals changes every AUTOSAVE_INTERVAL_MS unless started with --no-autosave.
+autosaver = None
+AUTOSAVE_INTERVAL_MS = 5000
 
+# Widgets are created by main() and the tab builders; a tree stays None
+# until its tab has been shown for the first time.
+root = None
+tabControl = None
+student_tree = None
+instructor_tree = None
+course_tree = None
+course_dropdown = None
+inst_course_dropdown = None
+roster_dropdown = None
 
+
+@tracked()
+@timed(category="refresh")
 def refresh_treeview():
     """
     Refresh all treeviews (students, instructors, courses).
 
     This clears out the treeviews and repopulates them with the
     latest data from the global ``students``, ``instructors``,
-    and ``courses`` lists.
+    and ``courses`` lists, using the display strings the model objects
+    cache. Trees on tabs that have not been built yet are skipped; they
+    are filled when their tab is first shown.
     """
     for tree in [student_tree, instructor_tree, course_tree]:
-        for i in tree.get_children():
-            tree.delete(i)
-    for s in students:
-        student_tree.insert(
-            '',
-            'end',
-            values=(s.student_id, s.name, s.age, s._email,
-                    ",".join([c.course_id for c in s.registered_courses]))
-        )
-    for i in instructors:
-        instructor_tree.insert(
-            '',
-            'end',
-            values=(i.instructor_id, i.name, i.age, i._email,
-                    ",".join([c.course_id for c in i.assigned_courses]))
-        )
-    for c in courses:
-        instructor_name = c.instructor.name if c.instructor else ""
-        course_tree.insert(
-            '',
-            'end',
-            values=(c.course_id, c.course_name, instructor_name,
-                    ",".join([s.student_id for s in c.enrolled_students]))
-        )
+        if tree is not None:
+            tree.delete(*tree.get_children())
+    if student_tree is not None:
+        for s in students:
+            student_tree.insert('', 'end', values=(s.student_id, s.name, s.age, s._email,
+                                                   s.courses_display))
+    if instructor_tree is not None:
+        for i in instructors:
+            instructor_tree.insert('', 'end', values=(i.instructor_id, i.name, i.age, i._email,
+                                                      i.courses_display))
+    if course_tree is not None:
+        for c in courses:
+            course_tree.insert('', 'end', values=(c.course_id, c.course_name, c.instructor_name,
+                                                  c.students_display, c.slots_display, c.seats_display))
 
 
+@timed()
 def save_data():
     """
     Save all data (students, instructors, courses) to a JSON file.
 
     Opens a save dialog so the user can choose where to save.
-    Each object is serialized via its ``to_dict`` method.
+    Each object is serialized via its ``to_dict`` method and the file is
+    replaced atomically by :func:`school_management.save_data`.
 
     A popup message is shown if saving succeeds.
     """
-    data = {
-        "students": [s.to_dict() for s in students],
-        "instructors": [i.to_dict() for i in instructors],
-        "courses": [c.to_dict() for c in courses]
-    }
     file = filedialog.asksaveasfilename(defaultextension=".json")
     if file:
-        with open(file, "w") as f:
-            json.dump(data, f, indent=4)
+        school_management.save_data(file, students, instructors, courses)
         messagebox.showinfo("Save", "Data saved successfully!")
 
 
+@tracked()
+@timed()
 def load_data():
     """
     Load data from a JSON file.
 
-    Recreates students, instructors, and courses from saved JSON.
+    Recreates students, instructors, and courses from saved JSON, using
+    all CPUs for large files.
     Also re-links relationships:
       - Which students are enrolled in which courses
       - Which instructor is assigned to which course
 
     Updates the treeviews when done.
     """
-    global students, instructors, courses
+    global students, instructors, courses, rooms
     file = filedialog.askopenfilename(defaultextension=".json")
     if file:
-        with open(file, "r") as f:
-            data = json.load(f)
-        students = [Student(s["name"], s["age"], s["email"], s["student_id"])
-                    for s in data["students"]]
-        instructors = [Instructor(i["name"], i["age"], i["email"], i["instructor_id"])
-                       for i in data["instructors"]]
-        courses = [Course(c["course_id"], c["course_name"])
-                   for c in data["courses"]]
-
-        course_dict = {c.course_id: c for c in courses}
-        student_dict = {s.student_id: s for s in students}
-        instructor_dict = {i.instructor_id: i for i in instructors}
-
-        for c_data, c_obj in zip(data["courses"], courses):
-            if c_data["instructor"]:
-                c_obj.instructor = instructor_dict.get(c_data["instructor"])
-            for sid in c_data["enrolled_students"]:
-                if sid in student_dict:
-                    c_obj.enrolled_students.append(student_dict[sid])
+        try:
+            students, instructors, courses = school_management.load_data(file, workers=None)
+        except ValueError as e:
+            messagebox.showerror("Load", str(e))
+            return
+        rooms = room_timetable(courses)
+        if autosaver:
+            autosaver.compact(students, instructors, courses)
+        refresh_treeview()
+        messagebox.showinfo("Load", "Data loaded successfully!")
 
-        for s in students:
-            for cid in s.to_dict()["registered_courses"]:
-                if cid in course_dict:
-                    s.registered_courses.append(course_dict[cid])
 
-        for i in instructors:
-            for cid in i.to_dict()["assigned_courses"]:
-                if cid in course_dict:
-                    i.assigned_courses.append(course_dict[cid])
+@tracked()
+@timed()
+def open_database():
+    """
+    Open (or create) a SQLite database shared with the PyQt app.
 
+    Replaces the in-memory data with the database contents. From then on
+    every add, delete, registration and assignment is written to the
+    database immediately, one row at a time.
+    """
+    global storage, students, instructors, courses, rooms
+    file = filedialog.asksaveasfilename(defaultextension=".db", confirmoverwrite=False,
+                                        filetypes=[("SQLite database", "*.db")])
+    if file:
+        storage = SQLiteStorage(file)
+        students, instructors, courses = storage.load()
+        rooms = room_timetable(courses)
+        if autosaver:
+            autosaver.compact(students, instructors, courses)
         refresh_treeview()
-        messagebox.showinfo("Load", "Data loaded successfully!")
+        messagebox.showinfo("Database", f"Using database {file}")
 
 
-# ------------------------
-# Student tab
-# ------------------------
-tk.Label(tab_students, text="ID").grid(row=0, column=0)
-tk.Label(tab_students, text="Name").grid(row=1, column=0)
-tk.Label(tab_students, text="Age").grid(row=2, column=0)
-tk.Label(tab_students, text="Email").grid(row=3, column=0)
+def check_email_free(person, people):
+    """
+    Refuse a person whose email, ignoring case, is already used.
 
-s_id = tk.Entry(tab_students)
-s_name = tk.Entry(tab_students)
-s_age = tk.Entry(tab_students)
-s_email = tk.Entry(tab_students)
-s_id.grid(row=0, column=1)
-s_name.grid(row=1, column=1)
-s_age.grid(row=2, column=1)
-s_email.grid(row=3, column=1)
+    :param person: The new student or instructor.
+    :type person: Person
+    :param people: The students or instructors already added.
+    :type people: list[Person]
+    :raises ValueError: If the email is taken.
+    """
+    email = normalize_email(person._email)
+    if any(normalize_email(p._email) == email for p in people):
+        raise ValueError(f"Email {person._email} is already used")
 
 
+@timed()
 def add_student():
     """
     Add a new student based on form inputs.
@@ -150,36 +162,24 @@ def add_student():
     Reads the fields (ID, name, age, email), creates a ``Student``,
     adds it to the global list, and updates the treeview.
 
-    Shows an error message if something goes wrong (e.g. invalid age).
+    Shows an error message if something goes wrong (e.g. invalid age, or
+    an email another student already uses). A student the database
+    refuses is not added to the list either.
     """
     try:
         s = Student(s_name.get(), int(s_age.get()), s_email.get(), s_id.get())
+        check_email_free(s, students)
+        if storage:
+            storage.save_student(s)
         students.append(s)
+        if autosaver:
+            autosaver.added(s)
         refresh_treeview()
     except Exception as e:
         messagebox.showerror("Error", str(e))
 
 
-tk.Button(tab_students, text="Add Student", command=add_student).grid(row=4, column=0, columnspan=2)
-
-# ------------------------
-# Instructor tab
-# ------------------------
-tk.Label(tab_instructors, text="ID").grid(row=0, column=0)
-tk.Label(tab_instructors, text="Name").grid(row=1, column=0)
-tk.Label(tab_instructors, text="Age").grid(row=2, column=0)
-tk.Label(tab_instructors, text="Email").grid(row=3, column=0)
-
-i_id = tk.Entry(tab_instructors)
-i_name = tk.Entry(tab_instructors)
-i_age = tk.Entry(tab_instructors)
-i_email = tk.Entry(tab_instructors)
-i_id.grid(row=0, column=1)
-i_name.grid(row=1, column=1)
-i_age.grid(row=2, column=1)
-i_email.grid(row=3, column=1)
-
-
+@timed()
 def add_instructor():
     """
     Add a new instructor based on form inputs.
@@ -189,85 +189,177 @@ def add_instructor():
     """
     try:
         i = Instructor(i_name.get(), int(i_age.get()), i_email.get(), i_id.get())
+        check_email_free(i, instructors)
+        if storage:
+            storage.save_instructor(i)
         instructors.append(i)
+        if autosaver:
+            autosaver.added(i)
         refresh_treeview()
     except Exception as e:
         messagebox.showerror("Error", str(e))
 
 
-tk.Button(tab_instructors, text="Add Instructor", command=add_instructor).grid(row=4, column=0, columnspan=2)
-
-# ------------------------
-# Courses tab
-# ------------------------
-tk.Label(tab_courses, text="ID").grid(row=0, column=0)
-tk.Label(tab_courses, text="Name").grid(row=1, column=0)
-
-c_id = tk.Entry(tab_courses)
-c_name = tk.Entry(tab_courses)
-c_id.grid(row=0, column=1)
-c_name.grid(row=1, column=1)
-
-
+@timed()
 def add_course():
     """
     Add a new course based on form inputs.
 
-    Creates a ``Course`` and stores it in the global list.
+    Creates a ``Course`` with the weekly slots and the number of seats typed
+    in the form and stores it in the global list. A slot in a room that is
+    already taken at that time is refused; an empty capacity means no limit.
     """
     try:
-        c = Course(c_id.get(), c_name.get())
+        capacity = int(c_capacity.get()) if c_capacity.get().strip() else None
+        if capacity is not None and capacity < 1:
+            raise ValueError("Capacity must be a positive number")
+        c = Course(c_id.get(), c_name.get(), parse_slots(c_slots.get()), capacity)
+        book_rooms(rooms, c.course_id, c.slots)
+        if storage:
+            try:
+                storage.save_course(c)
+            except Exception:
+                release_rooms(rooms, c.course_id, c.slots)
+                raise
         courses.append(c)
+        if autosaver:
+            autosaver.added(c)
         refresh_treeview()
     except Exception as e:
         messagebox.showerror("Error", str(e))
 
 
-tk.Button(tab_courses, text="Add Course", command=add_course).grid(row=2, column=0, columnspan=2)
-
-# ------------------------
-# Course registration / assignment
-# ------------------------
-tk.Label(tab_students, text="Register Course:").grid(row=5, column=0)
-course_var = tk.StringVar()
-course_dropdown = ttk.Combobox(tab_students, textvariable=course_var)
-course_dropdown.grid(row=5, column=1)
-
-
+@timed(category="refresh")
 def update_course_dropdown():
     """
-    Update the course dropdown in the student tab.
+    Update the course dropdowns on the tabs built so far.
 
     Keeps the options current after courses are added/removed.
     """
-    course_dropdown['values'] = [c.course_id for c in courses]
+    ids = [c.course_id for c in courses]
+    for dropdown in (course_dropdown, inst_course_dropdown, roster_dropdown):
+        if dropdown is not None:
+            dropdown['values'] = ids
 
 
+@timed()
 def register_course_to_student():
     """
     Register a student to a selected course.
 
     Uses the ID from the form and the course from the dropdown.
-    Calls ``student.register_course`` if valid.
+    Calls ``student.register_course`` if valid; a full course puts the
+    student on its waitlist.
     """
     sid = s_id.get()
     student = next((s for s in students if s.student_id == sid), None)
     course = next((c for c in courses if c.course_id == course_var.get()), None)
     if student and course:
-        student.register_course(course)
+        try:
+            seated = student.register_course(course)
+        except ClashError as e:
+            messagebox.showerror("Timetable Clash", str(e))
+            return
+        if storage:
+            if seated:
+                storage.add_registration(student, course)
+            else:
+                storage.save_course(course)
         refresh_treeview()
+        if not seated:
+            messagebox.showinfo("Course Full", f"{course.course_id} is full; {sid} was put on the waitlist.")
     else:
         messagebox.showerror("Error", "Invalid student or course")
 
 
-tk.Button(tab_students, text="Register", command=register_course_to_student).grid(row=6, column=0, columnspan=2)
+@timed()
+def register_selected_students():
+    """
+    Register every student selected in the students tree to the course
+    chosen in the dropdown, as one batch.
+    """
+    course = next((c for c in courses if c.course_id == course_var.get()), None)
+    selected = selected_ids(student_tree)
+    if not course or not selected:
+        messagebox.showerror("Error", "Select students and a course")
+        return
+    waiting = len(course.waitlist)
+    try:
+        added = course.enroll(s for s in students if s.student_id in selected)
+    except ClashError as e:
+        messagebox.showerror("Timetable Clash", str(e))
+        return
+    _save_enrolment(course, added, waiting)
+
+
+def _save_enrolment(course, added, waiting):
+    # Writes a batch enrolment and tells the user how many students did not
+    # get a seat; waiting is the waitlist length before the batch.
+    if storage and added:
+        storage.add_registrations((s, course) for s in added)
+    if storage and len(course.waitlist) != waiting:
+        storage.save_course(course)
+    refresh_treeview()
+    if len(course.waitlist) > waiting:
+        messagebox.showinfo("Course Full",
+                            f"{len(course.waitlist) - waiting} students were put on the waitlist of {course.course_id}.")
+
+
+def selected_course():
+    """
+    Get the course selected in the courses tree.
+
+    :return: The selected course, or None.
+    :rtype: Course
+    """
+    selection = course_tree.selection()
+    if not selection:
+        return None
+    cid = str(course_tree.item(selection[0])['values'][0])
+    return next((c for c in courses if c.course_id == cid), None)
+
 
-tk.Label(tab_instructors, text="Assign Course:").grid(row=5, column=0)
-inst_course_var = tk.StringVar()
-inst_course_dropdown = ttk.Combobox(tab_instructors, textvariable=inst_course_var)
-inst_course_dropdown.grid(row=5, column=1)
+@timed()
+def copy_roster():
+    """
+    Enroll all students of the course chosen in the roster dropdown in the
+    course selected in the courses tree.
+    """
+    target = selected_course()
+    source = next((c for c in courses if c.course_id == roster_var.get()), None)
+    if not target or not source:
+        messagebox.showerror("Error", "Select a course and a course to copy from")
+        return
+    waiting = len(target.waitlist)
+    try:
+        added = target.copy_roster(source)
+    except ClashError as e:
+        messagebox.showerror("Timetable Clash", str(e))
+        return
+    _save_enrolment(target, added, waiting)
 
 
+@timed()
+def drop_section():
+    """
+    Remove every student from the course selected in the courses tree and
+    empty its waitlist.
+    """
+    course = selected_course()
+    if not course:
+        return
+    if not messagebox.askyesno("Drop Section", f"Remove all students from {course.course_id}?"):
+        return
+    waiting = bool(course.waitlist)
+    dropped = course.drop_all()
+    if storage and dropped:
+        storage.remove_registrations((s, course) for s in dropped)
+    if storage and waiting:
+        storage.save_course(course)
+    refresh_treeview()
+
+
+@timed()
 def assign_course_to_instructor():
     """
     Assign a course to an instructor.
@@ -278,102 +370,394 @@ def assign_course_to_instructor():
     instructor = next((i for i in instructors if i.instructor_id == iid), None)
     course = next((c for c in courses if c.course_id == inst_course_var.get()), None)
     if instructor and course:
-        instructor.assign_course(course)
+        try:
+            instructor.assign_course(course)
+        except ClashError as e:
+            messagebox.showerror("Timetable Clash", str(e))
+            return
+        if storage:
+            storage.save_course(course)
         refresh_treeview()
     else:
         messagebox.showerror("Error", "Invalid instructor or course")
 
 
-tk.Button(tab_instructors, text="Assign", command=assign_course_to_instructor).grid(row=6, column=0, columnspan=2)
-
-# ------------------------
-# Treeviews
-# ------------------------
-student_tree = ttk.Treeview(tab_students, columns=("ID", "Name", "Age", "Email", "Courses"), show="headings")
-for col in ("ID", "Name", "Age", "Email", "Courses"):
-    student_tree.heading(col, text=col)
-student_tree.grid(row=7, column=0, columnspan=2)
-
-instructor_tree = ttk.Treeview(tab_instructors, columns=("ID", "Name", "Age", "Email", "Courses"), show="headings")
-for col in ("ID", "Name", "Age", "Email", "Courses"):
-    instructor_tree.heading(col, text=col)
-instructor_tree.grid(row=7, column=0, columnspan=2)
+def selected_ids(tree):
+    """
+    Get the IDs of the rows selected in a tree.
 
-course_tree = ttk.Treeview(tab_courses, columns=("ID", "Name", "Instructor", "Students"), show="headings")
-for col in ("ID", "Name", "Instructor", "Students"):
-    course_tree.heading(col, text=col)
-course_tree.grid(row=3, column=0, columnspan=2)
+    :param tree: A students, instructors or courses tree.
+    :type tree: ttk.Treeview
+    :return: The IDs in the first column of the selected rows.
+    :rtype: set[str]
+    """
+    return {str(tree.item(item)['values'][0]) for item in tree.selection()}
 
 
+@tracked()
+@timed()
 def delete_selected_student():
     """
-    Delete the currently selected student.
+    Delete the selected students.
 
-    Removes them from ``students`` and refreshes the tree.
+    Removes them from ``students`` in one pass, gives the seats they free
+    to waiting students and refreshes the tree once.
     """
-    selected = student_tree.selection()
-    if selected:
-        sid = student_tree.item(selected[0])['values'][0]
+    ids = selected_ids(student_tree)
+    if ids:
         global students
-        students = [s for s in students if s.student_id != sid]
+        freed = set()
+        for s in students:
+            if s.student_id in ids:
+                freed.update(school_management.detach(s, courses))
+        students = [s for s in students if s.student_id not in ids]
+        # In course order, as the database promotes.
+        for course in sorted(freed, key=lambda c: c.course_id):
+            course.promote()
+        if storage:
+            storage.delete_students(ids)
+        if autosaver:
+            for sid in ids:
+                autosaver.deleted("student", sid)
         refresh_treeview()
 
 
-tk.Button(tab_students, text="Delete Selected", command=delete_selected_student).grid(row=8, column=0, columnspan=2)
-
-
+@tracked()
+@timed()
 def delete_selected_instructor():
     """
-    Delete the currently selected instructor.
+    Delete the selected instructors.
 
-    Removes them from ``instructors`` and refreshes the tree.
+    Removes them from ``instructors`` in one pass and refreshes the tree once.
     """
-    selected = instructor_tree.selection()
-    if selected:
-        iid = instructor_tree.item(selected[0])['values'][0]
+    ids = selected_ids(instructor_tree)
+    if ids:
         global instructors
-        instructors = [i for i in instructors if i.instructor_id != iid]
+        for i in instructors:
+            if i.instructor_id in ids:
+                school_management.detach(i)
+        instructors = [i for i in instructors if i.instructor_id not in ids]
+        if storage:
+            storage.delete_instructors(ids)
+        if autosaver:
+            for iid in ids:
+                autosaver.deleted("instructor", iid)
         refresh_treeview()
 
 
-tk.Button(tab_instructors, text="Delete Selected", command=delete_selected_instructor).grid(row=8, column=0, columnspan=2)
-
-
+@tracked()
+@timed()
 def delete_selected_course():
     """
-    Delete the currently selected course.
+    Delete the selected courses.
 
-    Removes it from ``courses`` and refreshes the tree.
+    Removes them from ``courses`` in one pass and refreshes the tree once.
     """
-    selected = course_tree.selection()
-    if selected:
-        cid = course_tree.item(selected[0])['values'][0]
+    ids = selected_ids(course_tree)
+    if ids:
         global courses
-        courses = [c for c in courses if c.course_id != cid]
+        for c in courses:
+            if c.course_id in ids:
+                release_rooms(rooms, c.course_id, c.slots)
+                school_management.detach(c)
+        courses = [c for c in courses if c.course_id not in ids]
+        if storage:
+            storage.delete_courses(ids)
+        if autosaver:
+            for cid in ids:
+                autosaver.deleted("course", cid)
         refresh_treeview()
 
 
-tk.Button(tab_courses, text="Delete Selected", command=delete_selected_course).grid(row=4, column=0, columnspan=2)
-
-# ------------------------
-# Save / Load buttons
-# ------------------------
-tk.Button(root, text="Save Data", command=save_data).pack(side="left")
-tk.Button(root, text="Load Data", command=load_data).pack(side="left")
+@timed()
+def find_clashes():
+    """
+    Show every student, instructor and room booked for two courses at the
+    same time, for example after loading data made elsewhere.
+    """
+    clashes = school_management.find_all_clashes(courses)
+    if not clashes:
+        messagebox.showinfo("Timetable", "No clashes found.")
+        return
+    lines = [f"{kind} {owner}: {a} and {b}" for kind, owner, a, b in clashes[:30]]
+    if len(clashes) > 30:
+        lines.append(f"... and {len(clashes) - 30} more")
+    messagebox.showwarning("Timetable", f"{len(clashes)} clashes:\n" + "\n".join(lines))
 
 
 def update_dropdowns_loop():
     """
     Periodically update dropdowns.
 
-    Ensures the course dropdowns for students and instructors
-    are always up to date. Runs every second.
+    Ensures the course dropdowns are always up to date. Runs every second.
     """
     update_course_dropdown()
-    inst_course_dropdown['values'] = [c.course_id for c in courses]
     root.after(1000, update_dropdowns_loop)
 
 
-update_dropdowns_loop()
-refresh_treeview()
-root.mainloop()
+# ------------------------
+# Tab builders
+# ------------------------
+def build_students_tab(tab):
+    """
+    Build the widgets of the Students tab.
+
+    :param tab: Frame of the tab.
+    :type tab: ttk.Frame
+    """
+    global s_id, s_name, s_age, s_email, course_var, course_dropdown, student_tree
+    tk.Label(tab, text="ID").grid(row=0, column=0)
+    tk.Label(tab, text="Name").grid(row=1, column=0)
+    tk.Label(tab, text="Age").grid(row=2, column=0)
+    tk.Label(tab, text="Email").grid(row=3, column=0)
+
+    s_id = tk.Entry(tab)
+    s_name = tk.Entry(tab)
+    s_age = tk.Entry(tab)
+    s_email = tk.Entry(tab)
+    s_id.grid(row=0, column=1)
+    s_name.grid(row=1, column=1)
+    s_age.grid(row=2, column=1)
+    s_email.grid(row=3, column=1)
+
+    tk.Button(tab, text="Add Student", command=add_student).grid(row=4, column=0, columnspan=2)
+
+    tk.Label(tab, text="Register Course:").grid(row=5, column=0)
+    course_var = tk.StringVar()
+    course_dropdown = ttk.Combobox(tab, textvariable=course_var)
+    course_dropdown.grid(row=5, column=1)
+    tk.Button(tab, text="Register", command=register_course_to_student).grid(row=6, column=0)
+    tk.Button(tab, text="Register Selected", command=register_selected_students).grid(row=6, column=1)
+
+    student_tree = ttk.Treeview(tab, columns=("ID", "Name", "Age", "Email", "Courses"), show="headings")
+    for col in ("ID", "Name", "Age", "Email", "Courses"):
+        student_tree.heading(col, text=col)
+    student_tree.grid(row=7, column=0, columnspan=2)
+
+    tk.Button(tab, text="Delete Selected", command=delete_selected_student).grid(row=8, column=0, columnspan=2)
+
+
+def build_instructors_tab(tab):
+    """
+    Build the widgets of the Instructors tab.
+
+    :param tab: Frame of the tab.
+    :type tab: ttk.Frame
+    """
+    global i_id, i_name, i_age, i_email, inst_course_var, inst_course_dropdown, instructor_tree
+    tk.Label(tab, text="ID").grid(row=0, column=0)
+    tk.Label(tab, text="Name").grid(row=1, column=0)
+    tk.Label(tab, text="Age").grid(row=2, column=0)
+    tk.Label(tab, text="Email").grid(row=3, column=0)
+
+    i_id = tk.Entry(tab)
+    i_name = tk.Entry(tab)
+    i_age = tk.Entry(tab)
+    i_email = tk.Entry(tab)
+    i_id.grid(row=0, column=1)
+    i_name.grid(row=1, column=1)
+    i_age.grid(row=2, column=1)
+    i_email.grid(row=3, column=1)
+
+    tk.Button(tab, text="Add Instructor", command=add_instructor).grid(row=4, column=0, columnspan=2)
+
+    tk.Label(tab, text="Assign Course:").grid(row=5, column=0)
+    inst_course_var = tk.StringVar()
+    inst_course_dropdown = ttk.Combobox(tab, textvariable=inst_course_var)
+    inst_course_dropdown.grid(row=5, column=1)
+    tk.Button(tab, text="Assign", command=assign_course_to_instructor).grid(row=6, column=0, columnspan=2)
+
+    instructor_tree = ttk.Treeview(tab, columns=("ID", "Name", "Age", "Email", "Courses"), show="headings")
+    for col in ("ID", "Name", "Age", "Email", "Courses"):
+        instructor_tree.heading(col, text=col)
+    instructor_tree.grid(row=7, column=0, columnspan=2)
+
+    tk.Button(tab, text="Delete Selected", command=delete_selected_instructor).grid(row=8, column=0, columnspan=2)
+
+
+def build_courses_tab(tab):
+    """
+    Build the widgets of the Courses tab.
+
+    :param tab: Frame of the tab.
+    :type tab: ttk.Frame
+    """
+    global c_id, c_name, c_slots, c_capacity, course_tree, roster_var, roster_dropdown
+    tk.Label(tab, text="ID").grid(row=0, column=0)
+    tk.Label(tab, text="Name").grid(row=1, column=0)
+    tk.Label(tab, text="Timetable (e.g. Mon 09:00-10:30 B101; Wed 09:00-10:30 B101)").grid(row=2, column=0)
+    tk.Label(tab, text="Capacity (empty for no limit)").grid(row=3, column=0)
+
+    c_id = tk.Entry(tab)
+    c_name = tk.Entry(tab)
+    c_slots = tk.Entry(tab, width=40)
+    c_capacity = tk.Entry(tab)
+    c_id.grid(row=0, column=1)
+    c_name.grid(row=1, column=1)
+    c_slots.grid(row=2, column=1)
+    c_capacity.grid(row=3, column=1)
+
+    tk.Button(tab, text="Add Course", command=add_course).grid(row=4, column=0, columnspan=2)
+
+    columns = ("ID", "Name", "Instructor", "Students", "Timetable", "Seats")
+    course_tree = ttk.Treeview(tab, columns=columns, show="headings")
+    for col in columns:
+        course_tree.heading(col, text=col)
+    course_tree.grid(row=5, column=0, columnspan=2)
+
+    tk.Button(tab, text="Delete Selected", command=delete_selected_course).grid(row=6, column=0)
+    tk.Button(tab, text="Find Clashes", command=find_clashes).grid(row=6, column=1)
+
+    tk.Label(tab, text="Copy Roster From:").grid(row=7, column=0)
+    roster_var = tk.StringVar()
+    roster_dropdown = ttk.Combobox(tab, textvariable=roster_var)
+    roster_dropdown.grid(row=7, column=1)
+    tk.Button(tab, text="Copy Roster", command=copy_roster).grid(row=8, column=0)
+    tk.Button(tab, text="Drop Section", command=drop_section).grid(row=8, column=1)
+
+
+TAB_BUILDERS = {
+    "Students": build_students_tab,
+    "Instructors": build_instructors_tab,
+    "Courses": build_courses_tab,
+}
+built_tabs = set()
+
+
+@timed(category="widgets")
+def build_current_tab(event=None):
+    """
+    Build the selected tab the first time it is shown.
+
+    Bound to ``<<NotebookTabChanged>>`` so that tabs the user never opens
+    are never built.
+    """
+    tab = tabControl.select()
+    title = tabControl.tab(tab, "text")
+    if title in built_tabs:
+        return
+    TAB_BUILDERS[title](tabControl.nametowidget(tab))
+    built_tabs.add(title)
+    refresh_treeview()
+    update_course_dropdown()
+
+
+def autosave_tick():
+    """
+    Journal the changes made since the last tick, then reschedule.
+    """
+    if autosaver.tracker.dirty:
+        autosaver.flush(students, instructors, courses)
+    root.after(AUTOSAVE_INTERVAL_MS, autosave_tick)
+
+
+def on_close():
+    """
+    Journal any pending changes before the window closes.
+    """
+    if autosaver:
+        autosaver.flush(students, instructors, courses)
+    root.destroy()
+
+
+def after_first_paint():
+    """
+    Runs once the window is idle after being shown: records the first
+    paint and starts the periodic dropdown refresh.
+    """
+    startup.first_paint()
+    update_dropdowns_loop()
+    if timing_requested():
+        print(startup.report(), file=sys.stderr)
+
+
+def tree_counts():
+    """
+    Count the rows of the treeviews built so far, for memory reports.
+
+    :return: Tree name to number of rows.
+    :rtype: dict[str, int]
+    """
+    trees = {"student rows": student_tree, "instructor rows": instructor_tree, "course rows": course_tree}
+    return {name: len(tree.get_children()) for name, tree in trees.items() if tree is not None}
+
+
+def show_memory():
+    """
+    Open the memory report window.
+    """
+    from school.tk_debug import show_memory as show
+    show(root, lambda: (students, instructors, courses), tree_counts)
+
+
+def build_debug_menu():
+    """
+    Add a Debug menu with the memory report (and the timings when
+    instrumentation is enabled) to the main window.
+    """
+    menubar = tk.Menu(root)
+    debug_menu = tk.Menu(menubar, tearoff=0)
+    debug_menu.add_command(label="Memory Report", command=show_memory)
+    if instrumentation.enabled:
+        from school.tk_debug import show_timings
+        debug_menu.add_command(label="Timings", command=lambda: show_timings(root))
+    menubar.add_cascade(label="Debug", menu=debug_menu)
+    root.config(menu=menubar)
+
+
+def build_gui():
+    """
+    Create the main window with its notebook and the visible tab.
+
+    Only the visible tab is built here; the other tabs are built the
+    first time they are selected.
+    """
+    global root, tabControl
+    root = tk.Tk()
+    root.title("School Management System")
+    root.geometry("1000x600")
+    startup.mark("create root")
+
+    tabControl = ttk.Notebook(root)
+    for title in TAB_BUILDERS:
+        tabControl.add(ttk.Frame(tabControl), text=title)
+    tabControl.pack(expand=1, fill="both")
+    tabControl.bind("<<NotebookTabChanged>>", build_current_tab)
+
+    # ------------------------
+    # Save / Load buttons
+    # ------------------------
+    tk.Button(root, text="Save Data", command=save_data).pack(side="left")
+    tk.Button(root, text="Load Data", command=load_data).pack(side="left")
+    tk.Button(root, text="Open Database", command=open_database).pack(side="left")
+    if instrumentation.enabled:
+        from school.tk_debug import show_timings
+        tk.Button(root, text="Timings", command=lambda: show_timings(root)).pack(side="left")
+    build_debug_menu()
+
+    build_current_tab()
+    startup.mark("build first tab")
+
+
+def main():
+    """
+    Build the main window and run the Tk event loop.
+    """
+    global autosaver, students, instructors, courses, rooms
+    enable_if_requested()
+    enable_memory_if_requested()
+    memory.counts = tree_counts
+    if "--no-autosave" not in sys.argv:
+        autosaver = Autosaver("autosave")
+        students, instructors, courses = autosaver.recover()
+        rooms = room_timetable(courses)
+    build_gui()
+    root.protocol("WM_DELETE_WINDOW", on_close)
+    if autosaver:
+        root.after(AUTOSAVE_INTERVAL_MS, autosave_tick)
+    root.after_idle(after_first_paint)
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    main()